@@ -2,21 +2,24 @@
 # -*- coding: utf-8 -*-
 
 """ Extract the logfile of bow-tie structure of Vevo Network changes as the cutoff value changes.
+The snapshot is loaded once. In the incremental mode, raising the cutoff by one inserts the edges at that position
+into the bow-tie structure of the previous cutoff; in the full mode, each cutoff is decomposed from scratch.
 
-Usage: python how_bowtie_changes_with_cutoff.py
+Usage: python how_bowtie_changes_with_cutoff.py [incremental|full]
 Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/network_pickle/network_2018-10-01.p
-Output data files: ./bowtie_cutoff.log
-Time: ~2H
+Output data files: ./bowtie_cutoff.log, ./bowtie_cutoff.npz
+Time: ~1M
 """
 
 import os, sys, pickle, logging
-from tarjan import tarjan
-from collections import defaultdict
+import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.helper import Timer
 from utils.data_loader import DataLoader
-from utils.bowtie import is_in_component, is_out_component
+from utils.network import network_dict_to_arrays
+from utils.bowtie import bowtie_decomposition, summarize_bowtie, log_bowtie_summary, save_bowtie_results, \
+    IncrementalBowtie
 
 
 def main():
@@ -27,111 +30,62 @@ def main():
     data_prefix = '../data'
     snapshot_date = '2018-10-01'
     snapshot_filename = 'network_{0}.p'.format(snapshot_date)
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'incremental'
+    if mode not in ['incremental', 'full']:
+        raise ValueError('unknown mode {0}, choose from incremental or full'.format(mode))
 
     # == == == == == == Part 2: Load video views == == == == == == #
     data_loader = DataLoader()
     data_loader.load_video_views()
     embed_view_dict = data_loader.embed_view_dict
-    # get the views on 2018-10-01
-    embed_view_dict = {embed: ts_view[30] for embed, ts_view in embed_view_dict.items()}
-    total_views = sum(embed_view_dict.values())
     num_videos = data_loader.num_videos
-
-    # == == == == == == Part 3: Load network snapshot as cutoff value changes == == == == == == #
-    for cutoff in range(5, 51):
-        nodes_set = set()
-        num_edges = 0
-        embedded_graph = defaultdict(list)
-        with open(os.path.join(data_prefix, 'network_pickle', snapshot_filename), 'rb') as fin:
-            network_dict = pickle.load(fin)
-            # embed_tar: [(embed_src, pos_src, view_src)]
-            for embed_tar in range(num_videos):
-                for embed_src, pos_src, _ in network_dict[embed_tar]:
-                    if pos_src < cutoff:
-                        embedded_graph[embed_src].append(embed_tar)
-                        nodes_set.add(embed_src)
-                        nodes_set.add(embed_tar)
-                        num_edges += 1
-
+    # get the views on 2018-10-01
+    view_arr = np.array([embed_view_dict[embed][30] for embed in range(num_videos)])
+    total_views = np.sum(view_arr)
+
+    # == == == == == == Part 3: Load network snapshot once == == == == == == #
+    with open(os.path.join(data_prefix, 'network_pickle', snapshot_filename), 'rb') as fin:
+        network_dict = pickle.load(fin)
+    # embed_tar: [(embed_src, pos_src, view_src)]
+    src, tar, pos, _ = network_dict_to_arrays(network_dict, num_videos)
+    network_dict = None
+
+    # == == == == == == Part 4: Extract bow-tie structure as cutoff value changes == == == == == == #
+    incremental_bowtie = None
+    cutoff_list, summary_list, labels_list = [], [], []
+    for cutoff in range(MIN_CUTOFF, MAX_CUTOFF + 1):
+        cutoff_mask = pos < cutoff
+        num_nodes = np.sum(np.bincount(np.concatenate([src[cutoff_mask], tar[cutoff_mask]]), minlength=num_videos) > 0)
         logging.info('>>> Graph embedding @ cutoff {0} has been loaded!'.format(cutoff))
-        logging.info('>>> {0} nodes and {1} edges in the graph'.format(len(nodes_set), num_edges))
+        logging.info('>>> {0} nodes and {1} edges in the graph'.format(num_nodes, np.sum(cutoff_mask)))
         logging.info('    {0} views throughout the graph'.format(total_views))
 
-        # == == == == == == Part 4: Extract bow-tie structure == == == == == == #
-        scc_content = tarjan(embedded_graph)
-        scc_content = sorted(scc_content, key=lambda x: len(x), reverse=True)
-
-        # largest SCC
-        largest_scc = scc_content.pop(0)
-        logging.info('>>> {0} ({1:.2f}%) nodes in the largest SCC'.format(len(largest_scc), len(largest_scc) / num_videos * 100))
-        largest_scc_views = sum([embed_view_dict[embed] for embed in largest_scc])
-        logging.info('    {0} ({1:.2f}%) views in the largest SCC'.format(largest_scc_views, largest_scc_views / total_views * 100))
-
-        # find IN, OUT, Tendrils, Disconnected
-        in_component = []
-        num_scc_in = 0
-        to_visit_scc = []
-        for scc in scc_content:
-            ret = is_in_component(scc, embedded_graph, largest_scc)
-            if ret:
-                in_component.extend(scc)
-                num_scc_in += 1
+        if mode == 'full':
+            labels, scc_labels = bowtie_decomposition(src[cutoff_mask], tar[cutoff_mask], num_videos)
+        else:
+            if incremental_bowtie is None:
+                incremental_bowtie = IncrementalBowtie(src[cutoff_mask], tar[cutoff_mask], num_videos)
             else:
-                to_visit_scc.append(scc)
-        logging.info('>>> {0} ({1:.2f}%) nodes in the IN component'.format(len(in_component), len(in_component) / num_videos * 100))
-        logging.info('    {0} scc in the IN component'.format(num_scc_in))
-        in_views = sum([embed_view_dict[embed] for embed in in_component])
-        logging.info('    {0} ({1:.2f}%) views in the IN component'.format(in_views, in_views / total_views * 100))
-
-        out_component = []
-        num_scc_out = 0
-        to_visit_scc2 = []
-        for scc in to_visit_scc:
-            ret = is_out_component(scc, embedded_graph, largest_scc)
-            if ret:
-                out_component.extend(scc)
-                num_scc_out += 1
-            else:
-                to_visit_scc2.append(scc)
-        logging.info('>>> {0} ({1:.2f}%) nodes in the OUT component'.format(len(out_component), len(out_component) / num_videos * 100))
-        logging.info('    {0} scc in the OUT component'.format(num_scc_out))
-        out_views = sum([embed_view_dict[embed] for embed in out_component])
-        logging.info('    {0} ({1:.2f}%) views in the OUT component'.format(out_views, out_views / total_views * 100))
-
-        tendrils = []
-        num_scc_tendrils = 0
-        disconnected = []
-        num_disconnected = num_videos - len(nodes_set)
-        num_scc_disconnected = 0
-        for scc in to_visit_scc2:
-            ret = is_out_component(scc, embedded_graph, in_component)
-            if ret:
-                tendrils.extend(scc)
-                num_scc_tendrils += 1
-            else:
-                ret = is_in_component(scc, embedded_graph, out_component)
-                if ret:
-                    tendrils.extend(scc)
-                    num_scc_tendrils += 1
-                else:
-                    disconnected.extend(scc)
-                    num_scc_disconnected += 1
-        logging.info('>>> {0} ({1:.2f}%) nodes in the Tendrils'.format(len(tendrils), len(tendrils) / num_videos * 100))
-        logging.info('    {0} scc in the Tendrils'.format(num_scc_tendrils))
-        tendrils_views = sum([embed_view_dict[embed] for embed in tendrils])
-        logging.info('    {0} ({1:.2f}%) views in the Tendrils'.format(tendrils_views, tendrils_views / total_views * 100))
-
-        logging.info('>>> {0} ({1:.2f}%) nodes in the Disconnected'.format(num_disconnected + len(disconnected), (num_disconnected + len(disconnected)) / num_videos * 100))
-        logging.info('    {0} scc in the Disconnected'.format(num_disconnected + num_scc_disconnected))
-        disc_views = total_views - largest_scc_views - in_views - out_views - tendrils_views
-        logging.info('    {0} ({1:.2f}%) views in the Disconnected'.format(disc_views, disc_views / total_views * 100))
+                # only the edges at position cutoff-1 are new
+                new_edge_mask = pos == cutoff - 1
+                incremental_bowtie.add_edges(src[new_edge_mask], tar[new_edge_mask])
+            labels, scc_labels = incremental_bowtie.labels(), incremental_bowtie.scc_labels
+        summary = summarize_bowtie(labels, scc_labels, view_arr)
+        log_bowtie_summary(summary)
+        cutoff_list.append(cutoff)
+        summary_list.append(summary)
+        labels_list.append(labels)
 
         print('>>> Finish computing bowtie at cutoff {0}...'.format(cutoff))
 
+    save_bowtie_results('bowtie_cutoff.npz', cutoff_list, summary_list, labels_list)
+
     timer.stop()
 
 
 if __name__ == '__main__':
+    MIN_CUTOFF = 5
+    MAX_CUTOFF = 50
     logging.basicConfig(filename='bowtie_cutoff.log', filemode='w', format='%(asctime)s - %(message)s', level=logging.INFO)
 
     main()
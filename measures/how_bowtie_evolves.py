@@ -2,22 +2,27 @@
 # -*- coding: utf-8 -*-
 
 """ Extract the logfile of bow-tie structure of Vevo Network evolves over time.
+In the dynamic mode, each day's edge insertions and deletions are applied to the bow-tie structure of the previous day,
+the structure is rebuilt from scratch if more than MAX_CHURN of the edges change; in the full mode, each day is
+decomposed from scratch; in the approximate mode, the fraction of nodes and views in each component is estimated from
+NUM_SAMPLES sampled nodes, with confidence intervals; the validate mode also logs the exact fractions for comparison.
 
-Usage: python how_bowtie_evolves.py
+Usage: python how_bowtie_evolves.py [dynamic|full|approximate|validate] [num_samples]
 Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/network_pickle/
-Output data files: ./bowtie_evolves.log
-Time: ~3H
+Output data files: ./bowtie_evolves.log, ./bowtie_evolves.npz, or ./bowtie_evolves_approximate.log
+Time: ~2M
 """
 
-import os, sys, pickle, logging
+import os, sys, logging
 from datetime import datetime, timedelta
-from tarjan import tarjan
-from collections import defaultdict
+import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.helper import Timer, obj2str
 from utils.data_loader import DataLoader
-from utils.bowtie import is_in_component, is_out_component
+from utils.scanner import iter_snapshots
+from utils.bowtie import bowtie_decomposition, summarize_bowtie, log_bowtie_summary, save_bowtie_results, \
+    DynamicBowtie, transition_matrix, log_transitions, ApproximateBowtie, log_bowtie_estimate
 
 
 def main():
@@ -26,115 +31,73 @@ def main():
     timer.start()
 
     data_prefix = '../data'
+    num_samples = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_SAMPLES
 
     # == == == == == == Part 2: Load video views == == == == == == #
     data_loader = DataLoader()
     data_loader.load_video_views()
     embed_view_dict = data_loader.embed_view_dict
     num_videos = data_loader.num_videos
-    total_views = []
-
-    # == == == == == == Part 3: Load network snapshot as cutoff value changes == == == == == == #
-    for t in range(T):
-        total_views.append(sum([embed_view_dict[embed][t] for embed in range(num_videos)]))
+    view_mat = np.array([embed_view_dict[embed] for embed in range(num_videos)])
 
+    # == == == == == == Part 3: Load network snapshot over time == == == == == == #
+    dynamic_bowtie = None
+    date_list, summary_list, labels_list = [], [], []
+    # the next snapshots are loaded and converted to arrays in the background
+    for t, (src, tar, pos, _) in iter_snapshots(data_prefix, T=T, num_videos=num_videos):
         snapshot_date = obj2str(datetime(2018, 9, 1) + timedelta(days=t))
-        snapshot_filename = 'network_{0}.p'.format(snapshot_date)
-        nodes_set = set()
-        num_edges = 0
-        embedded_graph = defaultdict(list)
-        with open(os.path.join(data_prefix, 'network_pickle', snapshot_filename), 'rb') as fin:
-            network_dict = pickle.load(fin)
-            # embed_tar: [(embed_src, pos_src, view_src)]
-            for embed_tar in range(num_videos):
-                for embed_src, pos_src, _ in network_dict[embed_tar]:
-                    if pos_src < CUTOFF:
-                        embedded_graph[embed_src].append(embed_tar)
-                        nodes_set.add(embed_src)
-                        nodes_set.add(embed_tar)
-                        num_edges += 1
+        src, tar = src[pos < CUTOFF], tar[pos < CUTOFF]
+        num_nodes = np.sum(np.bincount(np.concatenate([src, tar]), minlength=num_videos) > 0)
 
         logging.info('>>> Graph embedding @ date {0} has been loaded!'.format(snapshot_date))
-        logging.info('>>> {0} nodes and {1} edges in the graph'.format(len(nodes_set), num_edges))
-        logging.info('    {0} views throughout the graph'.format(total_views[t]))
+        logging.info('>>> {0} nodes and {1} edges in the graph'.format(num_nodes, len(src)))
+        logging.info('    {0} views throughout the graph'.format(np.sum(view_mat[:, t])))
 
         # == == == == == == Part 4: Extract bow-tie structure == == == == == == #
-        scc_content = tarjan(embedded_graph)
-        scc_content = sorted(scc_content, key=lambda x: len(x), reverse=True)
-
-        # largest SCC
-        largest_scc = scc_content.pop(0)
-        logging.info('>>> {0} ({1:.2f}%) nodes in the largest SCC'.format(len(largest_scc), len(largest_scc) / num_videos * 100))
-        largest_scc_views = sum([embed_view_dict[embed][t] for embed in largest_scc])
-        logging.info('    {0} ({1:.2f}%) views in the largest SCC'.format(largest_scc_views, largest_scc_views / total_views[t] * 100))
-
-        # find IN, OUT, Tendrils, Disconnected
-        in_component = []
-        num_scc_in = 0
-        to_visit_scc = []
-        for scc in scc_content:
-            ret = is_in_component(scc, embedded_graph, largest_scc)
-            if ret:
-                in_component.extend(scc)
-                num_scc_in += 1
-            else:
-                to_visit_scc.append(scc)
-        logging.info('>>> {0} ({1:.2f}%) nodes in the IN component'.format(len(in_component), len(in_component) / num_videos * 100))
-        logging.info('    {0} scc in the IN component'.format(num_scc_in))
-        in_views = sum([embed_view_dict[embed][t] for embed in in_component])
-        logging.info('    {0} ({1:.2f}%) views in the IN component'.format(in_views, in_views / total_views[t] * 100))
-
-        out_component = []
-        num_scc_out = 0
-        to_visit_scc2 = []
-        for scc in to_visit_scc:
-            ret = is_out_component(scc, embedded_graph, largest_scc)
-            if ret:
-                out_component.extend(scc)
-                num_scc_out += 1
+        if MODE in ['approximate', 'validate']:
+            estimate_dict = ApproximateBowtie(src, tar, num_videos).estimate(num_samples, views=view_mat[:, t], random_state=t)
+            if MODE == 'validate':
+                labels, scc_labels = bowtie_decomposition(src, tar, num_videos)
+                log_bowtie_estimate(estimate_dict, summarize_bowtie(labels, scc_labels, view_mat[:, t]))
             else:
-                to_visit_scc2.append(scc)
-        logging.info('>>> {0} ({1:.2f}%) nodes in the OUT component'.format(len(out_component), len(out_component) / num_videos * 100))
-        logging.info('    {0} scc in the OUT component'.format(num_scc_out))
-        out_views = sum([embed_view_dict[embed][t] for embed in out_component])
-        logging.info('    {0} ({1:.2f}%) views in the OUT component'.format(out_views, out_views / total_views[t] * 100))
-
-        tendrils = []
-        num_scc_tendrils = 0
-        disconnected = []
-        num_disconnected = num_videos - len(nodes_set)
-        num_scc_disconnected = 0
-        for scc in to_visit_scc2:
-            ret = is_out_component(scc, embedded_graph, in_component)
-            if ret:
-                tendrils.extend(scc)
-                num_scc_tendrils += 1
+                log_bowtie_estimate(estimate_dict)
+            print('>>> Finish estimating bowtie at day {0}...'.format(t + 1))
+            continue
+
+        if MODE == 'full':
+            labels, scc_labels = bowtie_decomposition(src, tar, num_videos)
+        else:
+            if dynamic_bowtie is None:
+                dynamic_bowtie = DynamicBowtie(src, tar, num_videos, max_churn=MAX_CHURN)
             else:
-                ret = is_in_component(scc, embedded_graph, out_component)
-                if ret:
-                    tendrils.extend(scc)
-                    num_scc_tendrils += 1
-                else:
-                    disconnected.extend(scc)
-                    num_scc_disconnected += 1
-        logging.info('>>> {0} ({1:.2f}%) nodes in the Tendrils'.format(len(tendrils), len(tendrils) / num_videos * 100))
-        logging.info('    {0} scc in the Tendrils'.format(num_scc_tendrils))
-        tendrils_views = sum([embed_view_dict[embed][t] for embed in tendrils])
-        logging.info('    {0} ({1:.2f}%) views in the Tendrils'.format(tendrils_views, tendrils_views / total_views[t] * 100))
-
-        logging.info('>>> {0} ({1:.2f}%) nodes in the Disconnected'.format(num_disconnected + len(disconnected), (num_disconnected + len(disconnected)) / num_videos * 100))
-        logging.info('    {0} scc in the Disconnected'.format(num_disconnected + num_scc_disconnected))
-        disc_views = total_views[t] - largest_scc_views - in_views - out_views - tendrils_views
-        logging.info('    {0} ({1:.2f}%) views in the Disconnected'.format(disc_views, disc_views / total_views[t] * 100))
+                num_added, num_deleted = dynamic_bowtie.update(src, tar)
+                logging.info('    {0} edges inserted and {1} edges deleted since the previous day'.format(num_added, num_deleted))
+            labels, scc_labels = dynamic_bowtie.labels(), dynamic_bowtie.scc_labels
+        summary = summarize_bowtie(labels, scc_labels, view_mat[:, t])
+        log_bowtie_summary(summary)
+        if t > 0:
+            log_transitions(transition_matrix(labels_list[-1], labels))
+        date_list.append(snapshot_date)
+        summary_list.append(summary)
+        labels_list.append(labels)
 
         print('>>> Finish computing bowtie at day {0}...'.format(t + 1))
 
+    if MODE in ['dynamic', 'full']:
+        save_bowtie_results('bowtie_evolves.npz', date_list, summary_list, labels_list)
+
     timer.stop()
 
 
 if __name__ == '__main__':
     T = 63
     CUTOFF = 15
-    logging.basicConfig(filename='bowtie_evolves.log', filemode='w', format='%(asctime)s - %(message)s', level=logging.INFO)
+    MAX_CHURN = 0.2
+    NUM_SAMPLES = 10000
+    MODE = sys.argv[1] if len(sys.argv) > 1 else 'dynamic'
+    if MODE not in ['dynamic', 'full', 'approximate', 'validate']:
+        raise ValueError('unknown mode {0}, choose from dynamic, full, approximate or validate'.format(MODE))
+    log_filename = 'bowtie_evolves.log' if MODE in ['dynamic', 'full'] else 'bowtie_evolves_approximate.log'
+    logging.basicConfig(filename=log_filename, filemode='w', format='%(asctime)s - %(message)s', level=logging.INFO)
 
     main()
@@ -5,14 +5,15 @@
 Filter: video with at least 10 indegree (top 11% in terms of indegree) on current day.
 
 Usage: python plot_fig10_temporal_micro.py
-Input data files: ../data/vevo_en_embeds_60k.txt, ../data/network_pickle/
+Input data files: ../data/vevo_en_embeds_60k.txt, ../data/network_pickle/indegree_cube.npy,
+                  ./snapshot_measures.npz from scan_snapshots.py, or ../data/network_pickle/edge_lifetime_15.npz,
+                  or ../data/network_pickle/ if they do not exist
+Output data files: ./indegree_change.npz
 Time: ~2M
 """
 
-import sys, os, platform, pickle
-from datetime import datetime, timedelta
+import sys, os, platform
 import numpy as np
-from collections import defaultdict, Counter
 
 import matplotlib as mpl
 if platform.system() == 'Linux':
@@ -25,71 +26,42 @@ mpl.rcParams['lines.linewidth'] = 1.5
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.data_loader import DataLoader
 from utils.helper import Timer
+from utils.network import link_frequency_histogram
+from utils.percentile import PercentileBands, sorted_buckets
 from utils.plot import ColorPalette, concise_fmt, hide_spines
+from utils.scanner import SnapshotScanner, EdgeLifetimeAccumulator, IndegreeCubeAccumulator, load_snapshot_measures, \
+    load_indegree_cube, load_edge_lifetime, get_indegree_cube_path, get_edge_lifetime_path
 
 
-def smoothing(indegree_change_dict, target_x, percentile):
-    if target_x - 1 in indegree_change_dict and target_x + 1 in indegree_change_dict:
-        return 0.4 * np.percentile(indegree_change_dict[target_x], percentile) \
-               + 0.1 * np.percentile(indegree_change_dict[target_x], percentile - 4) \
-               + 0.1 * np.percentile(indegree_change_dict[target_x], percentile + 4) \
-               + 0.1 * np.percentile(indegree_change_dict[target_x - 1], percentile) \
-               + 0.1 * np.percentile(indegree_change_dict[target_x + 1], percentile) \
-               + 0.05 * np.percentile(indegree_change_dict[target_x - 1], percentile - 4) \
-               + 0.05 * np.percentile(indegree_change_dict[target_x + 1], percentile - 4) \
-               + 0.05 * np.percentile(indegree_change_dict[target_x - 1], percentile + 4) \
-               + 0.05 * np.percentile(indegree_change_dict[target_x + 1], percentile + 4)
-    elif target_x - 1 in indegree_change_dict:
-        return 0.5 * np.percentile(indegree_change_dict[target_x], percentile) \
-               + 0.15 * np.percentile(indegree_change_dict[target_x], percentile - 4) \
-               + 0.15 * np.percentile(indegree_change_dict[target_x], percentile + 4) \
-               + 0.1 * np.percentile(indegree_change_dict[target_x - 1], percentile) \
-               + 0.05 * np.percentile(indegree_change_dict[target_x - 1], percentile - 4) \
-               + 0.05 * np.percentile(indegree_change_dict[target_x - 1], percentile + 4)
-    elif target_x + 1 in indegree_change_dict:
-        return 0.5 * np.percentile(indegree_change_dict[target_x], percentile) \
-               + 0.15 * np.percentile(indegree_change_dict[target_x], percentile - 4) \
-               + 0.15 * np.percentile(indegree_change_dict[target_x], percentile + 4) \
-               + 0.1 * np.percentile(indegree_change_dict[target_x + 1], percentile) \
-               + 0.05 * np.percentile(indegree_change_dict[target_x + 1], percentile - 4) \
-               + 0.05 * np.percentile(indegree_change_dict[target_x + 1], percentile + 4)
-    else:
-        return 0.5 * np.percentile(indegree_change_dict[target_x], percentile) \
-               + 0.25 * np.percentile(indegree_change_dict[target_x], percentile - 4) \
-               + 0.25 * np.percentile(indegree_change_dict[target_x], percentile + 4)
-
-
-def plot_contour(indegree_change_dict, target_x, ax, color='k', fsize=11):
+def plot_contour(bands, target_x, ax, color='k', fsize=11):
     """ Plot contour for one target x value."""
-    ax.plot([target_x, target_x],
-            [np.percentile(indegree_change_dict[target_x], 0.5), np.percentile(indegree_change_dict[target_x], 99.5)],
+    ax.plot([target_x, target_x], [bands.percentile(target_x, 0.5), bands.percentile(target_x, 99.5)],
             c=color, zorder=20)
     for percentile in [10, 25, 50, 75, 90]:
         ax.plot([target_x - 5, target_x + 5],
-                [smoothing(indegree_change_dict, target_x, percentile), smoothing(indegree_change_dict, target_x, percentile)],
+                [bands.smoothed(target_x, percentile), bands.smoothed(target_x, percentile)],
                 c=color, zorder=20)
-        ax.text(target_x - 20, smoothing(indegree_change_dict, target_x, percentile), '{0}%'.format(percentile),
+        ax.text(target_x - 20, bands.smoothed(target_x, percentile), '{0}%'.format(percentile),
                 fontsize=fsize, verticalalignment='center', zorder=20)
     for percentile in [0.5, 99.5]:
         ax.plot([target_x - 5, target_x + 5],
-                [np.percentile(indegree_change_dict[target_x], percentile),
-                 np.percentile(indegree_change_dict[target_x], percentile)],
+                [bands.percentile(target_x, percentile), bands.percentile(target_x, percentile)],
                 c=color, zorder=20)
 
     ax.annotate('',
                 xy=(target_x + 9, 0.6), xycoords='data',
-                xytext=(target_x + 9, smoothing(indegree_change_dict, target_x, 75)), textcoords='data',
+                xytext=(target_x + 9, bands.smoothed(target_x, 75)), textcoords='data',
                 arrowprops=dict(arrowstyle="->", connectionstyle="arc3"))
     ax.text(target_x + 12, 0.38, '25% videos gain {0:.0f}+ in-links'.format(
-        abs(np.percentile(indegree_change_dict[target_x], 75)) * target_x),
+        abs(bands.percentile(target_x, 75)) * target_x),
             fontsize=fsize, verticalalignment='center', zorder=20)
 
     ax.annotate('',
                 xy=(target_x + 9, -0.6), xycoords='data',
-                xytext=(target_x + 9, smoothing(indegree_change_dict, target_x, 25)), textcoords='data',
+                xytext=(target_x + 9, bands.smoothed(target_x, 25)), textcoords='data',
                 arrowprops=dict(arrowstyle="->", connectionstyle="arc3"))
     ax.text(target_x + 12, -0.4, '25% videos lose {0:.0f}+ in-links'.format(
-        abs(np.percentile(indegree_change_dict[target_x], 25)) * target_x),
+        abs(bands.percentile(target_x, 25)) * target_x),
             fontsize=fsize, verticalalignment='center', zorder=20)
 
 
@@ -106,51 +78,54 @@ def main():
     num_videos = data_loader.num_videos
 
     # == == == == == == Part 3: Load dynamic network snapshot == == == == == == #
-    embed_indegree_dict = {embed: np.zeros((T,)) for embed in np.arange(num_videos)}
-    edge_frequency_dict = defaultdict(int)
-    for t in range(T):
-        filename = 'network_{0}.p'.format((datetime(2018, 9, 1) + timedelta(days=t)).strftime('%Y-%m-%d'))
-        with open(os.path.join(data_prefix, 'network_pickle', filename), 'rb') as fin:
-            network_dict = pickle.load(fin)
-            # embed_tar: [(embed_src, pos_src, view_src), ...]
-            for embed_tar in range(num_videos):
-                inlinks = [x for x in network_dict[embed_tar] if x[1] < NUM_REL]
-                if len(inlinks) > 0:
-                    for embed_src, _, _, in inlinks:
-                        edge_frequency_dict['{0}-{1}'.format(embed_src, embed_tar)] += 1
-                embed_indegree_dict[embed_tar][t] = len(inlinks)
-        print('>>> Finish loading day {0}...'.format(t + 1))
-    print('>>> Network structure has been loaded!')
-
-    link_frequency_counter = Counter(edge_frequency_dict.values())
-
-    # == == == == == == Part 4: Plot how indegree changes == == == == == == #
+    if os.path.exists('snapshot_measures.npz'):
+        edge_counts = load_snapshot_measures('snapshot_measures.npz')['edge_counts']
+    else:
+        # build the missing link lifetime index and indegree cube in one pass
+        scanner = SnapshotScanner(data_prefix, num_videos, T=T)
+        if not os.path.exists(get_edge_lifetime_path(data_prefix, NUM_REL)):
+            scanner.register(EdgeLifetimeAccumulator(get_edge_lifetime_path(data_prefix, NUM_REL), num_videos, T, num_rel=NUM_REL))
+        if not os.path.exists(get_indegree_cube_path(data_prefix)):
+            scanner.register(IndegreeCubeAccumulator(get_indegree_cube_path(data_prefix), num_videos, T))
+        if len(scanner.accumulators) > 0:
+            scanner.scan()
+        edge_counts = load_edge_lifetime(data_prefix, num_videos, T=T, num_rel=NUM_REL).num_present_days()
+
+    link_frequency = link_frequency_histogram(edge_counts, T)
+
+    # == == == == == == Part 4: Build indegree change percentile bands == == == == == == #
+    if os.path.exists('indegree_change.npz'):
+        with np.load('indegree_change.npz') as indegree_change:
+            x_values, offsets, change_ratios = [indegree_change[key] for key in ['x_values', 'offsets', 'change_ratios']]
+    else:
+        indegree_mat = load_indegree_cube(data_prefix, num_videos, T=T)[:, :, NUM_REL - 1].astype(np.int64)
+        # indegree on current day and the change ratio the next day, for all videos and days at once
+        x0 = indegree_mat[:, :-1].ravel()
+        x1 = indegree_mat[:, 1:].ravel()
+        x0, x1 = x0[x0 >= 10], x1[x0 >= 10]
+        x_values, offsets, change_ratios = sorted_buckets(x0, (x1 - x0) / x0)
+        np.savez_compressed('indegree_change.npz', x_values=x_values, offsets=offsets, change_ratios=change_ratios)
+        print('>>> Indegree change data has been saved to ./indegree_change.npz')
+    bands = PercentileBands(x_values, offsets, change_ratios)
+
+    # == == == == == == Part 5: Plot how indegree changes == == == == == == #
     cornflower_blue = ColorPalette.BLUE
     tomato = ColorPalette.TOMATO
 
     fig, axes = plt.subplots(1, 2, figsize=(12, 4.1))
     ax1, ax2 = axes.ravel()
-    indegree_change_dict = defaultdict(list)
-    for embed in range(num_videos):
-        for t in range(T-1):
-            x0 = embed_indegree_dict[embed][t]
-            x1 = embed_indegree_dict[embed][t+1]
-            if x0 >= 10:
-                indegree_change_dict[x0].append((x1-x0) / x0)
 
-    x_axis = sorted([x for x in indegree_change_dict.keys() if len(indegree_change_dict[x]) >= 100])
+    x_axis = bands.x_values[bands.sizes >= 100]
 
     for i in np.arange(5, 50, 5):
-        ax1.fill_between(x_axis, [smoothing(indegree_change_dict, x, 50 - i) for x in x_axis],
-                         [smoothing(indegree_change_dict, x, 55 - i) for x in x_axis],
+        ax1.fill_between(x_axis, bands.smoothed(x_axis, 50 - i), bands.smoothed(x_axis, 55 - i),
                          facecolor=cornflower_blue, alpha=(100 - 2 * i) / 100, lw=0)
-        ax1.fill_between(x_axis, [smoothing(indegree_change_dict, x, 45 + i) for x in x_axis],
-                         [smoothing(indegree_change_dict, x, 50 + i) for x in x_axis],
+        ax1.fill_between(x_axis, bands.smoothed(x_axis, 45 + i), bands.smoothed(x_axis, 50 + i),
                          facecolor=cornflower_blue, alpha=(100 - 2 * i) / 100, lw=0)
 
     for i in [25, 75]:
-        ax1.plot(x_axis, [smoothing(indegree_change_dict, x, i) for x in x_axis], color=cornflower_blue, alpha=0.8, zorder=15)
-    ax1.plot(x_axis, [smoothing(indegree_change_dict, x, 50) for x in x_axis], color=cornflower_blue, alpha=1, zorder=15)
+        ax1.plot(x_axis, bands.smoothed(x_axis, i), color=cornflower_blue, alpha=0.8, zorder=15)
+    ax1.plot(x_axis, bands.smoothed(x_axis, 50), color=cornflower_blue, alpha=1, zorder=15)
 
     ax1.set_ylim([-0.9, 0.9])
     ax1.set_xlabel('indegree', fontsize=12)
@@ -158,10 +133,10 @@ def main():
     ax1.set_title('(a)', fontsize=12)
     ax1.tick_params(axis='both', which='major', labelsize=10)
 
-    plot_contour(indegree_change_dict, target_x=100, ax=ax1)
+    plot_contour(bands, target_x=100, ax=ax1)
 
     x_axis = range(1, 1 + T)
-    y_axis = [link_frequency_counter[x] for x in x_axis]
+    y_axis = link_frequency[1: 1 + T].tolist()
 
     print('\nephemeral links of frequency 1, {0}, {1:.2f}%'.format(y_axis[0], y_axis[0] / sum(y_axis) * 100))
     print('persistent links of frequency 63, {0}, {1:.2f}%'.format(y_axis[-1], y_axis[-1] / sum(y_axis) * 100))
@@ -5,12 +5,11 @@
 and the probability of videos shown in recommended list originate from relevant list.
 
 Usage: python plot_fig3_rel2rec.py
-Input data files: ../data/recsys/
-Time: ~10M
+Input data files: ../data/rel2rec_counts.npz from extract_network_pickle.py, or ../data/recsys/ if it does not exist
+Time: ~1M on 16 cores
 """
 
-import sys, os, platform, json
-import numpy as np
+import sys, os, platform
 
 import matplotlib as mpl
 if platform.system() == 'Linux':
@@ -22,22 +21,7 @@ mpl.rcParams['lines.linewidth'] = 1
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.helper import Timer
 from utils.plot import ColorPalette, hide_spines, stackedBarPlot
-
-
-def switch(x):
-    # categorize into the right bar
-    if x == 0:
-        return 0
-    elif 1 <= x < 5:
-        return 1
-    elif 5 <= x < 10:
-        return 2
-    elif 10 <= x < 15:
-        return 3
-    elif 15 <= x < 30:
-        return 4
-    elif 30 <= x < 50:
-        return 5
+from utils.recsys import count_rel2rec, load_rel2rec_counter
 
 
 def main():
@@ -45,42 +29,21 @@ def main():
     timer = Timer()
     timer.start()
 
-    data_prefix = '../data/recsys'
-
-    num_relevant_by_rank = np.zeros((NUM_REL,))
-    num_recommended_by_rank = np.zeros((NUM_REC,))
+    data_prefix = '../data/'
 
+    # == == == == == == Part 2: Load both relevant list and recommended list == == == == == == #
+    # one pass counts joint positions, statistics for other NUM_REL and NUM_REC are derived from the same counter
+    if os.path.exists(os.path.join(data_prefix, 'rel2rec_counts.npz')):
+        rel2rec_counter = load_rel2rec_counter(os.path.join(data_prefix, 'rel2rec_counts.npz'))
+    else:
+        rel2rec_counter = count_rel2rec(os.path.join(data_prefix, 'recsys'), max_rel=MAX_POSITION, max_rec=MAX_POSITION)
+    rel2rec_stats = rel2rec_counter.rel2rec_stats(NUM_REL, NUM_REC)
+    num_relevant_by_rank = rel2rec_stats['num_relevant_by_rank']
+    num_recommended_by_rank = rel2rec_stats['num_recommended_by_rank']
     # aggregate by rank1, rank2-5, rank6-10, rank11-15
-    dense_relevant_in_recommended_mat = np.zeros((NUM_REL, 4))
+    dense_relevant_in_recommended_mat = rel2rec_stats['dense_relevant_in_recommended']
     # aggregate by rank1, rank2-5, rank6-10, rank11-15, rank16-30, rank31-50
-    dense_recommended_from_relevant_mat = np.zeros((NUM_REC, 6))
-
-    relevant_in_recommended_arr = np.zeros((NUM_REL,))
-    recommended_from_relevant_arr = np.zeros((NUM_REC,))
-
-    # == == == == == == Part 2: Load both relevant list and recommended list == == == == == == #
-    for subdir, _, files in os.walk(data_prefix):
-        for f in files:
-            with open(os.path.join(subdir, f), 'r') as fin:
-                for line in fin:
-                    network_json = json.loads(line.rstrip())
-                    recommended_list = network_json['recommended_list'][: NUM_REC]
-                    relevant_list = network_json['relevant_list'][: NUM_REL]
-
-                    num_relevant_by_rank += np.pad(np.ones(len(relevant_list)), (0, NUM_REL - len(relevant_list)), 'constant')
-                    num_recommended_by_rank += np.pad(np.ones(len(recommended_list)), (0, NUM_REC - len(recommended_list)), 'constant')
-
-                    for rel_rank, vid in enumerate(relevant_list):
-                        if vid in recommended_list:
-                            relevant_in_recommended_arr[rel_rank] += 1
-                            position_on_recommended = recommended_list.index(vid)
-                            dense_relevant_in_recommended_mat[rel_rank, switch(position_on_recommended)] += 1
-
-                    for rec_rank, vid in enumerate(recommended_list):
-                        if vid in relevant_list:
-                            recommended_from_relevant_arr[rec_rank] += 1
-                            position_on_relevant = relevant_list.index(vid)
-                            dense_recommended_from_relevant_mat[rec_rank, switch(position_on_relevant)] += 1
+    dense_recommended_from_relevant_mat = rel2rec_stats['dense_recommended_from_relevant']
 
     # == == == == == == Part 3: Plot probabilities in each position == == == == == == #
     fig, axes = plt.subplots(1, 2, figsize=(12, 4))
@@ -133,5 +96,6 @@ def main():
 if __name__ == '__main__':
     NUM_REL = 50
     NUM_REC = 15
+    MAX_POSITION = 50
 
     main()
@@ -5,15 +5,15 @@
 It also outputs the data for table 2.
 
 Usage: python plot_fig4_basic_statistics.py
-Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/vevo_en_videos_60k.json, ../data/network_pickle/
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/vevo_en_videos_60k.json,
+                  ../data/network_pickle/indegree_cube.npy, built from ../data/network_pickle/ if it does not exist
 Time: ~2M
 """
 
-import sys, os, platform, pickle
-from datetime import datetime, timedelta
+import sys, os, platform
+from datetime import datetime
 import numpy as np
 from scipy.stats import spearmanr, percentileofscore
-from collections import Counter, defaultdict
 from powerlaw import Fit, plot_ccdf
 
 import matplotlib as mpl
@@ -28,6 +28,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.helper import Timer, str2obj, gini
 from utils.data_loader import DataLoader
 from utils.plot import ColorPalette, concise_fmt, hide_spines, stackedBarPlot
+from utils.scanner import load_indegree_cube
 
 
 def main():
@@ -54,34 +55,17 @@ def main():
             target_day_view_list[target_idx].append(embed_view_dict[embed][target_day])
 
     # == == == == == == Part 3: Load dynamic network snapshot == == == == == == #
-    embed_indegree_dict = {embed: np.zeros((T,)) for embed in np.arange(num_videos)}  # daily indegree for each embed
-    zero_indegree_list = []  # percentage of zero indegree for each day
-    num_edges_list = []  # number of total edges for each day
-    for t in range(T):
-        filename = 'network_{0}.p'.format((datetime(2018, 9, 1) + timedelta(days=t)).strftime('%Y-%m-%d'))
-        indegree_list = []
-        with open(os.path.join(data_prefix, 'network_pickle', filename), 'rb') as fin:
-            network_dict = pickle.load(fin)
-            # embed_tar: [(embed_src, pos_src, view_src), ...]
-            for tar_embed in range(num_videos):
-                indegree_value = len([1 for x in network_dict[tar_embed] if x[1] < NUM_REL])
-                embed_indegree_dict[tar_embed][t] = indegree_value
-                indegree_list.append(indegree_value)
-        indegree_counter = Counter(indegree_list)
-        zero_indegree_list.append(indegree_counter[0] / num_videos)
-        num_edges_list.append(sum(indegree_list))
-        print('>>> Finish loading day {0}...'.format(t + 1))
-    print('>>> Network structure has been loaded!')
+    indegree_mat = load_indegree_cube(data_prefix, num_videos, T=T)[:, :, NUM_REL - 1].astype(np.int64)
+    embed_indegree_dict = {embed: indegree_mat[embed] for embed in range(num_videos)}  # daily indegree for each embed
+    zero_indegree_list = list(np.mean(indegree_mat == 0, axis=0))  # percentage of zero indegree for each day
+    num_edges_list = list(np.sum(indegree_mat, axis=0))  # number of total edges for each day
     print('\n>>> Average number of edges: {0:.0f}, max: {1:.0f}, min: {2:.0f}'.format(sum(num_edges_list) / len(num_edges_list), max(num_edges_list), min(num_edges_list)))
 
     fig, axes = plt.subplots(1, 3, figsize=(12, 4.5))
     ax1, ax2, ax3 = axes.ravel()
 
     # == == == == == == Part 4: Plot ax1 indegree CCDF == == == == == == #
-    embed_avg_indegree_dict = defaultdict(float)
-    for t in range(T):
-        for embed in range(num_videos):
-            embed_avg_indegree_dict[embed] += embed_indegree_dict[embed][t] / T
+    embed_avg_indegree_dict = dict(enumerate(np.mean(indegree_mat, axis=1)))
 
     indegree_ranked_embed_list = [x[0] for x in sorted(embed_avg_indegree_dict.items(), key=lambda kv: kv[1], reverse=True)]
     top_20_indegree_embeds = indegree_ranked_embed_list[:20]
@@ -89,9 +73,7 @@ def main():
     top_20_popular_embeds = popular_ranked_embed_list[:20]
 
     for target_idx, target_day in enumerate(target_day_indices):
-        indegree_list = []
-        for embed in range(num_videos):
-            indegree_list.append(embed_indegree_dict[embed][target_day])
+        indegree_list = indegree_mat[:, target_day]
 
         print('video with 10 indegree has more in-links than {0:.2f}% videos on date {1}'.format(percentileofscore(indegree_list, 10), date_labels[target_idx]))
         print('video with 20 indegree has more in-links than {0:.2f}% videos on date {1}'.format(percentileofscore(indegree_list, 20), date_labels[target_idx]))
@@ -4,20 +4,21 @@
 """ Plot how videos connect to one another, partitioned by avg views.
 
 Usage: python plot_fig5_how_videos_connect.py
-Input data files: ../data/vevo_forecast_data_60k.csv, ../data/network_pickle/
+Input data files: ../data/vevo_forecast_data_60k.csv,
+                  ./snapshot_measures.npz from scan_snapshots.py, or ../data/network_pickle/ if it does not exist
 Time: ~2M
 """
 
-import sys, os, itertools, pickle
-from datetime import datetime, timedelta
+import sys, os, itertools
 import numpy as np
 import igraph
 from network2tikz import plot
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.data_loader import DataLoader
-from utils.helper import Timer
+from utils.helper import Timer, quartile_partition
 from utils.plot import ColorPalette
+from utils.scanner import SnapshotScanner, PartitionEdgeAccumulator, load_snapshot_measures
 
 
 def scaler(arr):
@@ -40,37 +41,18 @@ def main():
     num_videos = data_loader.num_videos
 
     # == == == == == == Part 3: Build views percentile partition == == == == == == #
-    day_views = list(embed_avg_view_dict.values())
-    median_value = np.median(day_views)
     # the top 1st quantile is 75th percentile and above
-    first_quantile_value = np.percentile(day_views, 75)
-    third_quantile_value = np.percentile(day_views, 25)
-
-    embed_percentile_dict = {}
-    for embed in np.arange(num_videos):
-        if embed_avg_view_dict[embed] >= first_quantile_value:
-            embed_percentile_dict[embed] = 0
-        elif embed_avg_view_dict[embed] >= median_value:
-            embed_percentile_dict[embed] = 1
-        elif embed_avg_view_dict[embed] >= third_quantile_value:
-            embed_percentile_dict[embed] = 2
-        else:
-            embed_percentile_dict[embed] = 3
+    embed_percentile_arr = quartile_partition([embed_avg_view_dict[embed] for embed in range(num_videos)])
 
     # == == == == == == Part 4: Load dynamic network snapshot == == == == == == #
-    edge_weight_mat = np.zeros((4, 4), dtype=np.float32)
-    for t in range(T):
-        filename = 'network_{0}.p'.format((datetime(2018, 9, 1) + timedelta(days=t)).strftime('%Y-%m-%d'))
-        with open(os.path.join(data_prefix, 'network_pickle', filename), 'rb') as fin:
-            network_dict = pickle.load(fin)
-            # embed_tar: [(embed_src, pos_src, view_src), ...]
-            for embed_tar in range(num_videos):
-                for embed_src, pos_src, _ in network_dict[embed_tar]:
-                    if pos_src < NUM_REL:
-                        edge_weight_mat[(embed_percentile_dict[embed_src], embed_percentile_dict[embed_tar])] += 1 / T
-        print('>>> Finish loading day {0}...'.format(t + 1))
-    edge_weight_mat = edge_weight_mat.astype(np.int)
-    print('>>> Network structure has been loaded!')
+    if os.path.exists('snapshot_measures.npz'):
+        snapshot_measures = load_snapshot_measures('snapshot_measures.npz')
+    else:
+        scanner = SnapshotScanner(data_prefix, num_videos, T=T)
+        scanner.register(PartitionEdgeAccumulator(embed_percentile_arr, 4, T, num_rel=NUM_REL))
+        snapshot_measures = scanner.scan()
+    # average number of edges per day
+    edge_weight_mat = (np.sum(snapshot_measures['partition_edge_mats'], axis=0) / T).astype(np.int64)
 
     # == == == == == == Part 5: Plot graph by network2tikz == == == == == == #
     # Network
@@ -2,10 +2,10 @@
 # -*- coding: utf-8 -*-
 
 """ Plot how bow-tie structure changes with cutoff.
-Note: need run 'python how_bowtie_changes_with_cutoff.py' to generate ./bowtie_cutoff.log
+Note: need run 'python how_bowtie_changes_with_cutoff.py' to generate ./bowtie_cutoff.npz or ./bowtie_cutoff.log
 
 Usage: python plot_fig7_bowtie_changes_with_cutoff.py
-Input data files: ./bowtie_cutoff.log
+Input data files: ./bowtie_cutoff.npz, or ./bowtie_cutoff.log if the npz file does not exist
 Time: ~1M
 """
 
@@ -19,6 +19,7 @@ import matplotlib.pyplot as plt
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.plot import ColorPalette
+from utils.bowtie import load_bowtie_results, bowtie_fractions
 
 
 def extract_percentage(line):
@@ -30,46 +31,53 @@ def main():
     tomato = ColorPalette.TOMATO
     cornflower_blue = ColorPalette.BLUE
 
-    x_axis = range(5, 51)
+    x_axis = list(range(5, 51))
     lscc_structure, in_structure, out_structure, tendrils_structure, disc_structure = [], [], [], [], []
     structure_list = [lscc_structure, in_structure, out_structure, tendrils_structure, disc_structure]
     lscc_attention, in_attention, out_attention, tendrils_attention, disc_attention = [], [], [], [], []
     attention_list = [lscc_attention, in_attention, out_attention, tendrils_attention, disc_attention]
     label_list = ['LSCC', 'IN', 'OUT', 'Tendrils', 'Disconnected']
 
-    with open('bowtie_cutoff.log', 'r') as fin:
-        for line in fin:
-            if 'nodes in the largest SCC' in line:
-                lscc_structure.append(extract_percentage(line))
-            elif 'views in the largest SCC' in line:
-                lscc_attention.append(extract_percentage(line))
-            elif 'nodes in the IN component' in line:
-                in_structure.append(extract_percentage(line))
-            elif 'views in the IN component' in line:
-                in_attention.append(extract_percentage(line))
-            elif 'nodes in the OUT component' in line:
-                out_structure.append(extract_percentage(line))
-            elif 'views in the OUT component' in line:
-                out_attention.append(extract_percentage(line))
-            elif 'nodes in the Tendrils' in line:
-                tendrils_structure.append(extract_percentage(line))
-            elif 'views in the Tendrils' in line:
-                tendrils_attention.append(extract_percentage(line))
-            elif 'nodes in the Disconnected' in line:
-                disc_structure.append(extract_percentage(line))
-            elif 'views in the Disconnected' in line:
-                disc_attention.append(extract_percentage(line))
-
+    if os.path.exists('bowtie_cutoff.npz'):
+        bowtie_results = load_bowtie_results('bowtie_cutoff.npz')
+        x_axis = bowtie_results['x_values'].tolist()
+        structure_list, attention_list = bowtie_fractions(bowtie_results)
+    else:
+        with open('bowtie_cutoff.log', 'r') as fin:
+            for line in fin:
+                if 'nodes in the largest SCC' in line:
+                    lscc_structure.append(extract_percentage(line))
+                elif 'views in the largest SCC' in line:
+                    lscc_attention.append(extract_percentage(line))
+                elif 'nodes in the IN component' in line:
+                    in_structure.append(extract_percentage(line))
+                elif 'views in the IN component' in line:
+                    in_attention.append(extract_percentage(line))
+                elif 'nodes in the OUT component' in line:
+                    out_structure.append(extract_percentage(line))
+                elif 'views in the OUT component' in line:
+                    out_attention.append(extract_percentage(line))
+                elif 'nodes in the Tendrils' in line:
+                    tendrils_structure.append(extract_percentage(line))
+                elif 'views in the Tendrils' in line:
+                    tendrils_attention.append(extract_percentage(line))
+                elif 'nodes in the Disconnected' in line:
+                    disc_structure.append(extract_percentage(line))
+                elif 'views in the Disconnected' in line:
+                    disc_attention.append(extract_percentage(line))
+
+    # highlight the cutoff of 15 used throughout the paper
+    highlight_x = 15
+    highlight_idx = x_axis.index(highlight_x)
     for col_idx in range(len(structure_list)):
         axes[0, col_idx].plot(x_axis, structure_list[col_idx], color=cornflower_blue, lw=1.5)
         axes[1, col_idx].plot(x_axis, attention_list[col_idx], color=cornflower_blue, lw=1.5)
 
-        axes[0, col_idx].scatter(x_axis[10], structure_list[col_idx][10], s=15, c=tomato, edgecolors='k', zorder=30)
-        axes[1, col_idx].scatter(x_axis[10], attention_list[col_idx][10], s=15, c=tomato, edgecolors='k', zorder=30)
-        axes[0, col_idx].text(x_axis[10], structure_list[col_idx][10], '{0:.4f}'.format(structure_list[col_idx][10]),
-                              size=11, ha='left', va='bottom')
-        axes[1, col_idx].text(x_axis[10], attention_list[col_idx][10], '{0:.4f}'.format(attention_list[col_idx][10]),
-                              size=11, ha='left', va='bottom')
+        for row_idx, fraction_list in enumerate([structure_list[col_idx], attention_list[col_idx]]):
+            highlight_y = fraction_list[highlight_idx]
+            axes[row_idx, col_idx].scatter(highlight_x, highlight_y, s=15, c=tomato, edgecolors='k', zorder=30)
+            axes[row_idx, col_idx].text(highlight_x, highlight_y, '{0:.4f}'.format(highlight_y),
+                                        size=11, ha='left', va='bottom')
 
         axes[0, col_idx].set_title(label_list[col_idx], fontsize=13)
 
@@ -4,11 +4,12 @@
 """ Plot spearman correlation in each year.
 
 Usage: python plot_fig8_yearly_spearmanr.py
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/vevo_en_videos_60k.json,
+                  ../data/network_pickle/indegree_cube.npy, built from ../data/network_pickle/ if it does not exist
 Time: ~2M
 """
 
-import os, sys, platform, pickle
-from datetime import datetime, timedelta
+import os, sys, platform
 import numpy as np
 from scipy.stats import spearmanr
 
@@ -20,8 +21,9 @@ import matplotlib.pyplot as plt
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.data_loader import DataLoader
-from utils.helper import Timer, obj2str
+from utils.helper import Timer
 from utils.plot import ColorPalette, hide_spines
+from utils.scanner import load_indegree_cube
 
 
 def main():
@@ -53,20 +55,11 @@ def main():
     indegrees_by_years_list = [[] for _ in range(num_year)]
 
     # == == == == == == Part 3: Load dynamic network snapshot == == == == == == #
-    embed_indegree_dict_15 = {embed: np.zeros((T,)) for embed in np.arange(num_videos)}
-    for t in range(T):
-        filename = 'network_{0}.p'.format(obj2str(datetime(2018, 9, 1) + timedelta(days=t)))
-        with open(os.path.join(data_prefix, 'network_pickle', filename), 'rb') as fin:
-            network_dict = pickle.load(fin)
-            # embed_tar: [(embed_src, pos_src, view_src)]
-            for embed in range(num_videos):
-                embed_indegree_dict_15[embed][t] = len([1 for x in network_dict[embed] if x[1] < NUM_REL_15])
-        print('>>> Finish loading day {0}...'.format(t + 1))
-    print('>>> Network structure has been loaded!')
+    avg_indegree_15 = np.mean(load_indegree_cube(data_prefix, num_videos, T=T)[:, :, NUM_REL_15 - 1], axis=1)
 
     for embed in range(num_videos):
         views_by_years_list[embed_uploadtime_dict[embed]].append(embed_avg_view_dict[embed])
-        indegrees_by_years_list[embed_uploadtime_dict[embed]].append(np.mean(embed_indegree_dict_15[embed]))
+        indegrees_by_years_list[embed_uploadtime_dict[embed]].append(avg_indegree_15[embed])
 
     spearman_traces = []
     all_views, all_indegrees = [], []
@@ -2,10 +2,10 @@
 # -*- coding: utf-8 -*-
 
 """ Plot how bow-tie structure evolves over time.
-Note: need run 'python how_bowtie_evolves.py' to generate ./bowtie_evolves.log
+Note: need run 'python how_bowtie_evolves.py' to generate ./bowtie_evolves.npz or ./bowtie_evolves.log
 
 Usage: python plot_fig9_bowtie_evolves.py
-Input data files: ./bowtie_evolves.log
+Input data files: ./bowtie_evolves.npz, or ./bowtie_evolves.log if the npz file does not exist
 Time: ~1M
 """
 
@@ -19,6 +19,7 @@ import matplotlib.pyplot as plt
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.plot import ColorPalette
+from utils.bowtie import load_bowtie_results, bowtie_fractions
 
 
 def extract_percentage(line):
@@ -37,28 +38,31 @@ def main():
     attention_list = [lscc_attention, in_attention, out_attention, tendrils_attention, disc_attention]
     label_list = ['LSCC', 'IN', 'OUT', 'Tendrils', 'Disconnected']
 
-    with open('bowtie_evolves.log', 'r') as fin:
-        for line in fin:
-            if 'nodes in the largest SCC' in line:
-                lscc_structure.append(extract_percentage(line))
-            elif 'views in the largest SCC' in line:
-                lscc_attention.append(extract_percentage(line))
-            elif 'nodes in the IN component' in line:
-                in_structure.append(extract_percentage(line))
-            elif 'views in the IN component' in line:
-                in_attention.append(extract_percentage(line))
-            elif 'nodes in the OUT component' in line:
-                out_structure.append(extract_percentage(line))
-            elif 'views in the OUT component' in line:
-                out_attention.append(extract_percentage(line))
-            elif 'nodes in the Tendrils' in line:
-                tendrils_structure.append(extract_percentage(line))
-            elif 'views in the Tendrils' in line:
-                tendrils_attention.append(extract_percentage(line))
-            elif 'nodes in the Disconnected' in line:
-                disc_structure.append(extract_percentage(line))
-            elif 'views in the Disconnected' in line:
-                disc_attention.append(extract_percentage(line))
+    if os.path.exists('bowtie_evolves.npz'):
+        structure_list, attention_list = bowtie_fractions(load_bowtie_results('bowtie_evolves.npz'))
+    else:
+        with open('bowtie_evolves.log', 'r') as fin:
+            for line in fin:
+                if 'nodes in the largest SCC' in line:
+                    lscc_structure.append(extract_percentage(line))
+                elif 'views in the largest SCC' in line:
+                    lscc_attention.append(extract_percentage(line))
+                elif 'nodes in the IN component' in line:
+                    in_structure.append(extract_percentage(line))
+                elif 'views in the IN component' in line:
+                    in_attention.append(extract_percentage(line))
+                elif 'nodes in the OUT component' in line:
+                    out_structure.append(extract_percentage(line))
+                elif 'views in the OUT component' in line:
+                    out_attention.append(extract_percentage(line))
+                elif 'nodes in the Tendrils' in line:
+                    tendrils_structure.append(extract_percentage(line))
+                elif 'views in the Tendrils' in line:
+                    tendrils_attention.append(extract_percentage(line))
+                elif 'nodes in the Disconnected' in line:
+                    disc_structure.append(extract_percentage(line))
+                elif 'views in the Disconnected' in line:
+                    disc_attention.append(extract_percentage(line))
 
     for col_idx in range(len(structure_list)):
         axes[0, col_idx].plot(x_axis, structure_list[col_idx], color=cornflower_blue, lw=1.5)
@@ -12,6 +12,12 @@ python plot_fig3_rel2rec.py.py >> "$log_file"
 sleep 60
 echo '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++' >> "$log_file"
 
+# scan all network snapshots once, figures 4, 5, 8 and 10 read the aggregates from ./snapshot_measures.npz
+python scan_snapshots.py >> "$log_file"
+
+sleep 60
+echo '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++' >> "$log_file"
+
 python plot_fig4_basic_statistics.py >> "$log_file"
 
 sleep 60
@@ -22,7 +28,7 @@ python plot_fig5_how_videos_connect.py >> "$log_file"
 sleep 60
 echo '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++' >> "$log_file"
 
-## I provide the result 'bowtie_cutoff.log' so unnecessary to run this script, it takes about 2 hours to finish
+## I provide the result 'bowtie_cutoff.log' so unnecessary to run this script, it takes about 1 minute to finish
 # python how_bowtie_changes_with_cutoff.py >> "$log_file"
 python plot_fig7_bowtie_changes_with_cutoff.py >> "$log_file"
 
@@ -34,7 +40,7 @@ python plot_fig8_yearly_spearmanr.py >> "$log_file"
 sleep 60
 echo '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++' >> "$log_file"
 
-## I provide the result 'bowtie_evolves.log' so unnecessary to run this script, it takes about 3 hours to finish
+## I provide the result 'bowtie_evolves.log' so unnecessary to run this script, it takes about 2 minutes to finish
 # python python how_bowtie_evolves.py.py >> "$log_file"
 python plot_fig9_bowtie_evolves.py >> "$log_file"
 
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Scan all network snapshots once and save the aggregates shared by the measures figures,
+i.e., cumulative indegree cube over days and cutoffs, edges between views quartiles, link frequency, and link lifetime.
+
+Usage: python scan_snapshots.py
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/network_pickle/
+Output data files: ./snapshot_measures.npz, ../data/network_pickle/indegree_cube.npy,
+                   ../data/network_pickle/edge_lifetime_15.npz
+Time: ~2M
+"""
+
+import os, sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from utils.data_loader import DataLoader
+from utils.helper import Timer, quartile_partition
+from utils.scanner import SnapshotScanner, IndegreeCubeAccumulator, PartitionEdgeAccumulator, EdgeFrequencyAccumulator, \
+    EdgeLifetimeAccumulator, get_indegree_cube_path, get_edge_lifetime_path
+
+
+def main():
+    # == == == == == == Part 1: Set up environment == == == == == == #
+    timer = Timer()
+    timer.start()
+
+    data_prefix = '../data/'
+
+    # == == == == == == Part 2: Load video views == == == == == == #
+    data_loader = DataLoader()
+    data_loader.load_video_views()
+    embed_avg_view_dict = data_loader.embed_avg_view_dict
+    num_videos = data_loader.num_videos
+    embed_percentile_arr = quartile_partition([embed_avg_view_dict[embed] for embed in range(num_videos)])
+
+    # == == == == == == Part 3: Scan dynamic network snapshot once == == == == == == #
+    scanner = SnapshotScanner(data_prefix, num_videos, T=T)
+    scanner.register(IndegreeCubeAccumulator(get_indegree_cube_path(data_prefix), num_videos, T))
+    scanner.register(PartitionEdgeAccumulator(embed_percentile_arr, 4, T, num_rel=NUM_REL))
+    scanner.register(EdgeFrequencyAccumulator(num_videos, T, num_rel=NUM_REL))
+    scanner.register(EdgeLifetimeAccumulator(get_edge_lifetime_path(data_prefix, NUM_REL), num_videos, T, num_rel=NUM_REL))
+    np.savez_compressed('snapshot_measures.npz', **scanner.scan())
+    print('>>> Snapshot measures have been saved to ./snapshot_measures.npz')
+
+    timer.stop()
+
+
+if __name__ == '__main__':
+    NUM_REL = 15
+    T = 63
+
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Backtest Naive, SeasonalNaive, AutoRegression, RNN and ARNet over rolling forecast origins.
+At each origin, models are trained on all days before it and forecast the next week. The last origin is the split of
+forecast_next_week.py (train 2018-09-01 - 2018-10-26, test 2018-10-27 - 2018-11-02).
+
+Usage: python backtest_forecasters.py [first_origin] [origin_step] [num_chains]
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/persistent_network.csv
+Output data files: ./model_results/backtest_error_cube.npz
+Time: ~5H
+"""
+
+import sys, os
+from collections import defaultdict
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from utils.helper import Timer
+from utils.data_loader import DataLoader
+from models.backtesting import MODEL_NAMES, run_backtest, pivot_error_cube, save_error_cube
+
+
+def main():
+    # == == == == == == Part 1: Set up environment == == == == == == #
+    timer = Timer()
+    timer.start()
+
+    data_prefix = '../data/'
+    result_dirname = './model_results'
+    if not os.path.exists(result_dirname):
+        os.makedirs(result_dirname)
+
+    first_origin = int(sys.argv[1]) if len(sys.argv) > 1 else 28
+    origin_step = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    num_chains = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    # origins counted back from the last one, so the split of forecast_next_week.py is always included
+    origins = np.arange(T - NUM_OUTPUT, first_origin - 1, -origin_step)[::-1]
+
+    # == == == == == == Part 2: Load target videos set == == == == == == #
+    tar_inlink_dict = defaultdict(list)
+    with open(os.path.join(data_prefix, 'persistent_network.csv'), 'r') as fin:
+        fin.readline()
+        for line in fin:
+            src_embed, tar_embed = map(int, line.rstrip().split(','))
+            tar_inlink_dict[tar_embed].append(src_embed)
+    print('{0} videos to backtest at {1} origins'.format(len(tar_inlink_dict), len(origins)))
+
+    # == == == == == == Part 3: Load video views == == == == == == #
+    data_loader = DataLoader()
+    data_loader.load_video_views()
+    embed_view_dict = data_loader.embed_view_dict
+    view_mat = np.array([embed_view_dict[embed] for embed in range(data_loader.num_videos)])
+
+    # == == == == == == Part 4: Backtest over origins == == == == == == #
+    error_cube = run_backtest(view_mat, tar_inlink_dict, origins, model_names=MODEL_NAMES, num_chains=num_chains,
+                              num_input=NUM_INPUT, num_output=NUM_OUTPUT, freq=FREQ, num_neurons=NUM_NEURONS,
+                              num_ensemble=NUM_ENSEMBLE, arnet_tol=ARNET_TOL)
+    save_error_cube(error_cube, os.path.join(result_dirname, 'backtest_error_cube.npz'))
+
+    for model_name in MODEL_NAMES:
+        smape_cube = pivot_error_cube(error_cube, '{0}_smape'.format(model_name))
+        print('{0}, mean sMAPE over origins: {1}, over horizons: {2}'.format(
+            model_name, np.round(np.mean(smape_cube, axis=(0, 2)), 3).tolist(),
+            np.round(np.mean(smape_cube, axis=(0, 1)), 3).tolist()))
+
+    timer.stop()
+
+
+if __name__ == '__main__':
+    T = 63
+
+    FREQ = 7
+    NUM_INPUT = 7
+    NUM_OUTPUT = 7
+    NUM_NEURONS = 25
+    NUM_ENSEMBLE = 3
+    # e.g., 0.01 to stop the ARNet ensemble once a member moves its mean by less than 1%, None fits all members
+    ARNET_TOL = None
+
+    main()
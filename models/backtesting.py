@@ -0,0 +1,175 @@
+""" Rolling-origin backtesting of the predictors.
+At forecast origin o, each predictor is trained on days [0, o) and forecasts days [o, o + num_output), as in
+forecast_next_week.py at origin T - num_output. Origins of a video are walked in order so that the first member of
+the ARNet and RNN ensembles starts from the parameters fitted at the previous origin, the other members start from
+random values as at the first origin, so ensembles have the same size at every origin. Chains of origins run in
+parallel.
+"""
+
+import sys, os, time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from models.predictors import Naive, SeasonalNaive, AutoRegression, ARNet, TemporalLSTM, LSTMModelPool, with_fallback
+
+MODEL_NAMES = ['naive', 'snaive', 'ar', 'rnn', 'arnet']
+# one compiled LSTM model per worker process, chains of a worker run one after another
+MODEL_POOL = LSTMModelPool()
+
+
+def forecast_at_origin(tar_ts_data, src_ts_data_mat, origin, model_names, config, warm_state):
+    """ Forecast the num_output days from origin with each model, and update warm_state with the fitted parameters.
+    AR falls back to seasonal naive if its fit fails, RNN and ARNet to AR if they run out of retries or time.
+    :return: dict of model name to predicted values, array of shape (num_output,),
+    dict of model name to the fallback used or None
+    """
+    num_output = config['num_output']
+    # the predictors take the test days at the end of the series
+    ts_data = tar_ts_data[: origin + num_output]
+    preds = {}
+    fallbacks = {}
+
+    snaive_pred = SeasonalNaive(ts_data, num_output=num_output).pred_test_output
+    if 'naive' in model_names:
+        preds['naive'] = Naive(ts_data, num_output=num_output).pred_test_output
+    if 'snaive' in model_names:
+        preds['snaive'] = snaive_pred
+
+    ar_model = AutoRegression(ts_data, num_output=num_output)
+    if 'ar' in model_names or 'rnn' in model_names or 'arnet' in model_names:
+        try:
+            ar_model.train_ar(lag=config['freq'])
+        except (ValueError, np.linalg.LinAlgError):
+            pass
+        preds['ar'], fallbacks['ar'] = with_fallback(ar_model.pred_test_output, [('snaive', snaive_pred)])
+
+    if 'rnn' in model_names:
+        rnn_model = TemporalLSTM(ts_data, num_input=config['num_input'], num_output=num_output,
+                                 num_features=1, num_neurons=config['num_neurons'], freq=config['freq'],
+                                 num_ensemble=config['num_ensemble'])
+        rnn_model.prepare_tensor()
+        rnn_model.create_model(model_pool=MODEL_POOL)
+        # the first fit continues training the network of the previous origin
+        rnn_model.train_lstm(max_retries=config['max_retries'], deadline=time.time() + config['rnn_time_budget'],
+                             warm_weights=warm_state.get('rnn'))
+        if rnn_model.fitted_weights is not None:
+            warm_state['rnn'] = rnn_model.fitted_weights
+        preds['rnn'], fallbacks['rnn'] = with_fallback(rnn_model.pred_test_output, [('ar', ar_model.pred_test_output),
+                                                                                    ('snaive', snaive_pred)])
+
+    if 'arnet' in model_names:
+        start_link_weights = warm_state.get('arnet')
+        arnet_model = ARNet(ts_data, src_ts_data_mat=src_ts_data_mat[:, : origin + num_output],
+                            num_input=config['num_input'], num_output=num_output,
+                            num_ensemble=config['num_ensemble'])
+        if fallbacks['ar'] is None:
+            arnet_model.train_arnet(start_params=list(ar_model.fitted_params), start_link_weights=start_link_weights,
+                                    max_retries=config['max_retries'],
+                                    deadline=time.time() + config['arnet_time_budget'],
+                                    batch_size=config['arnet_batch_size'], tol=config['arnet_tol'])
+        if arnet_model.link_weights is not None:
+            warm_state['arnet'] = np.nan_to_num(arnet_model.link_weights)
+        preds['arnet'], fallbacks['arnet'] = with_fallback(arnet_model.pred_test_output,
+                                                           [('ar', ar_model.pred_test_output), ('snaive', snaive_pred)])
+
+    return preds, fallbacks
+
+
+def backtest_chain(tar_embed, tar_ts_data, src_ts_data_mat, origins, model_names, config):
+    """ Backtest one video over consecutive origins, each origin warm started from the previous one.
+    :return: tar_embed, origins, predicted values of shape (num_models, num_origins, num_output),
+    fallbacks of shape (num_models, num_origins), empty if the model made its own prediction
+    """
+    pred_cube = np.full((len(model_names), len(origins), config['num_output']), np.nan)
+    fallback_mat = np.full((len(model_names), len(origins)), '', dtype='<U8')
+    warm_state = {}
+    for origin_idx, origin in enumerate(origins):
+        preds, fallbacks = forecast_at_origin(tar_ts_data, src_ts_data_mat, origin, model_names, config, warm_state)
+        for model_idx, model_name in enumerate(model_names):
+            pred_cube[model_idx, origin_idx] = preds[model_name]
+            fallback_mat[model_idx, origin_idx] = fallbacks.get(model_name) or ''
+    return tar_embed, origins, pred_cube, fallback_mat
+
+
+def run_backtest(view_mat, tar_inlink_dict, origins, model_names=MODEL_NAMES, num_chains=1, num_workers=None,
+                 num_input=7, num_output=7, freq=7, num_neurons=25, num_ensemble=3, max_retries=10,
+                 rnn_time_budget=300, arnet_time_budget=120, arnet_batch_size=1, arnet_tol=None):
+    """ Backtest every target video in tar_inlink_dict at every origin.
+    Origins are split into num_chains contiguous chains, which run in parallel across videos and chains.
+    RNN and ARNet ensembles are capped at max_retries rejected fits and a time budget in seconds per origin,
+    ARNet members are fitted arnet_batch_size at a time and stop early within arnet_tol, see ARNet.train_arnet.
+
+    :param view_mat: daily views of all videos, array of shape (num_videos, T)
+    :param tar_inlink_dict: source videos of each target video, as loaded from persistent_network.csv
+    :return: columnar error cube, see build_error_cube
+    """
+    config = {'num_input': num_input, 'num_output': num_output, 'freq': freq, 'num_neurons': num_neurons,
+              'num_ensemble': num_ensemble, 'max_retries': max_retries, 'rnn_time_budget': rnn_time_budget,
+              'arnet_time_budget': arnet_time_budget, 'arnet_batch_size': arnet_batch_size, 'arnet_tol': arnet_tol}
+    origins = np.asarray(origins)
+    if origins.min() < num_input + 2 * num_output or origins.max() + num_output > view_mat.shape[1]:
+        raise ValueError('origins must be between {0} and {1}'.format(num_input + 2 * num_output,
+                                                                      view_mat.shape[1] - num_output))
+    tar_embed_list = sorted(tar_inlink_dict.keys())
+    chain_list = [chain for chain in np.array_split(origins, num_chains) if len(chain) > 0]
+
+    tasks = []
+    for tar_embed in tar_embed_list:
+        # data preparation is shared by all origins, each origin takes a prefix of the series
+        tar_ts_data = view_mat[tar_embed]
+        src_ts_data_mat = view_mat[tar_inlink_dict[tar_embed]]
+        for chain in chain_list:
+            tasks.append((tar_embed, tar_ts_data, src_ts_data_mat, chain))
+
+    pred_cube = np.full((len(model_names), len(tar_embed_list), len(origins), num_output), np.nan)
+    fallback_cube = np.full((len(model_names), len(tar_embed_list), len(origins)), '', dtype='<U8')
+    tar_idx_dict = {tar_embed: tar_idx for tar_idx, tar_embed in enumerate(tar_embed_list)}
+    origin_idx_dict = {origin: origin_idx for origin_idx, origin in enumerate(origins.tolist())}
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(backtest_chain, *task, model_names, config) for task in tasks]
+        for future in futures:
+            tar_embed, chain, chain_pred_cube, chain_fallback_mat = future.result()
+            origin_idx = [origin_idx_dict[origin] for origin in chain.tolist()]
+            pred_cube[:, tar_idx_dict[tar_embed], origin_idx] = chain_pred_cube
+            fallback_cube[:, tar_idx_dict[tar_embed], origin_idx] = chain_fallback_mat
+    return build_error_cube(view_mat, tar_embed_list, origins, model_names, pred_cube, fallback_cube)
+
+
+def build_error_cube(view_mat, tar_embed_list, origins, model_names, pred_cube, fallback_cube=None):
+    """ Flatten predictions of shape (num_models, num_targets, num_origins, num_output) into columns,
+    one row per target, origin and horizon, with the true value, and the prediction and sMAPE of each model,
+    and the fallback each model used at that origin if fallback_cube of shape (num_models, num_targets, num_origins)
+    is given.
+    """
+    num_output = pred_cube.shape[-1]
+    tar_embed_arr = np.asarray(tar_embed_list)
+    embed_col, origin_col, horizon_col = [x.ravel() for x in np.meshgrid(tar_embed_arr, origins,
+                                                                         np.arange(1, num_output + 1), indexing='ij')]
+    true_col = view_mat[embed_col, origin_col + horizon_col - 1].astype(np.float64)
+    error_cube = {'embed': embed_col, 'origin': origin_col, 'horizon': horizon_col, 'true': true_col}
+    for model_idx, model_name in enumerate(model_names):
+        pred_col = pred_cube[model_idx].ravel()
+        error_cube['{0}_pred'.format(model_name)] = pred_col
+        # daily sMAPE, zero if both true and pred are zero
+        error_cube['{0}_smape'.format(model_name)] = 200 * np.nan_to_num(np.abs(true_col - pred_col) /
+                                                                         (np.abs(true_col) + np.abs(pred_col)))
+        if fallback_cube is not None:
+            error_cube['{0}_fallback'.format(model_name)] = np.repeat(fallback_cube[model_idx].ravel(), num_output)
+    return error_cube
+
+
+def pivot_error_cube(error_cube, column):
+    """ Dense view of a column of the error cube, array of shape (num_targets, num_origins, num_output)."""
+    num_targets = len(np.unique(error_cube['embed']))
+    num_origins = len(np.unique(error_cube['origin']))
+    return error_cube[column].reshape(num_targets, num_origins, -1)
+
+
+def save_error_cube(error_cube, filepath):
+    np.savez_compressed(filepath, **error_cube)
+
+
+def load_error_cube(filepath):
+    with np.load(filepath) as error_cube:
+        return {column: error_cube[column] for column in error_cube.files}
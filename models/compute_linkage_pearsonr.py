@@ -7,20 +7,21 @@ Probability is computed via simulation.
 Note: need run 'python extract_persistent_network.py' to generate ../data/persistent_network.csv
 
 Usage: python compute_linkage_pearsonr.py
-Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/persistent_network.csv, ../data/network_pickle/
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/persistent_network.csv,
+                  ../data/network_pickle/edge_lifetime_15.npz, or ../data/network_pickle/ if it does not exist
 Output data files: ./reciprocal_pearsonr.log, ./persistent_pearsonr.log, ./ephemeral_pearsonr.log
 Time: ~2H
 """
 
-import sys, os, pickle
-from datetime import datetime, timedelta
+import sys, os
 import numpy as np
 from scipy.stats import pearsonr
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
-from utils.helper import Timer, obj2str
+from utils.helper import Timer
 from utils.data_loader import DataLoader
 from utils.tsa import extract_seasonal_component, extract_trend_component
+from utils.scanner import load_edge_lifetime
 
 
 def detsn(ts_data, freq=7):
@@ -52,6 +53,7 @@ def main():
     data_loader.load_video_views()
     embed_view_dict = data_loader.embed_view_dict
     embed_avg_view_dict = data_loader.embed_avg_view_dict
+    num_videos = data_loader.num_videos
 
     # == == == == == == Part 3: Load persistent and non-persistent network == == == == == == #
     reciprocal_link_set = set()
@@ -71,23 +73,20 @@ def main():
             else:
                 persistent_link_set.add(link)
 
-    for t in range(T):
-        target_date_str = obj2str(datetime(2018, 9, 1) + timedelta(days=t))
-        filename = 'network_{0}.p'.format(target_date_str)
-        network_dict = pickle.load(open(os.path.join(data_prefix, 'network_pickle', filename), 'rb'))
-        for tar_embed in network_dict:
-            src_embed_list = [x[0] for x in network_dict[tar_embed] if x[1] < NUM_REL]
-            if len(src_embed_list) > 0:
-                for src_embed in src_embed_list:
-                    # filter: at least 100 daily views for target video,
-                    # and the mean daily views of source video is at least 1% of the target video
-                    if embed_avg_view_dict[tar_embed] >= 100 and embed_avg_view_dict[src_embed] >= 0.01 * embed_avg_view_dict[tar_embed]:
-                        link = '{0}-{1}'.format(src_embed, tar_embed)
-                        rec_link = '{1}-{0}'.format(src_embed, tar_embed)
-                        if link not in persistent_link_set and rec_link not in persistent_link_set \
-                                and link not in reciprocal_link_set and rec_link not in reciprocal_link_set \
-                                and link not in non_persistent_link_set and rec_link not in non_persistent_link_set:
-                            non_persistent_link_set.add(link)
+    # every link that appears on any day, from the link lifetime index instead of rescanning daily snapshots
+    lifetime_index = load_edge_lifetime(data_prefix, num_videos, T=T, num_rel=NUM_REL)
+    src_arr, tar_arr = lifetime_index.src_tar()
+    avg_view_arr = np.array([embed_avg_view_dict[embed] for embed in range(num_videos)])
+    # filter: at least 100 daily views for target video,
+    # and the mean daily views of source video is at least 1% of the target video
+    is_candidate = (avg_view_arr[tar_arr] >= 100) & (avg_view_arr[src_arr] >= 0.01 * avg_view_arr[tar_arr])
+    for src_embed, tar_embed in zip(src_arr[is_candidate].tolist(), tar_arr[is_candidate].tolist()):
+        link = '{0}-{1}'.format(src_embed, tar_embed)
+        rec_link = '{1}-{0}'.format(src_embed, tar_embed)
+        if link not in persistent_link_set and rec_link not in persistent_link_set \
+                and link not in reciprocal_link_set and rec_link not in reciprocal_link_set \
+                and link not in non_persistent_link_set and rec_link not in non_persistent_link_set:
+            non_persistent_link_set.add(link)
 
     print('>>> Number of reciprocal links: {0}'.format(len(reciprocal_link_set)))
     print('>>> Number of persistent links (non-reciprocal): {0}'.format(len(persistent_link_set)))
@@ -5,12 +5,13 @@
 Training period: 2018-09-01 - 2018-10-26 (8 weeks, 56 days)
 
 Usage: python forecast_next_week.py
-Input data files: ../data/vevo_forecast_data_60k.csv, ../data/persistent_network.csv
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/persistent_network.csv
 Output data files: ./model_results/forecast_tracker_*.log
-Time: ~1M
+Time: ~1M, at most RNN_TIME_BUDGET + ARNET_TIME_BUDGET seconds plus one epoch per video
 """
 
-import sys, os, json, gc
+import sys, os, json, time
+from numpy.linalg import LinAlgError
 from collections import defaultdict
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
@@ -75,8 +76,11 @@ def main():
                     tar_embed_list.append(embed)
     else:
         result_filename = os.path.join(result_dirname, 'forecast_tracker_all.json')
-    fout = open(result_filename, 'a')
     print('{0} videos to model'.format(len(tar_embed_list)))
+    # nothing left in a finished partition
+    if len(tar_embed_list) == 0:
+        return
+    fout = open(result_filename, 'a')
 
     # == == == == == == Part 4: Load video views == == == == == == #
     data_loader = DataLoader()
@@ -84,6 +88,11 @@ def main():
     embed_view_dict = data_loader.embed_view_dict
 
     # == == == == == == Part 5: Start prediction task == == == == == == #
+    # the LSTM model is compiled once and reset for every video
+    model_pool = LSTMModelPool()
+    # LSTM tensors of all videos are prepared at once
+    lstm_tensors = prepare_lstm_tensors(np.array([embed_view_dict[embed][:-NUM_OUTPUT] for embed in tar_embed_list]),
+                                        NUM_INPUT, NUM_OUTPUT, freq=FREQ)
     for item_cnt, tar_embed in enumerate(tar_embed_list):
         timer = Timer()
         timer.start()
@@ -101,26 +110,30 @@ def main():
         snaive_smape = snaive_model.evaluate()
         snaive_pred = snaive_model.pred_test_output
 
-        # autoregressive method
+        # autoregressive method, falls back to seasonal naive if the fit fails
         ar_model = AutoRegression(tar_ts_data, num_output=NUM_OUTPUT)
-        ar_model.train_ar(lag=FREQ)
-        ar_smape = ar_model.evaluate()
-        ar_pred = list(map(int, ar_model.pred_test_output))
-
-        # RNN with LSTM units
+        try:
+            ar_model.train_ar(lag=FREQ)
+        except (ValueError, LinAlgError):
+            pass
+        ar_pred, ar_fallback = with_fallback(ar_model.pred_test_output, [('snaive', snaive_pred)])
+        ar_smape = smape(true_value, ar_pred)[0]
+        ar_pred = list(map(int, ar_pred))
+
+        # RNN with LSTM units, falls back to AR if it runs out of retries or time
         rnn_model = TemporalLSTM(tar_ts_data,
                                  num_input=NUM_INPUT, num_output=NUM_OUTPUT,
                                  num_features=1, num_neurons=NUM_NEURONS, freq=FREQ,
                                  num_ensemble=NUM_ENSEMBLE)
-        rnn_model.prepare_tensor()
-        rnn_model.create_model()
-        rnn_model.train_lstm()
-        rnn_smape = rnn_model.evaluate()
-        rnn_pred = list(map(int, rnn_model.pred_test_output))
-
-        # autoregressive with network method
-        # preset AR coefficient
-        preset_ar_coef = list(ar_model.fitted_params)
+        rnn_model.prepare_tensor(tensors=lstm_tensors, idx=item_cnt)
+        rnn_model.create_model(model_pool=model_pool)
+        rnn_num_members = rnn_model.train_lstm(max_retries=MAX_RETRIES, deadline=time.time() + RNN_TIME_BUDGET)
+        rnn_pred, rnn_fallback = with_fallback(rnn_model.pred_test_output, [('ar', ar_model.pred_test_output),
+                                                                            ('snaive', snaive_pred)])
+        rnn_smape = smape(true_value, rnn_pred)[0]
+        rnn_pred = list(map(int, rnn_pred))
+
+        # autoregressive with network method, falls back to AR if it runs out of retries or time
         # network feature method
         src_ts_data_mat = np.empty((0, T), np.int)
         for src_embed in tar_inlink_dict[tar_embed]:
@@ -130,9 +143,16 @@ def main():
         arnet_model = ARNet(tar_ts_data, src_ts_data_mat=src_ts_data_mat,
                             num_input=NUM_INPUT, num_output=NUM_OUTPUT,
                             num_ensemble=NUM_ENSEMBLE)
-        arnet_model.train_arnet(start_params=preset_ar_coef)
-        arnet_smape = arnet_model.evaluate()
-        arnet_pred = list(map(int, arnet_model.pred_test_output))
+        arnet_num_members = 0
+        if ar_fallback is None:
+            # preset AR coefficient
+            preset_ar_coef = list(ar_model.fitted_params)
+            arnet_num_members = arnet_model.train_arnet(start_params=preset_ar_coef, max_retries=MAX_RETRIES,
+                                                        deadline=time.time() + ARNET_TIME_BUDGET, tol=ARNET_TOL)
+        arnet_pred, arnet_fallback = with_fallback(arnet_model.pred_test_output, [('ar', ar_model.pred_test_output),
+                                                                                  ('snaive', snaive_pred)])
+        arnet_smape = smape(true_value, arnet_pred)[0]
+        arnet_pred = list(map(int, arnet_pred))
 
         fout.write('{0}\n'.format(json.dumps({'embed': tar_embed,
                                               'true_value': true_value,
@@ -143,7 +163,12 @@ def main():
                                               'arnet_pred': arnet_pred,
                                               'net_ratio': arnet_model.network_ratio,
                                               'incoming_embeds': tar_inlink_dict[tar_embed],
-                                              'link_weights': arnet_model.link_weights.tolist()})))
+                                              'link_weights': None if arnet_model.link_weights is None else arnet_model.link_weights.tolist(),
+                                              'ar_fallback': ar_fallback,
+                                              'rnn_fallback': rnn_fallback,
+                                              'arnet_fallback': arnet_fallback,
+                                              'rnn_num_members': rnn_num_members,
+                                              'arnet_num_members': arnet_num_members})))
 
         print('embed: {0}, Naive: {1:.3f}, SeasonalNaive: {2:.3f}, AutoRegression: {3:.3f}, RNN: {4:.3f}, ARNet: {5:.3f}'.format(tar_embed, naive_smape, snaive_smape, ar_smape, rnn_smape, arnet_smape))
 
@@ -157,7 +182,6 @@ def main():
         del rnn_model
         arnet_model = None
         del arnet_model
-        gc.collect()
 
         timer.stop()
 
@@ -172,5 +196,11 @@ if __name__ == "__main__":
     NUM_OUTPUT = 7
     NUM_NEURONS = 25
     NUM_ENSEMBLE = 3
+    # per video compute budget of the ensembles, in rejected fits and in seconds
+    MAX_RETRIES = 10
+    RNN_TIME_BUDGET = 300
+    ARNET_TIME_BUDGET = 120
+    # e.g., 0.01 to stop the ARNet ensemble once a member moves its mean by less than 1%, None fits all members
+    ARNET_TOL = None
 
     main()
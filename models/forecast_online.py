@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Forecast view series in the last week (Sat, 2018-10-27 - Fri, 2018-11-02) with online AR and ARNet.
+Parameters of all target videos are updated by recursive least squares one day at a time over the training period
+(2018-09-01 - 2018-10-26), the states are saved so a new day only needs one vectorized update.
+
+Usage: python forecast_online.py
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/persistent_network.csv
+Output data files: ./model_results/forecast_tracker_online.json, ../data/online_ar_state.npz,
+                   ../data/online_arnet_state.npz
+Time: ~1M
+"""
+
+import sys, os, json
+from collections import defaultdict
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from utils.helper import Timer
+from utils.data_loader import DataLoader
+from utils.metrics import symmetric_mean_absolute_percentage_error as smape
+from models.online_predictors import OnlineAutoRegression, OnlineARNet
+
+
+def main():
+    # == == == == == == Part 1: Set up environment == == == == == == #
+    timer = Timer()
+    timer.start()
+
+    data_prefix = '../data/'
+    result_dirname = './model_results'
+    if not os.path.exists(result_dirname):
+        os.makedirs(result_dirname)
+
+    # == == == == == == Part 2: Load target videos set == == == == == == #
+    tar_inlink_dict = defaultdict(list)
+    with open(os.path.join(data_prefix, 'persistent_network.csv'), 'r') as fin:
+        fin.readline()
+        for line in fin:
+            src_embed, tar_embed = map(int, line.rstrip().split(','))
+            tar_inlink_dict[tar_embed].append(src_embed)
+    tar_embed_list = list(sorted(tar_inlink_dict.keys()))
+    max_src = max(len(tar_inlink_dict[tar_embed]) for tar_embed in tar_embed_list)
+    src_embed_mat = np.full((len(tar_embed_list), max_src), -1, dtype=np.int64)
+    for tar_idx, tar_embed in enumerate(tar_embed_list):
+        src_embed_mat[tar_idx, :len(tar_inlink_dict[tar_embed])] = tar_inlink_dict[tar_embed]
+    print('{0} videos to model'.format(len(tar_embed_list)))
+
+    # == == == == == == Part 3: Load video views == == == == == == #
+    data_loader = DataLoader()
+    data_loader.load_video_views()
+    embed_view_dict = data_loader.embed_view_dict
+    view_mat = np.array([embed_view_dict[embed] for embed in range(data_loader.num_videos)], dtype=np.float64)
+
+    # == == == == == == Part 4: Update online models over the training period == == == == == == #
+    ar_model = OnlineAutoRegression(tar_embed_list, lag=NUM_INPUT)
+    ar_model.fit(view_mat[:, :T - NUM_OUTPUT])
+    ar_pred_mat = ar_model.forecast(NUM_OUTPUT)
+
+    # preset AR coefficient, as ARNet.train_arnet starts from the fitted AR
+    arnet_model = OnlineARNet(tar_embed_list, src_embed_mat, lag=NUM_INPUT)
+    arnet_model.init_params(ar_coef=np.clip(ar_model.ar_coef, 0, 1))
+    arnet_model.fit(view_mat[:, :T - NUM_OUTPUT])
+    # network features are the true source views in the test week, as ARNet.test_input
+    arnet_pred_mat = arnet_model.forecast(NUM_OUTPUT, src_future=view_mat[:, T - NUM_OUTPUT:])
+    net_ratio_arr = arnet_model.network_ratio()
+
+    ar_model.save(os.path.join(data_prefix, 'online_ar_state.npz'))
+    arnet_model.save(os.path.join(data_prefix, 'online_arnet_state.npz'))
+
+    # == == == == == == Part 5: Write forecast results == == == == == == #
+    with open(os.path.join(result_dirname, 'forecast_tracker_online.json'), 'w') as fout:
+        ar_smape_list = []
+        arnet_smape_list = []
+        for tar_idx, tar_embed in enumerate(tar_embed_list):
+            true_value = embed_view_dict[tar_embed][-NUM_OUTPUT:]
+            ar_pred = list(map(int, ar_pred_mat[tar_idx]))
+            arnet_pred = list(map(int, arnet_pred_mat[tar_idx]))
+            ar_smape_list.append(smape(true_value, ar_pred)[0])
+            arnet_smape_list.append(smape(true_value, arnet_pred)[0])
+            fout.write('{0}\n'.format(json.dumps({'embed': tar_embed,
+                                                  'true_value': true_value,
+                                                  'ar_pred': ar_pred,
+                                                  'arnet_pred': arnet_pred,
+                                                  'net_ratio': float(np.nan_to_num(net_ratio_arr[tar_idx])),
+                                                  'incoming_embeds': tar_inlink_dict[tar_embed],
+                                                  'link_weights': arnet_model.link_weights[tar_idx, :len(tar_inlink_dict[tar_embed])].tolist()})))
+    print('mean sMAPE, online AutoRegression: {0:.3f}, online ARNet: {1:.3f}'.format(np.mean(ar_smape_list),
+                                                                                    np.mean(arnet_smape_list)))
+
+    timer.stop()
+
+
+if __name__ == '__main__':
+    T = 63
+
+    NUM_INPUT = 7
+    NUM_OUTPUT = 7
+
+    main()
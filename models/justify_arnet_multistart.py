@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Check ARNet ensembles fitted on the vectorized cost against the original per-member fits, and measure how far the
+opt-in joint multi-start moves from them.
+All fits start from the same AR coefficients and random link weights, on synthetic target series driven by their
+sources with weekly seasonality. The default independent fits (batch_size=1) run the same L-BFGS-B as the original
+loop over members, on a cost and gradient that must equal arnet_cost_function up to EQUIVALENCE_RTOL. Their
+predictions match the original up to rounding, except where a fit stops at maxiter on the non-smooth sMAPE and the
+rounding moves it to a nearby point, so the gaps of predictions are reported, not tested.
+The joint multi-start (batch_size=NUM_ENSEMBLE) shares the stopping test and the curvature history between members,
+so it is not equivalent, its gaps are only reported.
+
+Usage: python justify_arnet_multistart.py
+Output data files: ./justify_arnet_multistart.log
+Time: ~1M
+"""
+
+import sys, os, time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from utils.helper import Timer
+from models.predictors import *
+
+
+def make_fixture(num_targets, num_src, rng):
+    # sources with weekly seasonality, targets mix a random subset of the sources with Poisson noise
+    seasonality = 1 + 0.5 * np.sin(np.arange(T) * 2 * np.pi / FREQ)
+    fixture = []
+    for _ in range(num_targets):
+        src_ts_data_mat = rng.poisson(2000, (num_src, T)) * seasonality[np.newaxis, :]
+        link_weights = rng.random_sample(num_src) * (rng.random_sample(num_src) < 0.5) * 0.3
+        tar_ts_data = np.dot(link_weights, src_ts_data_mat) + rng.poisson(500, T) * seasonality
+        fixture.append((tar_ts_data, src_ts_data_mat))
+    return fixture
+
+
+def fit_original(arnet_model, start_params, seed):
+    # the ensemble loop of train_arnet before the vectorized cost, one L-BFGS-B per member on arnet_cost_function
+    np.random.seed(seed)
+    start_time = time.time()
+    arnet_bounds = [(0, 1)] * (len(start_params) + arnet_model.num_src)
+    pred_test_output_mat = []
+    link_weights_mat = []
+    for _ in range(NUM_ENSEMBLE):
+        arnet_init_values = np.array(start_params + [np.random.random()] * arnet_model.num_src)
+        arnet_optimizer = optimize.minimize(arnet_cost_function, arnet_init_values, jac=grad(arnet_cost_function),
+                                            method='L-BFGS-B',
+                                            args=(arnet_model.train_input, arnet_model.true_train_output),
+                                            bounds=arnet_bounds,
+                                            options={'maxiter': 100, 'disp': False})
+        pred_test_output_mat.append(arnet_predict(arnet_optimizer.x, arnet_model.test_input, mode='test')[0])
+        link_weights_mat.append(arnet_optimizer.x[NUM_INPUT:])
+    return np.mean(pred_test_output_mat, axis=0), np.mean(link_weights_mat, axis=0), time.time() - start_time
+
+
+def cost_gap(arnet_model, params):
+    # relative gap of the vectorized cost and gradient to arnet_cost_function at the same parameters
+    window_mat = np.array(sliding_windows(arnet_model.train_input[:1, :-1], NUM_INPUT)[0])
+    src_mat = arnet_model.train_input[1:, NUM_INPUT:].T
+    args = (window_mat, src_mat, arnet_model.true_train_output)
+    cost = arnet_cost_function(params, arnet_model.train_input, arnet_model.true_train_output)
+    cost_grad = grad(arnet_cost_function)(params, arnet_model.train_input, arnet_model.true_train_output)
+    return max(abs(batch_arnet_cost_function(params, *args) - cost) / abs(cost),
+               np.max(np.abs(grad(batch_arnet_cost_function)(params, *args) - cost_grad)) / np.max(np.abs(cost_grad)))
+
+
+def fit_arnet(arnet_model, start_params, seed, batch_size):
+    # same seed, so every fit draws the same initial link weights
+    np.random.seed(seed)
+    start_time = time.time()
+    arnet_model.train_arnet(start_params=start_params, batch_size=batch_size)
+    return arnet_model.pred_test_output, arnet_model.link_weights, time.time() - start_time
+
+
+def main():
+    timer = Timer()
+    timer.start()
+
+    rng = np.random.RandomState(42)
+    fixture = make_fixture(NUM_TARGETS, NUM_SRC, rng)
+
+    fit_names = ['original', 'independent', 'joint']
+    elapsed_mat = np.zeros((len(fixture), len(fit_names)))
+    test_smape_mat = np.zeros((len(fixture), len(fit_names)))
+    pred_gap_mat = np.zeros((len(fixture), len(fit_names)))
+    link_weights_gap_mat = np.zeros((len(fixture), len(fit_names)))
+    cost_gap_list = []
+    for seed, (tar_ts_data, src_ts_data_mat) in enumerate(fixture):
+        ar_model = AutoRegression(tar_ts_data, num_output=NUM_OUTPUT)
+        ar_model.train_ar(lag=FREQ)
+        start_params = list(ar_model.fitted_params)
+
+        arnet_model = ARNet(tar_ts_data, src_ts_data_mat=src_ts_data_mat, num_input=NUM_INPUT, num_output=NUM_OUTPUT,
+                            num_ensemble=NUM_ENSEMBLE)
+        cost_gap_list.append(cost_gap(arnet_model, np.random.random(NUM_INPUT + NUM_SRC)))
+        results = [fit_original(arnet_model, start_params, seed),
+                   fit_arnet(arnet_model, start_params, seed, 1),
+                   fit_arnet(arnet_model, start_params, seed, NUM_ENSEMBLE)]
+        for fit_idx, (pred_test_output, link_weights, elapsed) in enumerate(results):
+            elapsed_mat[seed, fit_idx] = elapsed
+            test_smape_mat[seed, fit_idx] = smape(arnet_model.true_test_output, pred_test_output)[0]
+            pred_gap_mat[seed, fit_idx] = np.max(np.abs(pred_test_output - results[0][0]) / np.abs(results[0][0]))
+            link_weights_gap_mat[seed, fit_idx] = np.max(np.abs(link_weights - results[0][1]))
+
+    with open('justify_arnet_multistart.log', 'w') as fout:
+        for fit_idx, fit_name in enumerate(fit_names):
+            fout.write('{0} fits, mean test sMAPE: {1:.4f}, relative gap of predictions to original, median: {2:.2e}, '
+                       'max: {3:.2e}, max gap of link weights to original: {4:.2e}, mean time: {5:.3f}s\n'
+                       .format(fit_name, np.mean(test_smape_mat[:, fit_idx]), np.median(pred_gap_mat[:, fit_idx]),
+                               np.max(pred_gap_mat[:, fit_idx]), np.max(link_weights_gap_mat[:, fit_idx]),
+                               np.mean(elapsed_mat[:, fit_idx])))
+        fout.write('max relative gap of vectorized cost and gradient to original: {0:.2e}\n'.format(max(cost_gap_list)))
+
+    print('vectorized cost and gradient, max relative gap to original: {0:.2e}'.format(max(cost_gap_list)))
+    for fit_idx in [1, 2]:
+        print('{0} fits, relative gap of predictions to original, median: {1:.2e}, max: {2:.2e}'.format(
+            fit_names[fit_idx], np.median(pred_gap_mat[:, fit_idx]), np.max(pred_gap_mat[:, fit_idx])))
+    if max(cost_gap_list) > EQUIVALENCE_RTOL:
+        raise AssertionError('vectorized cost does not match arnet_cost_function')
+
+    timer.stop()
+
+
+if __name__ == '__main__':
+    T = 63
+    FREQ = 7
+    NUM_INPUT = 7
+    NUM_OUTPUT = 7
+    NUM_ENSEMBLE = 3
+
+    NUM_TARGETS = 20
+    NUM_SRC = 4
+    EQUIVALENCE_RTOL = 1e-10
+
+    main()
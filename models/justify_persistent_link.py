@@ -3,56 +3,109 @@
 
 """ Calculate the probability of forming a persistent link within width w in n consecutive days.
 Each link is formed with probability p, and w= 7.
-Probability is computed via simulation.
+Probability is computed via simulation, or exactly by dynamic programming over the states of the last w days.
+Simulations are drawn as a (num_sim, n) Bernoulli matrix and checked in chunks to bound memory.
 
-Usage: python justify_persistent_link.py
+Usage: python justify_persistent_link.py [simulate|exact]
 Output data files: ./justify_persistent_link.log
-Time: ~3H for 100,000 simulation
+Time: ~30S for 100,000 simulation, <1S for exact
 """
 
 import sys, os
 import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
-from utils.helper import Timer, is_persistent_link
+from utils.helper import Timer, batch_is_persistent_link
 
 
-def simulate_linkage_list(n, p):
-    q = 1 - p
-    ret = []
-    for _ in range(n):
-        ret.append(np.random.choice(np.arange(2), p=[q, p]))
-    return ret
+def simulate_linkage_mat(num_sim, n, p):
+    # each row is a simulated linkage list, 1 if the link is formed on that day
+    return (np.random.random_sample((num_sim, n)) < p).astype(np.int8)
 
 
-def simulate_for_prob(p, n=63, num_sim=10000):
+def simulate_for_prob(p, n=63, num_sim=10000, chunk_size=20000):
     num_persistent = 0
-    num_nonpersistent = 0
 
     sim_cnt = 0
     while sim_cnt < num_sim:
-        sim_arr = simulate_linkage_list(n, p)
-        if is_persistent_link(sim_arr):
-            num_persistent += 1
-        else:
-            num_nonpersistent += 1
-        sim_cnt += 1
+        num_chunk = min(chunk_size, num_sim - sim_cnt)
+        sim_mat = simulate_linkage_mat(num_chunk, n, p)
+        num_persistent += np.sum(batch_is_persistent_link(sim_mat))
+        sim_cnt += num_chunk
 
     return num_persistent / num_sim
 
 
+def _build_window_transitions(w=7):
+    # state is the linkage of the last w days, bit 0 is the most recent day
+    num_states = 2 ** w
+    states = np.arange(num_states)
+    next_states = (states << 1) & (num_states - 1)
+    trans0 = np.zeros((num_states, num_states))
+    trans0[states, next_states] = 1
+    trans1 = np.zeros((num_states, num_states))
+    trans1[states, next_states | 1] = 1
+    popcount = np.array([bin(s).count('1') for s in states])
+    popcount_last4 = np.array([bin(s & 0b1111).count('1') for s in states])
+    popcount_last5 = np.array([bin(s & 0b11111).count('1') for s in states])
+    return trans0, trans1, popcount, popcount_last4, popcount_last5
+
+
+def compute_exact_prob(p, n=63):
+    """ Exact probability that an independent Bernoulli linkage list satisfies is_persistent_link.
+    :param p: formation probability, a scalar, a per-day array of shape (n,), or a (num_links, n) array
+    :return: probability of being a persistent link, a scalar or an array of shape (num_links,)
+    """
+    p = np.asarray(p, dtype=np.float64)
+    is_scalar = p.ndim == 0
+    if p.ndim < 2:
+        p = np.broadcast_to(p, (n,)).reshape(1, n)
+    if p.shape[1] != n:
+        raise ValueError('per-day probabilities should have length {0}, got {1}'.format(n, p.shape[1]))
+
+    trans0, trans1, popcount, popcount_last4, popcount_last5 = _build_window_transitions()
+    # probability mass over the window states, the state before day 0 is all zeros
+    state_prob = np.zeros((p.shape[0], len(popcount)))
+    state_prob[:, 0] = 1
+    for t in range(n):
+        state_prob = (state_prob @ trans0) * (1 - p[:, t: t + 1]) + (state_prob @ trans1) * p[:, t: t + 1]
+        # drop the mass of sequences that already break the rule
+        if t == 3:
+            state_prob[:, popcount_last4 < 2] = 0
+        elif t == 4:
+            state_prob[:, popcount_last5 < 3] = 0
+        if 6 <= t <= n - 2:
+            state_prob[:, popcount < 4] = 0
+    state_prob[:, (popcount_last4 < 2) | (popcount_last5 < 3)] = 0
+
+    ret = np.sum(state_prob, axis=1)
+    if is_scalar:
+        return ret[0]
+    return ret
+
+
 def main():
     timer = Timer()
     timer.start()
 
     n = 63
-    # change to 10,000 for faster computing
-    num_sim = 10000
+    num_sim = 100000
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'simulate'
+
+    p_form_arr = np.arange(0, 1.01, 0.01)
+    if mode == 'exact':
+        p_persistent_arr = compute_exact_prob(np.repeat(p_form_arr.reshape(-1, 1), n, axis=1), n)
+    elif mode == 'simulate':
+        p_persistent_arr = []
+        for p in p_form_arr:
+            p_persistent_arr.append(simulate_for_prob(p, n, num_sim))
+            print('>>> Finish simulating at prob {0:.2f}'.format(p))
+    else:
+        raise ValueError('unknown mode {0}, choose from simulate or exact'.format(mode))
 
     with open('./justify_persistent_link.log', 'w') as fout:
-        for p in np.arange(0, 1.01, 0.01):
-            fout.write('p_form: {0:.2f}, p_persistent_link: {1:.4f}\n'.format(p, simulate_for_prob(p, n, num_sim)))
-            print('>>> Finish simulating at prob {0:.2f}'.format(p))
+        for p, p_persistent in zip(p_form_arr, p_persistent_arr):
+            fout.write('p_form: {0:.2f}, p_persistent_link: {1:.4f}\n'.format(p, p_persistent))
 
     timer.stop()
 
@@ -0,0 +1,231 @@
+""" Online predictors to refresh networked popularity forecasts one day at a time.
+AutoRegression and ARNet for many target videos at once, coefficients are updated by recursive least squares (RLS)
+as each daily observation arrives, instead of being refitted on the whole training period.
+"""
+
+import numpy as np
+
+
+class RecursiveLeastSquares:
+    """ Batched RLS estimate of num_models linear models with num_params parameters each.
+    With bounds, the unconstrained estimate is projected onto the box in the metric of the input correlation matrix
+    (projected RLS), which is the bounded least squares fit. The projection is solved by accelerated projected
+    gradient, warm started from the previous projection.
+    """
+
+    def __init__(self, num_models, num_params, forgetting=1.0, delta=1e4, bounds=None):
+        self.forgetting = forgetting
+        self.params = np.zeros((num_models, num_params))
+        # weighted input correlation matrix and its inverse, start as I / delta and delta * I
+        self.corr = np.tile(np.eye(num_params) / delta, (num_models, 1, 1))
+        self.inv_corr = np.tile(delta * np.eye(num_params), (num_models, 1, 1))
+        # lower and upper bounds of each parameter, arrays of shape (num_models, num_params)
+        self.lower, self.upper = (None, None) if bounds is None else \
+            [np.broadcast_to(np.asarray(x, dtype=np.float64), self.params.shape).copy() for x in bounds]
+        self.bounded_params = None if bounds is None else np.clip(self.params, self.lower, self.upper)
+        self.is_projected = True
+
+    def estimate(self):
+        """ Parameters of every model, within the bounds if any."""
+        if self.lower is None:
+            return self.params
+        if not self.is_projected:
+            self.project()
+        return self.bounded_params
+
+    def project(self, max_iter=200, tol=1e-6):
+        # minimize (x - params)' corr (x - params) within the bounds by FISTA with adaptive restart,
+        # Jacobi preconditioned so the box stays a box, until no parameter moves by tol
+        diag = np.einsum('kii->ki', self.corr)
+        scaled_corr = self.corr / np.sqrt(diag[:, :, np.newaxis] * diag[:, np.newaxis, :])
+        # inverse of the max absolute row sum, an upper bound of the largest eigenvalue
+        step = 1 / (np.abs(scaled_corr).sum(axis=2).max(axis=1)[:, np.newaxis] * diag)
+        x = np.clip(self.bounded_params, self.lower, self.upper)
+        y = x.copy()
+        momentum = np.ones((len(x), 1))
+        for _ in range(max_iter):
+            grad = np.einsum('kij,kj->ki', self.corr, y - self.params)
+            x_next = np.clip(y - step * grad, self.lower, self.upper)
+            # restart the momentum of models moving against the gradient
+            momentum[np.einsum('ki,ki->k', grad, x_next - x) > 0] = 1
+            momentum_next = (1 + np.sqrt(1 + 4 * momentum ** 2)) / 2
+            y = x_next + (momentum - 1) / momentum_next * (x_next - x)
+            is_converged = np.abs(x_next - x).max() < tol
+            x, momentum = x_next, momentum_next
+            if is_converged:
+                break
+        self.bounded_params = x
+        self.is_projected = True
+
+    def predict(self, features):
+        return np.einsum('kp,kp->k', self.estimate(), features)
+
+    def update(self, features, targets):
+        """ One RLS step per model with features (num_models, num_params) and targets (num_models,),
+        models with a missing value keep their estimate.
+        """
+        idx = np.flatnonzero(~np.isnan(targets) & ~np.isnan(features).any(axis=1))
+        features, targets, inv_corr = features[idx], targets[idx], self.inv_corr[idx]
+
+        corr_features = np.einsum('kij,kj->ki', inv_corr, features)
+        gain = corr_features / (self.forgetting + np.einsum('ki,ki->k', features, corr_features))[:, np.newaxis]
+        error = targets - np.einsum('kp,kp->k', self.params[idx], features)
+        self.params[idx] += gain * error[:, np.newaxis]
+        self.inv_corr[idx] = (inv_corr - gain[:, :, np.newaxis] * corr_features[:, np.newaxis, :]) / self.forgetting
+        self.corr[idx] = self.forgetting * self.corr[idx] + features[:, :, np.newaxis] * features[:, np.newaxis, :]
+        self.is_projected = False
+
+
+class OnlineARNet:
+    """ ARNet of every target video, y_t = sum(ar_coef * y_{t-lag: t}) + sum(link_weights * x_t),
+    where x_t are the views of its source videos on the same day.
+    Every video is scaled by its mean views when the model is fitted, so the parameters are updated on series of
+    comparable magnitude, link weights are scaled back by the ratio of target and source means.
+    All parameters are bounded in [0, 1] as in ARNet, and updated by projected RLS on the squared error.
+
+    :param tar_embeds: target videos, array of shape (num_targets,)
+    :param src_embed_mat: source videos of each target, padded by -1, array of shape (num_targets, max_src)
+    """
+
+    def __init__(self, tar_embeds, src_embed_mat, lag=7, forgetting=1.0, delta=1e4, bounds=(0, 1)):
+        self.tar_embeds = np.asarray(tar_embeds, dtype=np.int64)
+        self.src_embed_mat = np.asarray(src_embed_mat, dtype=np.int64).reshape(len(self.tar_embeds), -1)
+        self.lag = lag
+        self.bounds = bounds
+        self.num_targets, self.max_src = self.src_embed_mat.shape
+        self.rls = RecursiveLeastSquares(self.num_targets, lag + self.max_src, forgetting=forgetting, delta=delta,
+                                         bounds=bounds)
+        self.tar_scale = np.ones(self.num_targets)
+        self.src_scale = np.ones((self.num_targets, self.max_src))
+        # scaled views of the last lag days, the latest day at the end
+        self.tar_buffer = np.full((self.num_targets, lag), np.nan)
+        self.src_buffer = np.zeros((self.num_targets, self.max_src, lag))
+        # sum of the scaled features over the updated days, for the network ratio over the training period
+        self.feature_sum = np.zeros((self.num_targets, lag + self.max_src))
+        self.num_days = 0
+
+    @property
+    def ar_coef(self):
+        return self.rls.estimate()[:, :self.lag]
+
+    @property
+    def link_weights(self):
+        return self.rls.estimate()[:, self.lag:] * self.tar_scale[:, np.newaxis] / self.src_scale
+
+    def set_scale(self, tar_scale, src_scale):
+        """ Scale of every target and source, the bounds of link weights are rescaled accordingly."""
+        self.tar_scale = tar_scale
+        self.src_scale = src_scale
+        if self.bounds is not None:
+            ratio = self.src_scale / self.tar_scale[:, np.newaxis]
+            self.rls.lower[:, self.lag:] = self.bounds[0] * ratio
+            self.rls.upper[:, self.lag:] = self.bounds[1] * ratio
+
+    def init_params(self, ar_coef=None, link_weights=None):
+        """ Start from preset parameters, e.g., AR coefficients from an offline fit as in ARNet.train_arnet."""
+        if ar_coef is not None:
+            self.rls.params[:, :self.lag] = ar_coef
+        if link_weights is not None:
+            self.rls.params[:, self.lag:] = link_weights * self.src_scale / self.tar_scale[:, np.newaxis]
+        self.rls.is_projected = False
+
+    def _src_views(self, day_views):
+        # padded sources have zero views, so they never contribute
+        return np.where(self.src_embed_mat >= 0, day_views[self.src_embed_mat], 0) / self.src_scale
+
+    def update(self, day_views):
+        """ Add one day of views of all videos, array of shape (num_videos,), and update the parameters
+        once lag days of history are in the buffer.
+        """
+        day_views = np.asarray(day_views, dtype=np.float64)
+        tar_views = day_views[self.tar_embeds] / self.tar_scale
+        src_views = self._src_views(day_views)
+        if self.num_days >= self.lag:
+            features = np.hstack((self.tar_buffer, src_views))
+            self.rls.update(features, tar_views)
+            is_known = ~np.isnan(tar_views) & ~np.isnan(features).any(axis=1)
+            self.feature_sum[is_known] += features[is_known]
+        self.tar_buffer = np.roll(self.tar_buffer, -1, axis=1)
+        self.tar_buffer[:, -1] = tar_views
+        self.src_buffer = np.roll(self.src_buffer, -1, axis=2)
+        self.src_buffer[:, :, -1] = src_views
+        self.num_days += 1
+
+    def fit(self, view_mat):
+        """ Set the scales to the mean views and run the updates over the history of views,
+        array of shape (num_videos, num_days).
+        """
+        mean_views = np.maximum(np.nanmean(np.asarray(view_mat, dtype=np.float64), axis=1), 1)
+        self.set_scale(mean_views[self.tar_embeds], np.where(self.src_embed_mat >= 0, mean_views[self.src_embed_mat], 1))
+        for t in range(view_mat.shape[1]):
+            self.update(view_mat[:, t])
+
+    def forecast(self, num_output, src_future=None):
+        """ Forecast the next num_output days of every target by rolling the predicted values.
+        :param src_future: views of all videos in the next days, array of shape (num_videos, num_output),
+        if None, the sources repeat their last lag days (seasonal naive)
+        :return: array of shape (num_targets, num_output)
+        """
+        input_views = self.tar_buffer.copy()
+        pred = np.empty((self.num_targets, num_output))
+        for h in range(num_output):
+            if src_future is None:
+                src_views = self.src_buffer[:, :, h % self.lag]
+            else:
+                src_views = self._src_views(np.asarray(src_future, dtype=np.float64)[:, h])
+            pred[:, h] = self.rls.predict(np.hstack((input_views, src_views)))
+            input_views = np.hstack((input_views[:, 1:], pred[:, h: h + 1]))
+        return pred * self.tar_scale[:, np.newaxis]
+
+    def network_ratio(self):
+        """ Share of the fitted views from the network part over all updated days, 1 - sum(latent) / sum(pred) with
+        the current parameters, as ARNet.network_ratio over the training period. Both parts are linear in the
+        features, so the sums of features are enough.
+        """
+        latent = np.einsum('kp,kp->k', self.ar_coef, self.feature_sum[:, :self.lag])
+        network = np.einsum('ks,ks->k', self.rls.estimate()[:, self.lag:], self.feature_sum[:, self.lag:])
+        return network / (latent + network)
+
+    def save(self, filepath):
+        # rewritten every day, so it is not compressed
+        np.savez(filepath, tar_embeds=self.tar_embeds, src_embed_mat=self.src_embed_mat, lag=self.lag,
+                 forgetting=self.rls.forgetting, bounds=np.array(self.bounds, dtype=np.float64),
+                 params=self.rls.params, corr=self.rls.corr, inv_corr=self.rls.inv_corr,
+                 bounded_params=self.rls.estimate(), tar_scale=self.tar_scale,
+                 src_scale=self.src_scale, tar_buffer=self.tar_buffer, src_buffer=self.src_buffer,
+                 feature_sum=self.feature_sum, num_days=self.num_days)
+
+
+class OnlineAutoRegression(OnlineARNet):
+    """ AR(lag) without trend of every target video, unbounded as AutoRegression, updated by RLS.
+    With forgetting 1, it converges to the least squares fit of AutoRegression.train_ar.
+    """
+
+    def __init__(self, tar_embeds, lag=7, forgetting=1.0, delta=1e4):
+        super().__init__(tar_embeds, np.empty((len(tar_embeds), 0)), lag=lag, forgetting=forgetting, delta=delta,
+                         bounds=None)
+
+
+def load_online_predictor(filepath):
+    """ Restore an OnlineARNet or OnlineAutoRegression saved by save()."""
+    with np.load(filepath) as state:
+        bounds = tuple(state['bounds']) if state['bounds'].size == 2 else None
+        if state['src_embed_mat'].shape[1] == 0 and bounds is None:
+            predictor = OnlineAutoRegression(state['tar_embeds'], lag=int(state['lag']),
+                                             forgetting=float(state['forgetting']))
+        else:
+            predictor = OnlineARNet(state['tar_embeds'], state['src_embed_mat'], lag=int(state['lag']),
+                                    forgetting=float(state['forgetting']), bounds=bounds)
+        predictor.rls.params = state['params']
+        predictor.rls.corr = state['corr']
+        predictor.rls.inv_corr = state['inv_corr']
+        if bounds is not None:
+            predictor.rls.bounded_params = state['bounded_params']
+        predictor.set_scale(state['tar_scale'], state['src_scale'])
+        predictor.tar_buffer = state['tar_buffer']
+        predictor.src_buffer = state['src_buffer']
+        # states saved before the training period sums were kept
+        if 'feature_sum' in state.files:
+            predictor.feature_sum = state['feature_sum']
+        predictor.num_days = int(state['num_days'])
+    return predictor
@@ -86,7 +86,9 @@ def main():
             arnet_smape_list.append(arnet_smape)
             arnet_daily_smape_mat = np.vstack((arnet_daily_smape_mat, arnet_daily_smape_arr))
 
-            # analyse network contribution
+            # analyse network contribution, no link weights if ARNet fell back to another model
+            if result_json.get('arnet_fallback') is not None or result_json['link_weights'] is None:
+                continue
             arnet_net_ratio = result_json['net_ratio']
             net_ratio_list.append(arnet_net_ratio)
 
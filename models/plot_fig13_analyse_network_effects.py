@@ -67,6 +67,7 @@ def main():
     same_genre_net_ratio_list = []
     total_views = 0
     network_explained_views = 0
+    num_fallback = 0
 
     with open('./embed_prediction.json', 'r') as fin:
         for line in fin:
@@ -76,6 +77,10 @@ def main():
 
             true_value = result_json['true_value']
             arnet_pred = result_json['arnet_pred']
+            # no network contribution if ARNet fell back to another model
+            if result_json.get('arnet_fallback') is not None or result_json['link_weights'] is None:
+                num_fallback += 1
+                continue
             arnet_smape_list.append(smape(true_value, arnet_pred)[0])
 
             incoming_embeds = result_json['incoming_embeds']
@@ -101,7 +106,8 @@ def main():
             total_views += avg_train_views
             network_explained_views += avg_train_views * arnet_net_ratio
 
-    print('\nFor an average video in our dataset, we estimate {0:.1f}% of the views come from the network.'.format(100 * np.mean(net_ratio_list)))
+    print('\n{0} videos without ARNet fit are excluded from the network analysis'.format(num_fallback))
+    print('For an average video in our dataset, we estimate {0:.1f}% of the views come from the network.'.format(100 * np.mean(net_ratio_list)))
     print('In particular, {0:.1f}% ({1:.1f}%) of the views come from the same artist.'.format(100 * np.mean(same_artist_net_ratio_list), 100 * np.mean(same_artist_net_ratio_list) / np.mean(net_ratio_list)))
     print('In total, our model estimates that the recommendation network contributes {0:.1f}% of popularity in the Vevo network.'.format(100 * network_explained_views / total_views))
     print('total views for 13K: {0:.1f}M'.format(total_views / 1000000))
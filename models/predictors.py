@@ -2,14 +2,14 @@
 Naive, Seasonal Naive, Autogressive, RNN, and ARNet.
 """
 
-import sys, os
+import sys, os, time
 from statsmodels.tsa.ar_model import AR
 import matplotlib.pyplot as plt
 
 import keras.backend as K
 from keras.models import Sequential
 from keras.layers import Dense, LSTM, Dropout, RepeatVector, TimeDistributed
-from keras.callbacks import EarlyStopping
+from keras.callbacks import Callback, EarlyStopping
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.metrics import symmetric_mean_absolute_percentage_error as smape
@@ -65,6 +65,19 @@ class AutoRegression:
         return smape(true, pred)[0]
 
 
+def with_fallback(pred, fallbacks):
+    """ pred if the model produced one, otherwise the first available fallback.
+    :param fallbacks: list of (name, pred) in the order of preference
+    :return: pred, name of the fallback used or None
+    """
+    if pred is not None:
+        return pred, None
+    for name, fallback_pred in fallbacks:
+        if fallback_pred is not None:
+            return fallback_pred, name
+    raise ValueError('no prediction available from the fallbacks {0}'.format([name for name, _ in fallbacks]))
+
+
 def arnet_predict(params, model_input, mode='train'):
     num_features, num_step = model_input.shape
     ar_coef = params[: -num_features + 1]
@@ -121,6 +134,27 @@ def arnet_cost_function(params, model_input, model_output):
     return np.mean(200 * np.nan_to_num(np.abs(model_output - yhat) / (np.abs(model_output) + np.abs(yhat))))
 
 
+def batch_arnet_predict(params_mat, window_mat, src_mat):
+    """ Train mode of arnet_predict for many sets of parameters at once, the inputs are true values so there is no
+    recursion over time.
+    :param params_mat: AR coefficients and link weights, array of shape (num_members, num_input + num_src)
+    :param window_mat: target views of the num_input days before each step, array of shape (num_step, num_input)
+    :param src_mat: source views at each step, array of shape (num_step, num_src)
+    :return: yhat and latent interest, arrays of shape (num_members, num_step)
+    """
+    num_input = window_mat.shape[1]
+    latent_interest = np.dot(params_mat[:, :num_input], window_mat.T)
+    yhat = latent_interest + np.dot(params_mat[:, num_input:], src_mat.T)
+    return yhat, latent_interest
+
+
+def batch_arnet_cost_function(flat_params, window_mat, src_mat, model_output):
+    # members are independent, so the sum of their SMAPE is minimized jointly as a multi-start
+    params_mat = np.reshape(flat_params, (-1, window_mat.shape[1] + src_mat.shape[1]))
+    yhat = batch_arnet_predict(params_mat, window_mat, src_mat)[0]
+    return np.sum(np.mean(200 * np.nan_to_num(np.abs(model_output - yhat) / (np.abs(model_output) + np.abs(yhat))), axis=1))
+
+
 class ARNet:
     def __init__(self, tar_ts_data, src_ts_data_mat, num_input, num_output, num_ensemble):
         self.tar_ts_data = np.array(tar_ts_data)
@@ -142,39 +176,77 @@ class ARNet:
         self.train_input = np.vstack((self.tar_ts_data[: -self.num_output].reshape(1, -1), self.src_ts_data_mat[:, : -self.num_output]))
         self.test_input = np.vstack((self.tar_ts_data[-self.num_output - self.num_input: -self.num_output].reshape(1, -1), self.src_ts_data_mat[:, -self.num_input:]))
 
-    def train_arnet(self, start_params):
-        arnet_autograd_func = grad(arnet_cost_function)
-        arnet_bounds = [(0, 1)] * len(start_params) + [(0, 1)] * self.num_src
+    def train_arnet(self, start_params, start_link_weights=None, max_retries=None, deadline=None, batch_size=1,
+                    tol=None):
+        """ Fit an ensemble of ARNet from preset AR coefficients, with random link weights. If start_link_weights is
+        given, e.g., the link weights fitted at the previous forecast origin, the first member starts from them.
+        By default, every member is an independent L-BFGS-B fit of 100 iterations, as the original ensemble, on the
+        vectorized cost. With batch_size > 1, batch_size members are fitted at a time by one L-BFGS-B on the sum of
+        their costs, with 100 iterations per member. Members of a batch share the stopping test and the curvature
+        history, so this joint multi-start is not equivalent to independent fits: a slowly converging member keeps the
+        others iterating, and no member stops on its own. justify_arnet_multistart.py compares both.
+        With tol, fitting stops early once a batch moves the ensemble mean of test predictions by less than tol
+        relative to it, and the mean link weights by less than tol.
+        A fit with non-finite predictions is retried, at most max_retries times in total, and no batch starts after
+        deadline (time.time()). If no fit is kept, pred_test_output is None.
+        :return: number of fits in the ensemble
+        """
+        num_params = len(start_params) + self.num_src
+        arnet_autograd_func = grad(batch_arnet_cost_function)
+        arnet_bounds = [(0, 1)] * num_params
+        # target views before each training step, and source views at it
+        window_mat = np.array(sliding_windows(self.train_input[:1, :-1], self.num_input)[0])
+        src_mat = self.train_input[1:, self.num_input:].T
 
         iter_cnt = 0
-        pred_train_output_mat = np.empty((0, len(self.true_train_output)), np.float)
-        pred_test_output_mat = np.empty((0, self.num_output), np.float)
-        link_weights_list = np.empty((0, self.num_src), np.float)
-        network_ratio_list = []
+        retry_cnt = 0
+        fitted_params_mat = np.full((self.num_ensemble, num_params), np.nan)
+        pred_test_output_mat = np.full((self.num_ensemble, self.num_output), np.nan)
+        last_pred_test_mean = None
+        last_link_weights_mean = None
         while iter_cnt < self.num_ensemble:
-            arnet_init_values = np.array(start_params + [np.random.random()] * self.num_src)
-            arnet_optimizer = optimize.minimize(arnet_cost_function, arnet_init_values, jac=arnet_autograd_func,
+            if (max_retries is not None and retry_cnt > max_retries) or (deadline is not None and time.time() > deadline):
+                break
+            num_starts = min(batch_size, self.num_ensemble - iter_cnt)
+            # one random value for all links of a member
+            init_link_weights = np.random.random((num_starts, 1)) * np.ones((1, self.num_src))
+            if start_link_weights is not None and iter_cnt + retry_cnt == 0:
+                init_link_weights[0] = start_link_weights
+            arnet_init_values = np.hstack((np.tile(start_params, (num_starts, 1)), init_link_weights)).ravel()
+            arnet_optimizer = optimize.minimize(batch_arnet_cost_function, arnet_init_values, jac=arnet_autograd_func,
                                                 method='L-BFGS-B',
-                                                args=(self.train_input, self.true_train_output),
-                                                bounds=arnet_bounds,
-                                                options={'maxiter': 100, 'disp': False})
-            arnet_fitted_params = arnet_optimizer.x
-            # arnet_ar_coef = arnet_fitted_params[: self.num_input]
-            arnet_link_weights = arnet_fitted_params[self.num_input:]
-
-            arnet_pred_train, arnet_latent_train = arnet_predict(arnet_fitted_params, self.train_input, mode='train')
-            arnet_pred_test, arnet_latent_test = arnet_predict(arnet_fitted_params, self.test_input, mode='test')
-
-            pred_train_output_mat = np.vstack((pred_train_output_mat, arnet_pred_train))
-            pred_test_output_mat = np.vstack((pred_test_output_mat, arnet_pred_test))
-            link_weights_list = np.vstack((link_weights_list, arnet_link_weights))
-            network_ratio_list.append(1 - sum(arnet_latent_train) / sum(arnet_pred_train))
-            iter_cnt += 1
+                                                args=(window_mat, src_mat, self.true_train_output),
+                                                bounds=arnet_bounds * num_starts,
+                                                options={'maxiter': 100 * num_starts, 'disp': False})
+
+            for arnet_fitted_params in arnet_optimizer.x.reshape(num_starts, num_params):
+                arnet_pred_test = arnet_predict(arnet_fitted_params, self.test_input, mode='test')[0]
+                if not np.all(np.isfinite(arnet_pred_test)):
+                    retry_cnt += 1
+                    continue
+                fitted_params_mat[iter_cnt] = arnet_fitted_params
+                pred_test_output_mat[iter_cnt] = arnet_pred_test
+                iter_cnt += 1
 
+            if tol is not None and iter_cnt > 0:
+                pred_test_mean = np.mean(pred_test_output_mat[:iter_cnt], axis=0)
+                link_weights_mean = np.mean(fitted_params_mat[:iter_cnt, self.num_input:], axis=0)
+                if last_pred_test_mean is not None and iter_cnt < self.num_ensemble \
+                        and np.all(np.abs(pred_test_mean - last_pred_test_mean) <= tol * np.abs(pred_test_mean)) \
+                        and np.all(np.abs(link_weights_mean - last_link_weights_mean) <= tol):
+                    break
+                last_pred_test_mean = pred_test_mean
+                last_link_weights_mean = link_weights_mean
+
+        if iter_cnt == 0:
+            return 0
+        fitted_params_mat = fitted_params_mat[:iter_cnt]
+        pred_train_output_mat, latent_train_mat = batch_arnet_predict(fitted_params_mat, window_mat, src_mat)
         self.pred_train_output = np.nanmean(pred_train_output_mat, axis=0)
-        self.pred_test_output = np.nanmean(pred_test_output_mat, axis=0)
-        self.link_weights = np.nanmean(link_weights_list, axis=0)
-        self.network_ratio = np.mean(network_ratio_list)
+        self.pred_test_output = np.nanmean(pred_test_output_mat[:iter_cnt], axis=0)
+        self.link_weights = np.nanmean(fitted_params_mat[:, self.num_input:], axis=0)
+        self.network_ratio = np.mean(1 - np.sum(latent_train_mat, axis=1) / np.sum(pred_train_output_mat, axis=1))
+        return iter_cnt
 
     def evaluate(self):
         true = self.true_test_output
@@ -186,6 +258,116 @@ def smape_loss(y_true, y_pred):
     return K.mean(200 * K.abs(y_pred - y_true) / (K.abs(y_pred) + K.abs(y_true)))
 
 
+def build_lstm_model(num_input, num_output, num_features, num_neurons):
+    """ creates, compiles and returns a LSTM encoder-decoder model
+    """
+    model = Sequential()
+    model.add(LSTM(units=num_neurons, input_shape=(num_input + 7, num_features), return_sequences=False))
+    model.add(Dropout(0.1))
+    model.add(RepeatVector(num_output))
+    model.add(LSTM(units=num_neurons, return_sequences=True))
+    model.add(Dropout(0.1))
+    model.add(TimeDistributed(Dense(1)))
+
+    model.compile(loss=smape_loss, optimizer='adam')
+    return model
+
+
+def glorot_uniform(shape):
+    limit = np.sqrt(6 / (shape[0] + shape[1]))
+    return np.random.uniform(-limit, limit, shape)
+
+
+def orthogonal(shape):
+    a = np.random.normal(0.0, 1.0, shape)
+    u, _, v = np.linalg.svd(a, full_matrices=False)
+    return u if u.shape == shape else v
+
+
+def reset_model(model):
+    """ Re-draw all weights from the default Keras initializers and clear the optimizer state,
+    as if the model was built and compiled again, without adding anything to the graph.
+    """
+    weight_values = []
+    for layer in model.layers:
+        for weight in layer.weights:
+            shape = K.int_shape(weight)
+            name = weight.name.split('/')[-1]
+            if name.startswith('recurrent_kernel'):
+                value = orthogonal(shape)
+            elif name.startswith('kernel'):
+                value = glorot_uniform(shape)
+            else:
+                value = np.zeros(shape)
+                if getattr(layer, 'unit_forget_bias', False):
+                    value[layer.units: 2 * layer.units] = 1
+            weight_values.append((weight, value))
+    # Adam iterations and moments
+    weight_values.extend((weight, np.zeros(K.int_shape(weight))) for weight in model.optimizer.weights)
+    K.batch_set_value(weight_values)
+
+
+class LSTMModelPool:
+    """ One compiled LSTM model per shape, shared by all videos of a worker.
+    acquire() resets the weights and the optimizer state instead of building and compiling a new model,
+    so the graph and the memory do not grow with the number of videos.
+    """
+
+    def __init__(self):
+        self.models = {}
+
+    def acquire(self, num_input, num_output, num_features, num_neurons):
+        key = (num_input, num_output, num_features, num_neurons)
+        if key in self.models:
+            reset_model(self.models[key])
+        else:
+            self.models[key] = build_lstm_model(num_input, num_output, num_features, num_neurons)
+        return self.models[key]
+
+
+class DeadlineStopping(Callback):
+    """ Stop training at the end of the first epoch after deadline (time.time())."""
+
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+
+    def on_epoch_end(self, epoch, logs=None):
+        if time.time() > self.deadline:
+            self.model.stop_training = True
+
+
+def prepare_lstm_tensors(train_mat, num_input, num_output, freq=7):
+    """ Deseasonalized and normalized input and output windows of many training series at once,
+    the first observation day of every series is Sat.
+
+    :param train_mat: training series of the same length, array of shape (num_series, length)
+    :return: dict of train_input (num_series, num_sequence, num_input + 7, 1),
+    train_output (num_series, num_sequence, num_output, 1), train_denom (num_series, num_sequence),
+    test_input (num_series, 1, num_input + 7, 1), test_denom (num_series,) and ts_seasonality_in (num_series, freq)
+    """
+    desea_mat, ts_seasonality_mat = batch_deseasonalize(train_mat, freq=freq)
+    num_series, length = desea_mat.shape
+    # all windows of input and output, each normalized by the last observation in its input
+    windows = sliding_windows(desea_mat, num_input + num_output)
+    num_sequence = windows.shape[1]
+    train_denom = windows[:, :, num_input - 1]
+    windows = windows / train_denom[:, :, np.newaxis]
+    # feature: dow, one-hot day of week of every day, the first observation day of a window picks its row
+    dow_table = np.eye(7)[(np.arange(length) + 5) % freq]
+    train_dow = np.tile(dow_table[:num_sequence], (num_series, 1, 1))
+    train_input = np.concatenate((windows[:, :, :num_input], train_dow), axis=2)[:, :, :, np.newaxis]
+    train_output = windows[:, :, num_input:, np.newaxis]
+
+    # use the last observation in test input to normalize the whole sequence
+    test_denom = desea_mat[:, -1]
+    test_dow = np.tile(dow_table[length - num_input], (num_series, 1))
+    test_input = np.concatenate((desea_mat[:, -num_input:] / test_denom[:, np.newaxis], test_dow), axis=1)
+    return {'train_input': train_input, 'train_output': train_output, 'train_denom': train_denom,
+            'test_input': test_input[:, np.newaxis, :, np.newaxis], 'test_denom': test_denom,
+            'ts_seasonality_in': ts_seasonality_mat}
+
+
 class TemporalLSTM:
     def __init__(self, ts_data, num_input, num_output, num_features, num_neurons, freq, num_ensemble):
         self.ts_data = np.array(ts_data)
@@ -206,6 +388,8 @@ class TemporalLSTM:
         self.pred_test_output = None
 
         self.model = None
+        self.model_pool = None
+        self.fitted_weights = None
         self.history = None
 
         self.ts_seasonality_in = None
@@ -215,73 +399,74 @@ class TemporalLSTM:
         self.train_denom_list = [None for _ in range(self.num_sequence)]
         self.test_denom = None
 
-    def prepare_tensor(self):
-        # extract seasonality cycle from all the training data
-        # deseasonalize
-        desea_ts_data, self.ts_seasonality_in = deseasonalize(self.train_data, freq=self.freq)
-        desea_ts_data = np.array(desea_ts_data).reshape(-1, 1)
-
-        for i in range(self.num_sequence):
-            train_input_and_output = desea_ts_data[i: i + self.num_input + self.num_output]
-            # use the last observation in train input to normalize the whole sequence
-            train_denom = train_input_and_output[self.num_input - 1]
-            self.train_denom_list[i] = train_denom
-            train_input_and_output = normalize(train_input_and_output, train_denom)
-            # feature: dow
-            dow = np.zeros(shape=(7, 1))
-            # first observation day in the first windows is Sat
-            dow[(i + 5) % self.freq] = 1
-            self.train_input[i] = np.vstack((train_input_and_output[: self.num_input], dow))
-            self.train_output[i] = train_input_and_output[self.num_input:]
-
-        test_input = desea_ts_data[self.len_train_output: self.t - self.num_output]
-        # use the last observation in test input to normalize the whole sequence
-        self.test_denom = test_input[self.num_input - 1]
-        test_input = normalize(test_input, self.test_denom)
-        # feature: dow
-        dow = np.zeros(shape=(7, 1))
-        # first observation day is Sat
-        dow[5] = 1
-        self.test_input = np.vstack((test_input, dow))[np.newaxis, :]
-
-    def create_model(self):
-        """ creates, compiles and returns a LSTM model
+    def prepare_tensor(self, tensors=None, idx=0):
+        """ Fill the train and test tensors, from row idx of the output of prepare_lstm_tensors if tensors is given,
+        e.g., prepared for all videos at once, otherwise from this series.
+        """
+        if tensors is None:
+            tensors = prepare_lstm_tensors(self.train_data[np.newaxis, :], self.num_input, self.num_output,
+                                           freq=self.freq)
+            idx = 0
+        self.ts_seasonality_in = tensors['ts_seasonality_in'][idx]
+        self.train_input[:] = tensors['train_input'][idx]
+        self.train_output[:] = tensors['train_output'][idx]
+        self.train_denom_list = list(tensors['train_denom'][idx])
+        self.test_input = tensors['test_input'][idx]
+        self.test_denom = tensors['test_denom'][idx]
+
+    def create_model(self, model_pool=None):
+        """ creates, compiles and returns a LSTM model, or takes a reset one from model_pool
+        with model_pool, every fit of the ensemble also starts from reset weights
+        """
+        self.model_pool = model_pool
+        if model_pool is None:
+            self.model = build_lstm_model(self.num_input, self.num_output, self.num_features, self.num_neurons)
+        else:
+            self.model = model_pool.acquire(self.num_input, self.num_output, self.num_features, self.num_neurons)
+
+    def train_lstm(self, max_retries=None, deadline=None, warm_weights=None):
+        """ Fit the network until num_ensemble fits have a training sMAPE below 150.
+        Rejected fits are retried at most max_retries times in total, and no fit starts after deadline (time.time()),
+        the fit running at deadline stops at the end of its epoch. If no fit is kept, pred_test_output is None.
+        With warm_weights, e.g., the fitted_weights at the previous forecast origin, the first fit starts from them,
+        and every later fit, including retries, from reset weights. fitted_weights are the weights of the first kept fit.
+        :return: number of fits in the ensemble
         """
-        self.model = Sequential()
-        self.model.add(LSTM(units=self.num_neurons, input_shape=(self.num_input + 7, self.num_features), return_sequences=False))
-        self.model.add(Dropout(0.1))
-        self.model.add(RepeatVector(self.num_output))
-        self.model.add(LSTM(units=self.num_neurons, return_sequences=True))
-        self.model.add(Dropout(0.1))
-        self.model.add(TimeDistributed(Dense(1)))
-
-        self.model.compile(loss=smape_loss, optimizer='adam')
-
-    def train_lstm(self):
         num_epochs = 100
         # sanity check: check the shape of train input, train output, and test input
         # print('shape of train input: {0}, train output: {1}, test input: {2}'.format(self.train_input.shape, self.train_output.shape, self.test_input.shape))
 
         callbacks = [EarlyStopping(monitor='val_loss', patience=10)]
+        if deadline is not None:
+            callbacks.append(DeadlineStopping(deadline))
         iter_cnt = 0
+        retry_cnt = 0
         pred_train_output_mat = np.empty((0, self.len_train_output), np.float)
         pred_test_output_mat = np.empty((0, self.num_output), np.float)
         while iter_cnt < self.num_ensemble:
+            if (max_retries is not None and retry_cnt > max_retries) or (deadline is not None and time.time() > deadline):
+                break
+            if iter_cnt + retry_cnt == 0 and warm_weights is not None:
+                # fresh optimizer state from the warm weights
+                reset_model(self.model)
+                self.model.set_weights(warm_weights)
+            elif iter_cnt + retry_cnt > 0 and (self.model_pool is not None or warm_weights is not None):
+                reset_model(self.model)
             self.history = self.model.fit(self.train_input, self.train_output, validation_split=0.15, shuffle=False,
                                           batch_size=1, epochs=num_epochs, callbacks=callbacks, verbose=0)
 
             # get the predicted train output
             pred_train_output = self.model.predict(self.train_input)
-            pred_train_output_mat = np.zeros(shape=(self.num_output, self.len_train_output), dtype=np.float)
-            pred_train_output_mat.fill(np.nan)
+            seq_pred_train_output_mat = np.zeros(shape=(self.num_output, self.len_train_output), dtype=np.float)
+            seq_pred_train_output_mat.fill(np.nan)
             for i in range(self.num_sequence):
                 seq_pred_train_output = post_process_results(pred_train_output[i],
                                                              denom=self.train_denom_list[i],
                                                              ts_seasonality_in=self.ts_seasonality_in,
                                                              shift=i,
                                                              freq=self.freq).ravel()
-                pred_train_output_mat[i % self.num_output, i: i + self.num_output] = seq_pred_train_output
-            iter_pred_train_output = np.nanmean(pred_train_output_mat, axis=0)
+                seq_pred_train_output_mat[i % self.num_output, i: i + self.num_output] = seq_pred_train_output
+            iter_pred_train_output = np.nanmean(seq_pred_train_output_mat, axis=0)
             iter_train_smape, _ = smape(self.true_train_output, iter_pred_train_output)
             if iter_train_smape < 150:
                 # get the predicted test output
@@ -292,12 +477,19 @@ class TemporalLSTM:
                                                              shift=self.len_train_output,
                                                              freq=self.freq).ravel()
 
+                if iter_cnt == 0:
+                    self.fitted_weights = self.model.get_weights()
                 pred_train_output_mat = np.vstack((pred_train_output_mat, iter_pred_train_output))
                 pred_test_output_mat = np.vstack((pred_test_output_mat, iter_pred_test_output))
                 iter_cnt += 1
+            else:
+                retry_cnt += 1
 
+        if iter_cnt == 0:
+            return 0
         self.pred_train_output = np.nanmean(pred_train_output_mat, axis=0)
         self.pred_test_output = np.nanmean(pred_test_output_mat, axis=0)
+        return iter_cnt
 
     def evaluate(self):
         true = self.true_test_output
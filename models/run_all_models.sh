@@ -7,7 +7,7 @@ if [ -f "$log_file" ]; then
   rm "$log_file"
 fi
 
-## I provide the result 'justify_persistent_link.log' so unnecessary to run this script, it takes about 2 hours to finish
+## I provide the result 'justify_persistent_link.log' so unnecessary to run this script, it takes about 30 seconds to finish
 # python justify_persistent_link.py >> "$log_file"
 ## I provide the result 'random_pearsonr.log', 'ephemeral_pearsonr.log', 'persistent_pearsonr.log',
 ## 'reciprocal_pearsonr.log', so unnecessary to run this script, it takes about 2 hours to finish
@@ -19,6 +19,12 @@ echo '++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 ## I provide the result 'forecast_tracker_all.json' so unnecessary to run this script
 # python forecast_next_week.py >> "$log_file"
+## it rewrites '../data/online_*_state.npz' and 'forecast_tracker_online.json', so uncomment to refresh the online forecasts
+# python forecast_online.py >> "$log_file"
+
+sleep 60
+echo '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++' >> "$log_file"
+
 python plot_fig4_basic_statistics.py >> "$log_file"
 
 sleep 60
@@ -1,3 +1,14 @@
+import logging
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.stats import norm
+
+# per-node component labels of the bow-tie structure
+LSCC, IN, OUT, TENDRILS, TUBES, DISCONNECTED = range(6)
+BOWTIE_LABELS = ['LSCC', 'IN', 'OUT', 'Tendrils', 'Tubes', 'Disconnected']
+
+
 def is_in_component(scc, graph_embedding, largest_scc):
     # is scc an IN component to largest_scc?
     for src in scc:
@@ -14,3 +25,529 @@ def is_out_component(scc, graph_embedding, largest_scc):
             if tar in scc:
                 return True
     return False
+
+
+def build_csr(src, tar, num_nodes):
+    """ Build a sparse adjacency matrix, row is source and column is target.
+    """
+    return csr_matrix((np.ones(len(src), dtype=bool), (src, tar)), shape=(num_nodes, num_nodes))
+
+
+def pack_edge_keys(src, tar, num_nodes):
+    """ Sorted unique int64 keys src * num_nodes + tar of edges, in row-major order of the adjacency matrix.
+    """
+    keys = np.sort(np.asarray(src, dtype=np.int64) * num_nodes + tar)
+    if len(keys) > 1:
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    return keys
+
+
+def reachable_from(graph, seed_mask, blocked_mask=None):
+    """ Level-synchronous BFS from all seeds at once.
+    :param graph: csr adjacency matrix
+    :param seed_mask: boolean array, nodes to start from
+    :param blocked_mask: boolean array, nodes that can not be visited
+    :return: boolean array, nodes reachable from any seed, seeds included
+    """
+    indptr, indices = graph.indptr, graph.indices
+    visited = np.array(seed_mask, dtype=bool)
+    if blocked_mask is not None:
+        visited = visited | blocked_mask
+    # scratch array to deduplicate the next frontier without sorting
+    first_seen = np.empty(len(visited), dtype=np.int64)
+    frontier = np.flatnonzero(seed_mask)
+    while len(frontier) > 0:
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        num_nbrs = np.sum(counts)
+        if num_nbrs == 0:
+            break
+        # gather the neighbors of all frontier nodes in one shot
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(num_nbrs)
+        nbrs = indices[offsets]
+        nbrs = nbrs[~visited[nbrs]]
+        first_seen[nbrs] = np.arange(len(nbrs))
+        frontier = nbrs[first_seen[nbrs] == np.arange(len(nbrs))]
+        visited[frontier] = True
+    if blocked_mask is not None:
+        visited &= ~blocked_mask | seed_mask
+    return visited
+
+
+def bowtie_decomposition(src, tar, num_nodes):
+    """ Decompose a directed graph into the bow-tie structure around its largest SCC.
+    IN reaches the largest SCC, OUT is reached from it, Tendrils are reached from IN or reach OUT,
+    Tubes are both reached from IN and reach OUT, the rest are Disconnected.
+    :return: per-node component labels, per-node SCC labels
+    """
+    graph = build_csr(src, tar, num_nodes)
+    rev_graph = build_csr(tar, src, num_nodes)
+    _, scc_labels = connected_components(graph, directed=True, connection='strong')
+    largest_scc_mask = scc_labels == np.argmax(np.bincount(scc_labels))
+
+    out_mask = reachable_from(graph, largest_scc_mask) & ~largest_scc_mask
+    in_mask = reachable_from(rev_graph, largest_scc_mask) & ~largest_scc_mask
+    core_mask = largest_scc_mask | in_mask | out_mask
+    from_in_mask = reachable_from(graph, in_mask) & ~core_mask
+    to_out_mask = reachable_from(rev_graph, out_mask) & ~core_mask
+
+    return _assign_labels(largest_scc_mask, in_mask, out_mask, from_in_mask, to_out_mask), scc_labels
+
+
+def _assign_labels(largest_scc_mask, in_mask, out_mask, from_in_mask, to_out_mask):
+    labels = np.full(len(largest_scc_mask), DISCONNECTED, dtype=np.uint8)
+    labels[largest_scc_mask] = LSCC
+    labels[in_mask] = IN
+    labels[out_mask] = OUT
+    labels[from_in_mask | to_out_mask] = TENDRILS
+    labels[from_in_mask & to_out_mask] = TUBES
+    return labels
+
+
+class IncrementalBowtie:
+    """ Bow-tie structure maintained under batches of edge insertions.
+    SCCs are only recomputed within the region that can close a new cycle, i.e., nodes reachable from the targets
+    and reaching the sources of new edges. Reachability from and to the largest SCC only grows from new edges.
+    """
+
+    def __init__(self, src, tar, num_nodes):
+        self.num_nodes = num_nodes
+        self.edge_keys = pack_edge_keys(src, tar, num_nodes)
+        self._rebuild()
+
+    def _rebuild(self):
+        self._build_graph()
+        _, scc_labels = connected_components(self.graph, directed=True, connection='strong')
+        # label each SCC by one of its nodes, so that labels stay below num_nodes after relabelling
+        self.scc_labels = np.unique(scc_labels, return_index=True)[1][scc_labels]
+        self._rebuild_reachability()
+
+    def _build_graph(self):
+        # sorted edge keys are already in row-major order
+        src, tar = np.divmod(self.edge_keys, self.num_nodes)
+        indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=self.num_nodes), out=indptr[1:])
+        self.graph = csr_matrix((np.ones(len(tar), dtype=bool), tar, indptr), shape=(self.num_nodes, self.num_nodes))
+        self.rev_graph = self.graph.transpose().tocsr()
+
+    def _rebuild_reachability(self):
+        largest_scc_mask = self.scc_labels == np.argmax(np.bincount(self.scc_labels))
+        # any node in the largest SCC tells whether it is later merged into or replaced by another SCC
+        self.lscc_node = np.flatnonzero(largest_scc_mask)[0]
+        self.from_lscc = reachable_from(self.graph, largest_scc_mask)
+        self.to_lscc = reachable_from(self.rev_graph, largest_scc_mask)
+        self.from_in = reachable_from(self.graph, self.to_lscc)
+        self.to_out = reachable_from(self.rev_graph, self.from_lscc)
+
+    def _node_mask(self, nodes):
+        mask = np.zeros(self.num_nodes, dtype=bool)
+        mask[nodes] = True
+        return mask
+
+    @staticmethod
+    def _contains(sorted_keys, keys):
+        # for each key, is it in sorted_keys?
+        if len(sorted_keys) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        idx = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        return sorted_keys[idx] == keys
+
+    def add_edges(self, src, tar):
+        keys = pack_edge_keys(src, tar, self.num_nodes)
+        is_new = ~self._contains(self.edge_keys, keys)
+        if not np.any(is_new):
+            return
+        self.edge_keys = np.insert(self.edge_keys, np.searchsorted(self.edge_keys, keys[is_new]), keys[is_new])
+        self._build_graph()
+        src, tar = np.divmod(keys[is_new], self.num_nodes)
+
+        self._merge_scc(src, tar)
+        if self.scc_labels[self.lscc_node] != np.argmax(np.bincount(self.scc_labels)):
+            # another SCC outgrows the largest SCC
+            self._rebuild_reachability()
+            return
+        new_from_lscc = self._grow(self.from_lscc, self.graph, tar[self.from_lscc[src]])
+        new_to_lscc = self._grow(self.to_lscc, self.rev_graph, src[self.to_lscc[tar]])
+        self._grow(self.from_in, self.graph, np.concatenate([new_to_lscc, tar[self.from_in[src]]]))
+        self._grow(self.to_out, self.rev_graph, np.concatenate([new_from_lscc, src[self.to_out[tar]]]))
+
+    def _merge_scc(self, src, tar):
+        is_inter_scc = self.scc_labels[src] != self.scc_labels[tar]
+        if not np.any(is_inter_scc):
+            return
+        # a new cycle must go from the target of a new edge to the source of a new edge
+        region = np.flatnonzero(reachable_from(self.graph, self._node_mask(tar[is_inter_scc]))
+                                & reachable_from(self.rev_graph, self._node_mask(src[is_inter_scc])))
+        self._relabel_scc(region)
+
+    def _relabel_scc(self, region):
+        # recompute SCCs on the subgraph induced by region, which must be a union of old and new SCCs
+        _, region_scc_labels = connected_components(self.graph[region][:, region], directed=True, connection='strong')
+        self.scc_labels[region] = region[np.unique(region_scc_labels, return_index=True)[1]][region_scc_labels]
+
+    @staticmethod
+    def _grow(mask, graph, starts):
+        # mark all unmarked nodes reachable from starts, return the newly marked nodes
+        starts = starts[~mask[starts]]
+        if len(starts) == 0:
+            return starts
+        seed_mask = np.zeros(len(mask), dtype=bool)
+        seed_mask[starts] = True
+        newly_marked = reachable_from(graph, seed_mask, blocked_mask=mask)
+        mask |= newly_marked
+        return np.flatnonzero(newly_marked)
+
+    def labels(self):
+        core_mask = self.from_lscc | self.to_lscc
+        return _assign_labels(self.from_lscc & self.to_lscc, self.to_lscc & ~self.from_lscc, self.from_lscc & ~self.to_lscc,
+                              self.from_in & ~core_mask, self.to_out & ~core_mask)
+
+
+class DynamicBowtie(IncrementalBowtie):
+    """ Bow-tie structure maintained under batches of edge insertions and deletions.
+    A deleted edge can only split the SCC it lies in, so SCCs are recomputed within the SCCs that lose an edge, then
+    merged as in IncrementalBowtie. A node can only lose reachability from or to the largest SCC if it is reachable
+    from a deleted edge, those nodes are unmarked and marked again from their remaining marked neighbors.
+    The structure is rebuilt from scratch when the churn exceeds max_churn of the edges.
+    """
+
+    def __init__(self, src, tar, num_nodes, max_churn=0.2):
+        self.max_churn = max_churn
+        super().__init__(src, tar, num_nodes)
+
+    def update(self, src, tar):
+        """ Move to the graph of the given edges, e.g., the snapshot of next day.
+        :return: number of inserted edges, number of deleted edges
+        """
+        keys = pack_edge_keys(src, tar, self.num_nodes)
+        is_kept = self._contains(keys, self.edge_keys)
+        is_added = ~self._contains(self.edge_keys, keys)
+        num_added, num_deleted = np.sum(is_added), len(self.edge_keys) - np.sum(is_kept)
+        if num_added + num_deleted > self.max_churn * len(self.edge_keys):
+            self.edge_keys = keys
+            self._rebuild()
+        else:
+            self.apply_changes(*np.divmod(keys[is_added], self.num_nodes),
+                               *np.divmod(self.edge_keys[~is_kept], self.num_nodes))
+        return num_added, num_deleted
+
+    def remove_edges(self, src, tar):
+        empty = np.zeros(0, dtype=np.int64)
+        self.apply_changes(empty, empty, src, tar)
+
+    def apply_changes(self, add_src, add_tar, del_src, del_tar):
+        add_keys = pack_edge_keys(add_src, add_tar, self.num_nodes)
+        del_keys = pack_edge_keys(del_src, del_tar, self.num_nodes)
+        del_keys = del_keys[self._contains(self.edge_keys, del_keys) & ~self._contains(add_keys, del_keys)]
+        add_keys = add_keys[~self._contains(self.edge_keys, add_keys)]
+        if len(add_keys) + len(del_keys) == 0:
+            return
+        is_kept = np.ones(len(self.edge_keys), dtype=bool)
+        is_kept[np.searchsorted(self.edge_keys, del_keys)] = False
+        self.edge_keys = self.edge_keys[is_kept]
+        self.edge_keys = np.insert(self.edge_keys, np.searchsorted(self.edge_keys, add_keys), add_keys)
+        self._build_graph()
+        add_src, add_tar = np.divmod(add_keys, self.num_nodes)
+        del_src, del_tar = np.divmod(del_keys, self.num_nodes)
+
+        old_largest_scc_mask = self.scc_labels == self.scc_labels[self.lscc_node]
+        self._split_scc(del_src, del_tar)
+        self._merge_scc(add_src, add_tar)
+        if self.scc_labels[self.lscc_node] != np.argmax(np.bincount(self.scc_labels)):
+            # the largest SCC is split or replaced by another SCC
+            self._rebuild_reachability()
+            return
+        largest_scc_mask = self.scc_labels == self.scc_labels[self.lscc_node]
+        old_to_lscc, old_from_lscc = self.to_lscc.copy(), self.from_lscc.copy()
+        self._update_reachability(self.from_lscc, self.graph, self.rev_graph, largest_scc_mask, old_largest_scc_mask,
+                                  add_src, add_tar, del_src, del_tar)
+        self._update_reachability(self.to_lscc, self.rev_graph, self.graph, largest_scc_mask, old_largest_scc_mask,
+                                  add_tar, add_src, del_tar, del_src)
+        self._update_reachability(self.from_in, self.graph, self.rev_graph, self.to_lscc, old_to_lscc,
+                                  add_src, add_tar, del_src, del_tar)
+        self._update_reachability(self.to_out, self.rev_graph, self.graph, self.from_lscc, old_from_lscc,
+                                  add_tar, add_src, del_tar, del_src)
+
+    def _split_scc(self, src, tar):
+        is_intra_scc = self.scc_labels[src] == self.scc_labels[tar]
+        if not np.any(is_intra_scc):
+            return
+        region = np.flatnonzero(np.isin(self.scc_labels, self.scc_labels[src[is_intra_scc]]))
+        self._relabel_scc(region)
+
+    def _update_reachability(self, mask, graph, rev_graph, seed_mask, old_seed_mask, add_src, add_tar, del_src, del_tar):
+        """ Update mask, the nodes reachable in graph from seed_mask, after the edge changes.
+        Any node that loses reachability is reachable from a deleted edge or from a node that is no longer a seed,
+        without passing through the current seeds.
+        """
+        starts = np.concatenate([del_tar[mask[del_src]], np.flatnonzero(old_seed_mask & ~seed_mask)])
+        starts = starts[~seed_mask[starts]]
+        regrow_starts = starts[:0]
+        if len(starts) > 0:
+            suspect_mask = reachable_from(graph, self._node_mask(starts), blocked_mask=~mask | seed_mask)
+            mask &= ~suspect_mask
+            suspects = np.flatnonzero(suspect_mask)
+            regrow_starts = suspects[_has_neighbor_in(rev_graph, suspects, mask)]
+        self._grow(mask, graph, np.concatenate([regrow_starts, np.flatnonzero(seed_mask & ~mask), add_tar[mask[add_src]]]))
+
+
+def _has_neighbor_in(graph, nodes, mask):
+    # for each node, does it have any neighbor in mask?
+    sub_graph = graph[nodes]
+    row_idx = np.repeat(np.arange(len(nodes)), np.diff(sub_graph.indptr))
+    return np.bincount(row_idx, weights=mask[sub_graph.indices], minlength=len(nodes)) > 0
+
+
+class ApproximateBowtie:
+    """ Estimate the fraction of nodes and views in each bow-tie component from randomly sampled nodes.
+    The largest SCC is represented by the SCC of an anchor node, chosen among the nodes with most links by default.
+    Each sampled node is classified by BFS that stops as soon as it hits a node known to reach, or be reached from,
+    the anchor. Search results are memoized across samples, so that the cost grows with the number of samples rather
+    than the graph size.
+    """
+
+    def __init__(self, src, tar, num_nodes, anchor=None, num_candidates=10, num_pilot_samples=100, warmup_depth=2):
+        self.num_nodes = num_nodes
+        self.warmup_depth = warmup_depth
+        self.graph = build_csr(src, tar, num_nodes)
+        self.rev_graph = self.graph.transpose().tocsr()
+        self._no_skip_mask = np.zeros(num_nodes, dtype=bool)
+        self._visited = np.zeros(num_nodes, dtype=bool)
+        if anchor is None:
+            # among the nodes with most links, pick the one whose SCC covers most of a pilot sample
+            degree_score = np.diff(self.graph.indptr).astype(np.int64) * np.diff(self.rev_graph.indptr)
+            candidates = np.argsort(-degree_score)[:num_candidates]
+            pilot_samples = np.random.RandomState(0).randint(0, num_nodes, size=num_pilot_samples)
+            pilot_scores = []
+            for candidate in candidates:
+                self._reset(candidate)
+                pilot_scores.append(np.sum([self.classify(node) == LSCC for node in pilot_samples]))
+            anchor = candidates[np.argmax(pilot_scores)]
+        self._reset(anchor)
+
+    def _reset(self, anchor):
+        self.anchor = anchor
+        # nodes known to reach or not reach the anchor, to be reached or not reached from the anchor
+        self.reach_mask = self._bounded_reachable(self.rev_graph, anchor, self.warmup_depth)
+        self.reached_mask = self._bounded_reachable(self.graph, anchor, self.warmup_depth)
+        self.no_reach_mask = np.zeros(self.num_nodes, dtype=bool)
+        self.not_reached_mask = np.zeros(self.num_nodes, dtype=bool)
+        self._label_dict = {}
+
+    def _bounded_reachable(self, graph, source, depth):
+        mask = np.zeros(self.num_nodes, dtype=bool)
+        mask[source] = True
+        frontier = np.array([source])
+        for _ in range(depth):
+            frontier = graph[frontier].indices
+            frontier = frontier[~mask[frontier]]
+            mask[frontier] = True
+        return mask
+
+    def _search(self, graph, starts, stop_mask, skip_mask):
+        """ BFS from starts that stops at the first level hitting stop_mask, never visiting skip_mask.
+        :return: whether stop_mask is hit, visited nodes
+        """
+        indptr, indices = graph.indptr, graph.indices
+        frontier = np.unique(starts)
+        self._visited[frontier] = True
+        visited_list = [frontier]
+        is_hit = np.any(stop_mask[frontier])
+        while not is_hit and len(frontier) > 0:
+            starts = indptr[frontier]
+            counts = indptr[frontier + 1] - starts
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(np.sum(counts))
+            nbrs = indices[offsets]
+            frontier = np.unique(nbrs[~self._visited[nbrs] & ~skip_mask[nbrs]])
+            self._visited[frontier] = True
+            visited_list.append(frontier)
+            is_hit = np.any(stop_mask[frontier])
+        visited_nodes = np.concatenate(visited_list)
+        # reset the scratch array on visited nodes only
+        self._visited[visited_nodes] = False
+        return is_hit, visited_nodes
+
+    def _reaches(self, graph, starts, known_mask, known_not_mask):
+        # do starts reach the anchor in graph? memoize the visited nodes if not
+        is_hit, visited_nodes = self._search(graph, starts, known_mask, known_not_mask)
+        if not is_hit:
+            known_not_mask[visited_nodes] = True
+        return is_hit
+
+    def classify(self, node):
+        if node in self._label_dict:
+            return self._label_dict[node]
+        starts = np.array([node])
+        is_reach = self.reach_mask[node] or (not self.no_reach_mask[node]
+                                             and self._reaches(self.graph, starts, self.reach_mask, self.no_reach_mask))
+        is_reached = self.reached_mask[node] or (not self.not_reached_mask[node]
+                                                 and self._reaches(self.rev_graph, starts, self.reached_mask, self.not_reached_mask))
+        if is_reach:
+            self.reach_mask[node] = True
+        if is_reached:
+            self.reached_mask[node] = True
+
+        if is_reach and is_reached:
+            label = LSCC
+        elif is_reach:
+            label = IN
+        elif is_reached:
+            label = OUT
+        else:
+            # from IN if any ancestor reaches the anchor, to OUT if any descendant is reached from the anchor
+            is_hit, ancestors = self._search(self.rev_graph, starts, self.reach_mask, self._no_skip_mask)
+            is_from_in = is_hit or self._reaches(self.graph, ancestors, self.reach_mask, self.no_reach_mask)
+            is_hit, descendants = self._search(self.graph, starts, self.reached_mask, self._no_skip_mask)
+            is_to_out = is_hit or self._reaches(self.rev_graph, descendants, self.reached_mask, self.not_reached_mask)
+            if is_from_in and is_to_out:
+                label = TUBES
+            elif is_from_in or is_to_out:
+                label = TENDRILS
+            else:
+                label = DISCONNECTED
+        self._label_dict[node] = label
+        return label
+
+    def estimate(self, num_samples, views=None, confidence=0.95, random_state=None):
+        """ Estimate component fractions from num_samples nodes sampled uniformly, and num_samples nodes sampled
+        proportional to views if views is given.
+        :return: dict of fraction, lower and upper bound of the confidence interval, each of length num components
+        """
+        rng = np.random.RandomState(random_state)
+        sample_dict = {'nodes': rng.randint(0, self.num_nodes, size=num_samples)}
+        if views is not None:
+            sample_dict['views'] = rng.choice(self.num_nodes, size=num_samples, p=views / np.sum(views))
+        estimate_dict = {}
+        for key, samples in sample_dict.items():
+            counts = np.bincount([self.classify(node) for node in samples], minlength=len(BOWTIE_LABELS))
+            lower, upper = wilson_interval(counts, num_samples, confidence)
+            estimate_dict[key] = {'fraction': counts / num_samples, 'lower': lower, 'upper': upper}
+        return estimate_dict
+
+
+def wilson_interval(count, num_samples, confidence=0.95):
+    """ Wilson score interval of a binomial proportion.
+    """
+    z = norm.ppf(0.5 + confidence / 2)
+    p = np.asarray(count) / num_samples
+    denominator = 1 + z ** 2 / num_samples
+    center = (p + z ** 2 / (2 * num_samples)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / num_samples + z ** 2 / (4 * num_samples ** 2)) / denominator
+    # the bounds are exactly 0 and 1 at the extremes, avoid rounding errors
+    return np.where(p == 0, 0, center - half_width), np.where(p == 1, 1, center + half_width)
+
+
+def num_samples_for_error(error, confidence=0.95):
+    """ Number of samples such that the confidence interval of any fraction is at most +/- error wide.
+    """
+    z = norm.ppf(0.5 + confidence / 2)
+    return int(np.ceil(z ** 2 / (4 * error ** 2)))
+
+
+def summarize_bowtie(labels, scc_labels, views):
+    """ Number of nodes, views and SCCs in each bow-tie component, indexed by component label.
+    """
+    num_labels = len(BOWTIE_LABELS)
+    num_nodes_arr = np.bincount(labels, minlength=num_labels)
+    views_arr = np.bincount(labels, weights=views, minlength=num_labels).astype(np.int64)
+    # every SCC falls in exactly one component
+    scc_first_node = np.unique(scc_labels, return_index=True)[1]
+    num_scc_arr = np.bincount(labels[scc_first_node], minlength=num_labels)
+    return {'num_nodes': num_nodes_arr, 'views': views_arr, 'num_scc': num_scc_arr}
+
+
+def log_bowtie_summary(summary):
+    """ Log the bow-tie summary in the format of bowtie_*.log, Tubes are counted towards Tendrils.
+    """
+    total_nodes = np.sum(summary['num_nodes'])
+    total_views = np.sum(summary['views'])
+    num_nodes_arr = summary['num_nodes'].copy()
+    views_arr = summary['views'].copy()
+    num_scc_arr = summary['num_scc'].copy()
+    for arr in [num_nodes_arr, views_arr, num_scc_arr]:
+        arr[TENDRILS] += arr[TUBES]
+
+    logging.info('>>> {0} ({1:.2f}%) nodes in the largest SCC'.format(num_nodes_arr[LSCC], num_nodes_arr[LSCC] / total_nodes * 100))
+    logging.info('    {0} ({1:.2f}%) views in the largest SCC'.format(views_arr[LSCC], views_arr[LSCC] / total_views * 100))
+    for label, name in [(IN, 'IN component'), (OUT, 'OUT component'), (TENDRILS, 'Tendrils'), (DISCONNECTED, 'Disconnected')]:
+        logging.info('>>> {0} ({1:.2f}%) nodes in the {2}'.format(num_nodes_arr[label], num_nodes_arr[label] / total_nodes * 100, name))
+        logging.info('    {0} scc in the {1}'.format(num_scc_arr[label], name))
+        logging.info('    {0} ({1:.2f}%) views in the {2}'.format(views_arr[label], views_arr[label] / total_views * 100, name))
+
+
+def save_bowtie_results(filepath, x_values, summary_list, labels_list):
+    """ Save bow-tie results of a sequence of graphs, e.g., days or cutoffs, into a compressed npz file.
+    num_nodes, views and num_scc are of shape (T, num components), labels is of shape (T, num_nodes) in uint8,
+    transitions is of shape (T-1, num components, num components).
+    """
+    np.savez_compressed(filepath,
+                        x_values=np.array(x_values),
+                        label_names=np.array(BOWTIE_LABELS),
+                        num_nodes=np.array([summary['num_nodes'] for summary in summary_list]),
+                        views=np.array([summary['views'] for summary in summary_list]),
+                        num_scc=np.array([summary['num_scc'] for summary in summary_list]),
+                        labels=np.array(labels_list, dtype=np.uint8),
+                        transitions=np.array([transition_matrix(labels_list[t - 1], labels_list[t])
+                                              for t in range(1, len(labels_list))], dtype=np.int64))
+
+
+def load_bowtie_results(filepath):
+    with np.load(filepath) as bowtie_results:
+        return {key: bowtie_results[key] for key in bowtie_results.files}
+
+
+def bowtie_fractions(bowtie_results):
+    """ Fraction of nodes and views in LSCC, IN, OUT, Tendrils and Disconnected, Tubes are counted towards Tendrils.
+    :return: two arrays of shape (5, T), fraction of nodes and fraction of views
+    """
+    fraction_list = []
+    for key in ['num_nodes', 'views']:
+        mat = bowtie_results[key].astype(np.float64)
+        mat[:, TENDRILS] += mat[:, TUBES]
+        mat = np.delete(mat, TUBES, axis=1)
+        fraction_list.append((mat / np.sum(mat, axis=1, keepdims=True)).T)
+    return fraction_list[0], fraction_list[1]
+
+
+def find_transitions(labels, from_label, to_label):
+    """ Nodes that move from one component to another between consecutive graphs.
+    :param labels: per-node component labels of shape (T, num_nodes)
+    :return: boolean array of shape (T-1, num_nodes), True if the node moves between graph t and t+1
+    """
+    return (labels[:-1] == from_label) & (labels[1:] == to_label)
+
+
+def transition_matrix(prev_labels, labels):
+    """ Number of nodes moving from component i in the previous graph to component j in the current graph.
+    """
+    num_labels = len(BOWTIE_LABELS)
+    return np.bincount(prev_labels.astype(np.int64) * num_labels + labels, minlength=num_labels ** 2).reshape(num_labels, num_labels)
+
+
+def log_transitions(trans_mat):
+    """ Log the number of nodes changing component, one line per pair of components.
+    """
+    logging.info('>>> {0} nodes change component since the previous graph'.format(np.sum(trans_mat) - np.trace(trans_mat)))
+    for from_label, from_name in enumerate(BOWTIE_LABELS):
+        for to_label, to_name in enumerate(BOWTIE_LABELS):
+            if from_label != to_label and trans_mat[from_label, to_label] > 0:
+                logging.info('    {0} from {1} to {2}'.format(trans_mat[from_label, to_label], from_name, to_name))
+
+
+def log_bowtie_estimate(estimate_dict, summary=None):
+    """ Log the estimated fraction of nodes and views in each component, together with the exact fraction if summary
+    of the exact bow-tie structure is given.
+    """
+    for label, name in enumerate(BOWTIE_LABELS):
+        line = '>>> estimated {0}:'.format(name)
+        for key, unit in [('nodes', 'nodes'), ('views', 'views')]:
+            if key in estimate_dict:
+                estimate = estimate_dict[key]
+                line += ' {0:.2f}% [{1:.2f}%, {2:.2f}%] of {3},'.format(estimate['fraction'][label] * 100,
+                                                                       estimate['lower'][label] * 100,
+                                                                       estimate['upper'][label] * 100, unit)
+        if summary is not None:
+            line += ' exact {0:.2f}% of nodes, {1:.2f}% of views,'.format(
+                summary['num_nodes'][label] / np.sum(summary['num_nodes']) * 100,
+                summary['views'][label] / np.sum(summary['views']) * 100)
+        logging.info(line.rstrip(','))
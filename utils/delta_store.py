@@ -0,0 +1,140 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+
+from utils.helper import obj2str, str2obj
+
+DELTA_META_FILENAME = 'meta.npz'
+
+
+def pack_edge_ids(src, tar, pos, num_videos, num_pos):
+    """ Sorted int64 ids (tar * num_videos + src) * num_pos + pos, edges are grouped by target as in the pickles.
+    """
+    edge_ids = (np.asarray(tar, dtype=np.int64) * num_videos + src) * num_pos + pos
+    return np.sort(edge_ids)
+
+
+def unpack_edge_ids(edge_ids, num_videos, num_pos):
+    keys, pos = np.divmod(edge_ids, num_pos)
+    tar, src = np.divmod(keys, num_videos)
+    return src.astype(np.int32), tar.astype(np.int32), pos.astype(np.int8)
+
+
+def _encode_sorted(arr):
+    # sorted ids are stored as gaps, which are small and compress well
+    return np.diff(arr, prepend=0)
+
+
+def _decode_sorted(arr):
+    return np.cumsum(arr, dtype=np.int64)
+
+
+def _isin_sorted(arr, sorted_arr):
+    idx = np.searchsorted(sorted_arr, arr)
+    is_in = idx < len(sorted_arr)
+    is_in[is_in] = sorted_arr[idx[is_in]] == arr[is_in]
+    return is_in
+
+
+def _unique_keys(keys):
+    # keys that appear exactly once in a sorted key array
+    is_first = np.r_[True, keys[1:] != keys[:-1]]
+    is_last = np.r_[keys[1:] != keys[:-1], True]
+    return keys[is_first & is_last]
+
+
+def diff_snapshots(prev_ids, curr_ids, num_pos):
+    """ Edges removed and added from prev_ids to curr_ids.
+    A link (src, tar) that only changes position is encoded as a move of its key to the new position.
+    :return: removed ids, added ids, moved keys, moved positions
+    """
+    removed = prev_ids[~_isin_sorted(prev_ids, curr_ids)]
+    added = curr_ids[~_isin_sorted(curr_ids, prev_ids)]
+    moved_keys = np.intersect1d(_unique_keys(removed // num_pos), _unique_keys(added // num_pos), assume_unique=True)
+    # only links with one position on both days are moved, so the sorted order of ids is kept
+    moved_keys = moved_keys[_isin_sorted(moved_keys, _unique_keys(prev_ids // num_pos))
+                            & _isin_sorted(moved_keys, _unique_keys(curr_ids // num_pos))]
+    removed = removed[~_isin_sorted(removed // num_pos, moved_keys)]
+    is_moved = _isin_sorted(added // num_pos, moved_keys)
+    moved_pos = (added[is_moved] % num_pos).astype(np.int8)
+    return removed, added[~is_moved], moved_keys, moved_pos
+
+
+def apply_delta(edge_ids, removed, added, moved_keys, moved_pos, num_pos):
+    edge_ids = edge_ids[~_isin_sorted(edge_ids, removed)]
+    if len(moved_keys) > 0:
+        idx = np.searchsorted(edge_ids // num_pos, moved_keys)
+        edge_ids[idx] = moved_keys * num_pos + moved_pos
+    return np.insert(edge_ids, np.searchsorted(edge_ids, added), added)
+
+
+def write_delta_store(dirpath, snapshots, num_videos, T=63, start_date=datetime(2018, 9, 1), keyframe_interval=7,
+                      num_pos=50):
+    """ Store daily snapshots as keyframes every keyframe_interval days and added/removed/moved edges in between.
+    Edge views are the daily views of the source video, they are stored once as a (num_videos, T) matrix.
+    :param snapshots: iterable of (t, (src, tar, pos, view)) in the order of days, e.g., from iter_snapshots
+    """
+    if not os.path.exists(dirpath):
+        os.mkdir(dirpath)
+    node_views = np.zeros((num_videos, T), dtype=np.int64)
+    prev_ids = None
+    for t, (src, tar, pos, view) in snapshots:
+        node_views[src, t] = view
+        if not np.array_equal(node_views[src, t], view):
+            raise ValueError('edge views on day {0} are not determined by the source video'.format(t))
+        curr_ids = pack_edge_ids(src, tar, pos, num_videos, num_pos)
+        filepath = os.path.join(dirpath, 'network_{0}.npz'.format(obj2str(start_date + timedelta(days=t))))
+        if t % keyframe_interval == 0:
+            np.savez_compressed(filepath, edge_ids=_encode_sorted(curr_ids))
+        else:
+            removed, added, moved_keys, moved_pos = diff_snapshots(prev_ids, curr_ids, num_pos)
+            np.savez_compressed(filepath, removed=_encode_sorted(removed), added=_encode_sorted(added),
+                                moved_keys=_encode_sorted(moved_keys), moved_pos=moved_pos)
+        prev_ids = curr_ids
+    np.savez_compressed(os.path.join(dirpath, DELTA_META_FILENAME), num_videos=num_videos, T=T,
+                        start_date=obj2str(start_date), keyframe_interval=keyframe_interval, num_pos=num_pos,
+                        node_views=node_views)
+
+
+class DeltaSnapshotStore:
+    """ Reader of snapshots written by write_delta_store, as columnar src, tar, pos, view arrays.
+    load(t) starts from the closest keyframe before day t, iterate() applies the deltas in the order of days.
+    """
+
+    def __init__(self, dirpath):
+        self.dirpath = dirpath
+        with np.load(os.path.join(dirpath, DELTA_META_FILENAME)) as meta:
+            self.num_videos = int(meta['num_videos'])
+            self.T = int(meta['T'])
+            self.start_date = str2obj(str(meta['start_date']))
+            self.keyframe_interval = int(meta['keyframe_interval'])
+            self.num_pos = int(meta['num_pos'])
+            self.node_views = meta['node_views']
+
+    def _filepath(self, t):
+        return os.path.join(self.dirpath, 'network_{0}.npz'.format(obj2str(self.start_date + timedelta(days=t))))
+
+    def _next_ids(self, t, edge_ids):
+        with np.load(self._filepath(t)) as day:
+            if t % self.keyframe_interval == 0:
+                return _decode_sorted(day['edge_ids'])
+            return apply_delta(edge_ids, _decode_sorted(day['removed']), _decode_sorted(day['added']),
+                               _decode_sorted(day['moved_keys']), day['moved_pos'], self.num_pos)
+
+    def _to_arrays(self, t, edge_ids):
+        src, tar, pos = unpack_edge_ids(edge_ids, self.num_videos, self.num_pos)
+        return src, tar, pos, self.node_views[src, t]
+
+    def load(self, t):
+        edge_ids = None
+        for day in range(t - t % self.keyframe_interval, t + 1):
+            edge_ids = self._next_ids(day, edge_ids)
+        return self._to_arrays(t, edge_ids)
+
+    def iterate(self, start=0, T=None):
+        """ Yield (t, snapshot) for days start to T - 1, relative to the start date of the store."""
+        edge_ids = None
+        for t in range(start - start % self.keyframe_interval, self.T if T is None else T):
+            edge_ids = self._next_ids(t, edge_ids)
+            if t >= start:
+                yield t, self._to_arrays(t, edge_ids)
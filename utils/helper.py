@@ -60,6 +60,37 @@ def is_persistent_link(lst):
     return True
 
 
+def batch_is_persistent_link(mat):
+    """ Vectorized is_persistent_link over the rows of a 2D 0/1 linkage matrix, returns a boolean array.
+    """
+    mat = np.asarray(mat, dtype=np.int32)
+    if mat.ndim == 1:
+        mat = mat.reshape(1, -1)
+    n = mat.shape[1]
+    # prefix sums with a leading zero column, window sum over [i, j) is cum[:, j] - cum[:, i]
+    cum = np.zeros((mat.shape[0], n + 1), dtype=np.int32)
+    np.cumsum(mat, axis=1, out=cum[:, 1:])
+    ret = (cum[:, 4] >= 2) & (cum[:, 5] >= 3) \
+          & (cum[:, n] - cum[:, n - 4] >= 2) & (cum[:, n] - cum[:, n - 5] >= 3)
+    if n > 7:
+        # sliding windows of width 7 starting at day 0 to day n-8, same as is_persistent_link
+        ret &= np.all(cum[:, 7: n] - cum[:, : n - 7] >= 4, axis=1)
+    return ret
+
+
+def quartile_partition(arr):
+    """ Partition values by quartiles, 0 for the top 25% (75th percentile and above), 1 for (25%, 50%],
+    2 for (50%, 75%], and 3 for the bottom 25%.
+    """
+    arr = np.asarray(arr)
+    median_value = np.median(arr)
+    first_quantile_value = np.percentile(arr, 75)
+    third_quantile_value = np.percentile(arr, 25)
+    return np.where(arr >= first_quantile_value, 0,
+                    np.where(arr >= median_value, 1,
+                             np.where(arr >= third_quantile_value, 2, 3)))
+
+
 def is_same_genre(lst1, lst2):
     if len(lst1) == 0 or len(lst2) == 0:
         return False
@@ -0,0 +1,238 @@
+import numpy as np
+
+from utils.helper import batch_is_persistent_link
+
+
+class EdgeLifetimeIndex:
+    """ Run-length presence of every video-to-video link over T days.
+    Link i has key edge_keys[i] = src * num_videos + tar, and runs run_offsets[i] to run_offsets[i + 1] - 1,
+    each run is present on consecutive days run_starts to run_ends (inclusive) with mean position run_mean_pos.
+    Queries return one value per link, in the order of edge_keys.
+    """
+
+    def __init__(self, edge_keys, run_offsets, run_starts, run_ends, run_mean_pos, num_videos, T):
+        self.edge_keys = edge_keys
+        self.run_offsets = run_offsets
+        self.run_starts = run_starts
+        self.run_ends = run_ends
+        self.run_mean_pos = run_mean_pos
+        self.num_videos = num_videos
+        self.T = T
+
+    @property
+    def num_links(self):
+        return len(self.edge_keys)
+
+    def src_tar(self):
+        return np.divmod(self.edge_keys, self.num_videos)
+
+    def lookup(self, src, tar):
+        """ Index of links (src, tar) in edge_keys, -1 if the link never appears."""
+        keys = np.asarray(src, dtype=np.int64) * self.num_videos + np.asarray(tar, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.edge_keys, keys), max(self.num_links - 1, 0))
+        return np.where(self.edge_keys[idx] == keys, idx, -1)
+
+    def _reduce_runs(self, ufunc, run_values):
+        return ufunc.reduceat(run_values, self.run_offsets[:-1])
+
+    def num_runs(self):
+        return np.diff(self.run_offsets)
+
+    def num_gaps(self):
+        """ Number of absences between the first and the last run."""
+        return self.num_runs() - 1
+
+    def longest_run(self):
+        return self._reduce_runs(np.maximum, self.run_ends - self.run_starts + 1)
+
+    def num_present_days(self, a=0, b=None):
+        """ Number of days present within days a to b (inclusive), the link frequency if over all days."""
+        b = self.T - 1 if b is None else b
+        overlap = np.minimum(self.run_ends, b) - np.maximum(self.run_starts, a) + 1
+        return self._reduce_runs(np.add, np.maximum(overlap, 0).astype(np.int64))
+
+    def present_at_least(self, k, a=0, b=None):
+        return self.num_present_days(a, b) >= k
+
+    def mean_position(self):
+        """ Mean position over all present days."""
+        run_lengths = (self.run_ends - self.run_starts + 1).astype(np.float64)
+        return self._reduce_runs(np.add, self.run_mean_pos * run_lengths) / self._reduce_runs(np.add, run_lengths)
+
+    def presence_matrix(self, idx=None):
+        """ Dense 0/1 linkage matrix of shape (len(idx), T), all links if idx is None."""
+        idx = np.arange(self.num_links) if idx is None else np.asarray(idx)
+        num_runs = self.run_offsets[idx + 1] - self.run_offsets[idx]
+        run_idx = np.repeat(self.run_offsets[idx] - np.cumsum(num_runs) + num_runs, num_runs) + np.arange(num_runs.sum())
+        rows = np.repeat(np.arange(len(idx)), num_runs)
+        # +1 at the start and -1 after the end of each run, presence is the running sum,
+        # runs are separated by at least one absent day so no two marks fall in the same cell
+        diff_mat = np.zeros((len(idx), self.T + 1), dtype=np.int8)
+        diff_mat[rows, self.run_starts[run_idx]] = 1
+        diff_mat[rows, self.run_ends[run_idx] + 1] = -1
+        return np.cumsum(diff_mat[:, :-1], axis=1, dtype=np.int8)
+
+    def is_persistent(self, chunk_size=100000):
+        """ is_persistent_link of every link, over chunks of links to bound the memory of linkage matrices."""
+        ret = np.zeros(self.num_links, dtype=bool)
+        for start in range(0, self.num_links, chunk_size):
+            idx = np.arange(start, min(start + chunk_size, self.num_links))
+            ret[idx] = batch_is_persistent_link(self.presence_matrix(idx))
+        return ret
+
+    def save(self, filepath):
+        np.savez_compressed(filepath, edge_keys=self.edge_keys, run_offsets=self.run_offsets, run_starts=self.run_starts,
+                            run_ends=self.run_ends, run_mean_pos=self.run_mean_pos, num_videos=self.num_videos, T=self.T)
+
+
+def load_edge_lifetime_index(filepath):
+    with np.load(filepath) as lifetime:
+        return EdgeLifetimeIndex(lifetime['edge_keys'], lifetime['run_offsets'], lifetime['run_starts'],
+                                 lifetime['run_ends'], lifetime['run_mean_pos'], int(lifetime['num_videos']),
+                                 int(lifetime['T']))
+
+
+class EdgeLifetimeBuilder:
+    """ Build an EdgeLifetimeIndex from daily links in the order of days, by extending the runs still open.
+    Memory is bounded by the number of runs.
+    """
+
+    def __init__(self, num_videos, T):
+        self.num_videos = num_videos
+        self.T = T
+        # runs open until the previous day, sorted by key
+        self.open_keys = np.empty(0, dtype=np.int64)
+        self.open_starts = np.empty(0, dtype=np.int16)
+        self.open_pos_sums = np.empty(0, dtype=np.int64)
+        self.closed_runs = []
+
+    def _close(self, mask, end):
+        self.closed_runs.append((self.open_keys[mask], self.open_starts[mask],
+                                 np.full(mask.sum(), end, dtype=np.int16),
+                                 self.open_pos_sums[mask] / (end - self.open_starts[mask] + 1)))
+
+    def update(self, t, src, tar, pos):
+        keys = np.asarray(src, dtype=np.int64) * self.num_videos + np.asarray(tar, dtype=np.int64)
+        # one entry per key, with its top position if listed twice
+        order = np.lexsort((pos, keys))
+        keys, pos = keys[order], np.asarray(pos, dtype=np.int64)[order]
+        is_first = np.r_[True, keys[1:] != keys[:-1]][:len(keys)]
+        keys, pos = keys[is_first], pos[is_first]
+
+        idx = np.minimum(np.searchsorted(keys, self.open_keys), max(len(keys) - 1, 0))
+        is_extended = (keys[idx] == self.open_keys) if len(keys) > 0 else np.zeros(len(self.open_keys), dtype=bool)
+        self._close(~is_extended, t - 1)
+        self.open_pos_sums[is_extended] += pos[idx[is_extended]]
+
+        is_new = np.ones(len(keys), dtype=bool)
+        is_new[idx[is_extended]] = False
+        open_keys = np.concatenate([self.open_keys[is_extended], keys[is_new]])
+        order = np.argsort(open_keys, kind='mergesort')
+        self.open_keys = open_keys[order]
+        self.open_starts = np.concatenate([self.open_starts[is_extended], np.full(is_new.sum(), t, dtype=np.int16)])[order]
+        self.open_pos_sums = np.concatenate([self.open_pos_sums[is_extended], pos[is_new]])[order]
+
+    def result(self):
+        self._close(np.ones(len(self.open_keys), dtype=bool), self.T - 1)
+        keys, starts, ends, mean_pos = [np.concatenate(x) for x in zip(*self.closed_runs)]
+        order = np.lexsort((starts, keys))
+        keys, starts, ends, mean_pos = keys[order], starts[order], ends[order], mean_pos[order]
+        is_first = np.r_[True, keys[1:] != keys[:-1]][:len(keys)]
+        run_offsets = np.append(np.flatnonzero(is_first), len(keys))
+        return EdgeLifetimeIndex(keys[is_first], run_offsets, starts, ends, mean_pos.astype(np.float32),
+                                 self.num_videos, self.T)
+
+
+# number of set bits of each byte value
+BYTE_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8).reshape(-1, 1), axis=1).sum(axis=1).astype(np.uint8)
+
+
+def popcount(masks):
+    return BYTE_POPCOUNT[masks.astype('<u8').view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def min_persistent_days(n):
+    """ Lower bound of present days for is_persistent_link over n days, from its disjoint windows of width 7."""
+    if n < 8:
+        return 0
+    return 4 * ((n - 8) // 7 + 1)
+
+
+def masks_to_matrix(masks, window):
+    """ 0/1 linkage matrix of shape (num_links, window) from bitmasks, bit j is day j of the window."""
+    bits = np.unpackbits(masks.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    return bits[:, :window]
+
+
+class SlidingPersistentNetwork:
+    """ Presence of every link over the last window days as uint64 bitmasks, updated one day at a time.
+    Bit window - 1 is the latest day, a new day shifts all masks by one bit and links absent from the window are dropped.
+    Persistence is evaluated once the window is full, only for links with at least min_persistent_days present days.
+    """
+
+    def __init__(self, num_videos, window=63):
+        if not 8 <= window <= 64:
+            raise ValueError('window must be between 8 and 64 days, got {0}'.format(window))
+        self.num_videos = num_videos
+        self.window = window
+        self.num_days = 0
+        self.last_date = ''
+        # sorted keys src * num_videos + tar, and their presence bitmasks
+        self.edge_keys = np.empty(0, dtype=np.int64)
+        self.masks = np.empty(0, dtype=np.uint64)
+        self.persistent_keys = np.empty(0, dtype=np.int64)
+
+    def add_day(self, src, tar, date_str='', link_filter=None):
+        """ Shift the window by one day with the links of the entering day.
+        :param link_filter: optional function of (src, tar) arrays returning a boolean array of links to keep
+        :return: keys of links that become persistent, keys of links that are no longer persistent
+        """
+        day_keys = np.unique(np.asarray(src, dtype=np.int64) * self.num_videos + np.asarray(tar, dtype=np.int64))
+        latest_bit = np.uint64(1) << np.uint64(self.window - 1)
+        self.masks >>= np.uint64(1)
+
+        idx = np.minimum(np.searchsorted(self.edge_keys, day_keys), max(len(self.edge_keys) - 1, 0))
+        is_seen = (self.edge_keys[idx] == day_keys) if len(self.edge_keys) > 0 else np.zeros(len(day_keys), dtype=bool)
+        self.masks[idx[is_seen]] |= latest_bit
+        insert_idx = np.searchsorted(self.edge_keys, day_keys[~is_seen])
+        self.edge_keys = np.insert(self.edge_keys, insert_idx, day_keys[~is_seen])
+        self.masks = np.insert(self.masks, insert_idx, latest_bit)
+
+        # drop links that left the window
+        is_alive = self.masks > 0
+        self.edge_keys, self.masks = self.edge_keys[is_alive], self.masks[is_alive]
+        self.num_days = min(self.num_days + 1, self.window)
+        self.last_date = date_str
+
+        if self.num_days < self.window:
+            persistent_keys = np.empty(0, dtype=np.int64)
+        else:
+            # only links present on enough days can be persistent
+            is_candidate = popcount(self.masks) >= min_persistent_days(self.window)
+            candidate_keys, candidate_masks = self.edge_keys[is_candidate], self.masks[is_candidate]
+            is_persistent = batch_is_persistent_link(masks_to_matrix(candidate_masks, self.window))
+            if link_filter is not None:
+                is_persistent &= link_filter(*np.divmod(candidate_keys, self.num_videos))
+            persistent_keys = candidate_keys[is_persistent]
+
+        added_keys = np.setdiff1d(persistent_keys, self.persistent_keys, assume_unique=True)
+        removed_keys = np.setdiff1d(self.persistent_keys, persistent_keys, assume_unique=True)
+        self.persistent_keys = persistent_keys
+        return added_keys, removed_keys
+
+    def save(self, filepath):
+        # rewritten every day, so it is not compressed
+        np.savez(filepath, num_videos=self.num_videos, window=self.window, num_days=self.num_days,
+                 last_date=self.last_date, edge_keys=self.edge_keys, masks=self.masks,
+                 persistent_keys=self.persistent_keys)
+
+
+def load_sliding_persistent_network(filepath):
+    with np.load(filepath) as state:
+        network = SlidingPersistentNetwork(int(state['num_videos']), window=int(state['window']))
+        network.num_days = int(state['num_days'])
+        network.last_date = str(state['last_date'])
+        network.edge_keys = state['edge_keys']
+        network.masks = state['masks']
+        network.persistent_keys = state['persistent_keys']
+    return network
@@ -0,0 +1,109 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# beyond this many label pairs, edge partition matrix is returned as a sparse matrix
+MAX_DENSE_PAIRS = 10 ** 7
+
+
+def network_dict_to_arrays(network_dict, num_videos):
+    """ Convert a network snapshot {embed_tar: [(embed_src, pos_src, view_src), ...]} into columnar arrays.
+    Edges are grouped by target embed in ascending order.
+    :return: src, tar, pos, view arrays of the same length
+    """
+    num_edges = sum(len(network_dict[embed_tar]) for embed_tar in range(num_videos))
+    src = np.empty(num_edges, dtype=np.int32)
+    tar = np.empty(num_edges, dtype=np.int32)
+    pos = np.empty(num_edges, dtype=np.int8)
+    view = np.empty(num_edges, dtype=np.int64)
+    idx = 0
+    for embed_tar in range(num_videos):
+        inlinks = network_dict[embed_tar]
+        num_inlinks = len(inlinks)
+        if num_inlinks > 0:
+            src[idx: idx + num_inlinks], pos[idx: idx + num_inlinks], view[idx: idx + num_inlinks] = zip(*inlinks)
+            tar[idx: idx + num_inlinks] = embed_tar
+            idx += num_inlinks
+    return src, tar, pos, view
+
+
+def save_csr_snapshot(filepath, src, tar, pos, view, num_videos):
+    """ Save a network snapshot in CSR layout, edges grouped by target embed with their offsets in indptr,
+    so the target column is not stored.
+    """
+    order = np.argsort(tar, kind='stable')
+    indptr = np.zeros(num_videos + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tar, minlength=num_videos), out=indptr[1:])
+    np.savez_compressed(filepath, indptr=indptr, src=np.asarray(src, dtype=np.int32)[order],
+                        pos=np.asarray(pos, dtype=np.int8)[order], view=np.asarray(view, dtype=np.int64)[order])
+
+
+def load_csr_snapshot(filepath, as_dict=False):
+    """ Load a snapshot saved by save_csr_snapshot.
+    :return: src, tar, pos, view arrays of the same length, as network_dict_to_arrays,
+    or {embed_tar: [(embed_src, pos_src, view_src), ...]} if as_dict
+    """
+    with np.load(filepath) as snapshot:
+        indptr = snapshot['indptr']
+        tar = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+        src, pos, view = snapshot['src'], snapshot['pos'], snapshot['view']
+    if as_dict:
+        return network_arrays_to_dict(src, tar, pos, view, len(indptr) - 1)
+    return src, tar, pos, view
+
+
+def network_arrays_to_dict(src, tar, pos, view, num_videos):
+    """ Inverse of network_dict_to_arrays."""
+    network_dict = {embed: [] for embed in range(num_videos)}
+    for embed_src, embed_tar, pos_src, view_src in zip(src.tolist(), tar.tolist(), pos.tolist(), view.tolist()):
+        network_dict[embed_tar].append((embed_src, pos_src, view_src))
+    return network_dict
+
+
+def encode_labels(values):
+    """ Encode arbitrary per-node values, e.g., genre, upload year or channel id, into integer labels.
+    :return: per-node labels in [0, num_labels), label names of length num_labels
+    """
+    label_names, labels = np.unique(values, return_inverse=True)
+    return labels, label_names
+
+
+def edge_partition_matrix(src, tar, node_labels, num_labels=None, weights=None):
+    """ Number of edges from nodes of label i to nodes of label j, by one bincount over the combined label codes.
+    :param node_labels: per-node integer labels in [0, num_labels)
+    :param weights: optional per-edge weights, summed instead of counted
+    :return: array of shape (num_labels, num_labels), or a csr matrix if there are more than MAX_DENSE_PAIRS pairs
+    """
+    node_labels = np.asarray(node_labels)
+    if num_labels is None:
+        num_labels = int(np.max(node_labels)) + 1
+    src_labels = node_labels[src].astype(np.int64)
+    tar_labels = node_labels[tar].astype(np.int64)
+    if num_labels ** 2 > MAX_DENSE_PAIRS:
+        if weights is None:
+            weights = np.ones(len(src_labels), dtype=np.int64)
+        # duplicate entries are summed
+        return csr_matrix((weights, (src_labels, tar_labels)), shape=(num_labels, num_labels))
+    return np.bincount(src_labels * num_labels + tar_labels, weights=weights, minlength=num_labels ** 2)\
+        .reshape(num_labels, num_labels)
+
+
+def merge_edge_counts(edge_keys, edge_counts, new_keys):
+    """ Count one more appearance for each of new_keys by a sorted merge, unseen keys are inserted with count 1.
+    Memory is bounded by the number of distinct links, not by the number of merged days.
+    :param edge_keys: sorted unique int64 keys of links seen so far, edge_counts their numbers of appearances
+    :param new_keys: sorted unique int64 keys, e.g., one day of links from pack_edge_keys
+    :return: merged edge_keys, edge_counts
+    """
+    idx = np.searchsorted(edge_keys, new_keys)
+    is_seen = idx < len(edge_keys)
+    is_seen[is_seen] = edge_keys[idx[is_seen]] == new_keys[is_seen]
+    edge_counts[idx[is_seen]] += 1
+    edge_keys = np.insert(edge_keys, idx[~is_seen], new_keys[~is_seen])
+    edge_counts = np.insert(edge_counts, idx[~is_seen], 1)
+    return edge_keys, edge_counts
+
+
+def link_frequency_histogram(edge_counts, T):
+    """ Number of links that appear on exactly k days, for k in [0, T].
+    """
+    return np.bincount(edge_counts, minlength=T + 1)
@@ -0,0 +1,86 @@
+import numpy as np
+
+# percentile grid step, all percentiles drawn in fig10 and their +-4 neighbours lie on it
+PERCENTILE_STEP = 0.5
+# smoothing mixes the percentiles p - 4, p, p + 4 of the target x and its neighbouring x - 1, x + 1
+PERCENTILE_OFFSET = 4
+# weights of the target x: (percentile p, percentiles p +- 4), indexed by the number of neighbouring x present
+CENTER_WEIGHTS = np.array([[0.5, 0.25], [0.5, 0.15], [0.4, 0.1]])
+# weights of each neighbouring x that is present: (percentile p, percentiles p +- 4)
+NEIGHBOR_WEIGHTS = np.array([0.1, 0.05])
+
+
+def sorted_buckets(keys, values):
+    """ Group values by integer keys, sorting each bucket once.
+    :return: unique keys, bucket offsets of length num_keys + 1, values sorted by key and then by value
+    """
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    start_idx = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[start_idx], np.append(start_idx, len(keys)), values
+
+
+def bucket_percentiles(offsets, sorted_values, percentiles):
+    """ Percentiles of all sorted buckets in one vectorized call, linear interpolation as in np.percentile.
+    :return: table of shape (num_buckets, num_percentiles)
+    """
+    sizes = np.diff(offsets)
+    rank = np.outer(sizes - 1, np.asarray(percentiles, dtype=np.float64) / 100)
+    lower = np.floor(rank).astype(np.int64)
+    upper = np.minimum(lower + 1, sizes[:, None] - 1)
+    fraction = rank - lower
+    lower_values = sorted_values[offsets[:-1, None] + lower]
+    upper_values = sorted_values[offsets[:-1, None] + upper]
+    return lower_values + (upper_values - lower_values) * fraction
+
+
+class PercentileBands:
+    """ Percentile bands of values bucketed by integer x, e.g., indegree change ratio by current indegree.
+    Percentiles on a grid of PERCENTILE_STEP are computed once for every bucket, the neighbour smoothing is then
+    a 3 x 3 kernel over (x - 1, x, x + 1) and (p - 4, p, p + 4) applied to the whole table.
+    """
+
+    def __init__(self, x_values, offsets, sorted_values, step=PERCENTILE_STEP):
+        self.x_values = np.asarray(x_values)
+        self.sizes = np.diff(offsets)
+        self.step = step
+        self.x_min = self.x_values[0]
+
+        num_rows = self.x_values[-1] - self.x_min + 1
+        self.present = np.zeros(num_rows, dtype=bool)
+        self.present[self.x_values - self.x_min] = True
+        percentile_grid = np.linspace(0, 100, int(round(100 / step)) + 1)
+        self.percentile_table = np.full((num_rows, len(percentile_grid)), np.nan)
+        self.percentile_table[self.x_values - self.x_min] = bucket_percentiles(offsets, sorted_values, percentile_grid)
+        self.smoothed_table = self._smooth()
+
+    def _smooth(self):
+        table = self.percentile_table
+        shift = int(round(PERCENTILE_OFFSET / self.step))
+        # sum of percentiles p - 4 and p + 4, undefined within 4 of both ends
+        side_table = np.full_like(table, np.nan)
+        side_table[:, shift: -shift] = table[:, :-2 * shift] + table[:, 2 * shift:]
+
+        has_prev = np.r_[False, self.present[:-1]]
+        has_next = np.r_[self.present[1:], False]
+        center_weights = CENTER_WEIGHTS[has_prev.astype(np.int64) + has_next]
+        smoothed_table = center_weights[:, :1] * table + center_weights[:, 1:] * side_table
+
+        neighbor_table = NEIGHBOR_WEIGHTS[0] * table + NEIGHBOR_WEIGHTS[1] * side_table
+        smoothed_table[1:] += np.where(has_prev[1:, None], neighbor_table[:-1], 0)
+        smoothed_table[:-1] += np.where(has_next[:-1, None], neighbor_table[1:], 0)
+        return smoothed_table
+
+    def _lookup(self, table, x, percentile):
+        column = percentile / self.step
+        if not np.allclose(column, np.round(column)):
+            raise ValueError('percentile {0} is not on the grid of step {1}'.format(percentile, self.step))
+        return table[np.asarray(x) - self.x_min, int(round(column))]
+
+    def percentile(self, x, percentile):
+        """ Raw percentile of the bucket(s) x, x can be a scalar or an array."""
+        return self._lookup(self.percentile_table, x, percentile)
+
+    def smoothed(self, x, percentile):
+        """ Percentile of the bucket(s) x smoothed with its +-4 percentiles and the neighbouring buckets."""
+        return self._lookup(self.smoothed_table, x, percentile)
@@ -0,0 +1,152 @@
+import os, json
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# bucket edges of list positions: position 1, 2-5, 6-10, 11-15, 16-30, 31-50
+POSITION_BINS = [0, 1, 5, 10, 15, 30, 50]
+
+
+def first_position_map(lst):
+    """ Map each item to the position of its first appearance in lst, as lst.index(item)."""
+    position_map = {}
+    for position, item in enumerate(lst):
+        position_map.setdefault(item, position)
+    return position_map
+
+
+def bucketize_positions(mat, num_positions):
+    """ Sum the columns of mat over POSITION_BINS, truncated at num_positions.
+    :return: array of shape (num_rows, number of buckets below num_positions)
+    """
+    edges = [x for x in POSITION_BINS if x < num_positions] + [num_positions]
+    return np.add.reduceat(mat[:, :num_positions], edges[:-1], axis=1)
+
+
+def recsys_to_arrays(filepath, vid_embed_dict, max_position=50, list_key='relevant_list'):
+    """ Links of one recsys file among the given videos, in the columnar layout of network_dict_to_arrays.
+    :return: src, tar, pos arrays
+    """
+    src_list, tar_list, pos_list = [], [], []
+    with open(filepath, 'r') as fin:
+        for line in fin:
+            network_json = json.loads(line.rstrip())
+            src_embed = vid_embed_dict[network_json['vid']]
+            for position, target in enumerate(network_json[list_key][: max_position]):
+                if target in vid_embed_dict:
+                    src_list.append(src_embed)
+                    tar_list.append(vid_embed_dict[target])
+                    pos_list.append(position)
+    return np.array(src_list, dtype=np.int32), np.array(tar_list, dtype=np.int32), np.array(pos_list, dtype=np.int8)
+
+
+class Rel2RecCounter:
+    """ Joint position counts between the relevant list and the recommended list of every crawled video.
+    Counts are kept up to max_rel and max_rec positions, so that statistics for any NUM_REL <= max_rel
+    and NUM_REC <= max_rec can be derived afterwards from one pass over the data.
+    Counters of disjoint chunks are summed by +=.
+    """
+
+    def __init__(self, max_rel=50, max_rec=50):
+        self.max_rel = max_rel
+        self.max_rec = max_rec
+        # number of lists by truncated length
+        self.rel_length_counts = np.zeros(max_rel + 1, dtype=np.int64)
+        self.rec_length_counts = np.zeros(max_rec + 1, dtype=np.int64)
+        # [i, j]: video at relevant position i first shows at recommended position j
+        self.rel2rec_mat = np.zeros((max_rel, max_rec), dtype=np.int64)
+        # [j, i]: video at recommended position j first shows at relevant position i
+        self.rec2rel_mat = np.zeros((max_rec, max_rel), dtype=np.int64)
+        # pending list lengths and joint position codes, bincounted in batch by flush()
+        self._rel_lengths, self._rec_lengths, self._rel2rec_codes, self._rec2rel_codes = [], [], [], []
+
+    def update(self, relevant_list, recommended_list):
+        """ Count one pair of lists, truncated at max_rel and max_rec. Counts are flushed into the arrays by flush().
+        """
+        relevant_list = relevant_list[: self.max_rel]
+        recommended_list = recommended_list[: self.max_rec]
+        self._rel_lengths.append(len(relevant_list))
+        self._rec_lengths.append(len(recommended_list))
+
+        rel_position_map = first_position_map(relevant_list)
+        rec_position_map = first_position_map(recommended_list)
+        for rel_rank, vid in enumerate(relevant_list):
+            if vid in rec_position_map:
+                self._rel2rec_codes.append(rel_rank * self.max_rec + rec_position_map[vid])
+        for rec_rank, vid in enumerate(recommended_list):
+            if vid in rel_position_map:
+                self._rec2rel_codes.append(rec_rank * self.max_rel + rel_position_map[vid])
+
+    def update_file(self, filepath):
+        with open(filepath, 'r') as fin:
+            for line in fin:
+                network_json = json.loads(line.rstrip())
+                self.update(network_json['relevant_list'], network_json['recommended_list'])
+        self.flush()
+
+    def flush(self):
+        self.rel_length_counts += np.bincount(self._rel_lengths, minlength=self.max_rel + 1)
+        self.rec_length_counts += np.bincount(self._rec_lengths, minlength=self.max_rec + 1)
+        self.rel2rec_mat += np.bincount(self._rel2rec_codes, minlength=self.max_rel * self.max_rec)\
+            .reshape(self.max_rel, self.max_rec)
+        self.rec2rel_mat += np.bincount(self._rec2rel_codes, minlength=self.max_rec * self.max_rel)\
+            .reshape(self.max_rec, self.max_rel)
+        self._rel_lengths, self._rec_lengths, self._rel2rec_codes, self._rec2rel_codes = [], [], [], []
+
+    def __iadd__(self, other):
+        self.flush()
+        other.flush()
+        self.rel_length_counts += other.rel_length_counts
+        self.rec_length_counts += other.rec_length_counts
+        self.rel2rec_mat += other.rel2rec_mat
+        self.rec2rel_mat += other.rec2rel_mat
+        return self
+
+    def rel2rec_stats(self, num_rel, num_rec):
+        """ Statistics of the relevant list truncated at num_rel and the recommended list truncated at num_rec.
+        :return: dict of arrays, num_relevant_by_rank, num_recommended_by_rank, relevant_in_recommended,
+                 recommended_from_relevant, and the dense matrices aggregated by POSITION_BINS
+        """
+        if num_rel > self.max_rel or num_rec > self.max_rec:
+            raise ValueError('num_rel and num_rec can not exceed {0} and {1}'.format(self.max_rel, self.max_rec))
+        self.flush()
+        rel2rec_mat = self.rel2rec_mat[:num_rel, :num_rec]
+        rec2rel_mat = self.rec2rel_mat[:num_rec, :num_rel]
+        # a list of length l has positions 0 to l-1, longer lists are truncated at num_rel or num_rec
+        return {'num_relevant_by_rank': np.cumsum(self.rel_length_counts[::-1])[::-1][1: num_rel + 1],
+                'num_recommended_by_rank': np.cumsum(self.rec_length_counts[::-1])[::-1][1: num_rec + 1],
+                'relevant_in_recommended': rel2rec_mat.sum(axis=1),
+                'recommended_from_relevant': rec2rel_mat.sum(axis=1),
+                'dense_relevant_in_recommended': bucketize_positions(rel2rec_mat, num_rec),
+                'dense_recommended_from_relevant': bucketize_positions(rec2rel_mat, num_rel)}
+
+
+def count_rel2rec_file(filepath, max_rel=50, max_rec=50):
+    counter = Rel2RecCounter(max_rel=max_rel, max_rec=max_rec)
+    counter.update_file(filepath)
+    return counter
+
+
+def count_rel2rec(data_prefix, max_rel=50, max_rec=50, num_workers=None):
+    """ Map each recsys file to a Rel2RecCounter in parallel and sum them up.
+    """
+    filepaths = sorted(os.path.join(subdir, f) for subdir, _, files in os.walk(data_prefix) for f in files)
+    counter = Rel2RecCounter(max_rel=max_rel, max_rec=max_rec)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for file_counter in executor.map(count_rel2rec_file, filepaths,
+                                         [max_rel] * len(filepaths), [max_rec] * len(filepaths)):
+            counter += file_counter
+    return counter
+
+
+def save_rel2rec_counter(counter, filepath):
+    counter.flush()
+    np.savez_compressed(filepath, rel_length_counts=counter.rel_length_counts, rec_length_counts=counter.rec_length_counts,
+                        rel2rec_mat=counter.rel2rec_mat, rec2rel_mat=counter.rec2rel_mat)
+
+
+def load_rel2rec_counter(filepath):
+    with np.load(filepath) as counts:
+        counter = Rel2RecCounter(max_rel=counts['rel2rec_mat'].shape[0], max_rec=counts['rel2rec_mat'].shape[1])
+        for key in ['rel_length_counts', 'rec_length_counts', 'rel2rec_mat', 'rec2rel_mat']:
+            setattr(counter, key, counts[key])
+    return counter
@@ -0,0 +1,214 @@
+import os, pickle
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+
+from utils.bowtie import pack_edge_keys
+from utils.delta_store import DeltaSnapshotStore, DELTA_META_FILENAME
+from utils.helper import obj2str
+from utils.lifetime import EdgeLifetimeBuilder, load_edge_lifetime_index
+from utils.network import network_dict_to_arrays, edge_partition_matrix, merge_edge_counts, link_frequency_histogram, \
+    load_csr_snapshot
+
+INDEGREE_CUBE_FILENAME = 'indegree_cube.npy'
+# snapshots built from the relevant lists as pickled dicts, and from the recommended lists in CSR layout
+RELEVANT_DIRPATH = 'network_pickle'
+RECOMMENDED_DIRPATH = 'recommended_csr'
+# relevant list snapshots in delta encoding, written by extract_network_delta.py
+DELTA_DIRPATH = 'network_delta'
+
+
+def get_snapshot_path(data_prefix, snapshot_date, snapshot_dirpath=RELEVANT_DIRPATH):
+    extension = 'npz' if snapshot_dirpath == RECOMMENDED_DIRPATH else 'p'
+    return os.path.join(data_prefix, snapshot_dirpath, 'network_{0}.{1}'.format(obj2str(snapshot_date), extension))
+
+
+def load_snapshot(data_prefix, snapshot_date, num_videos=None, snapshot_dirpath=RELEVANT_DIRPATH):
+    """ Load the network snapshot of one day, as columnar src, tar, pos, view arrays if num_videos is given.
+    Snapshots of the recommended lists are loaded with snapshot_dirpath=RECOMMENDED_DIRPATH.
+    """
+    if snapshot_dirpath == RECOMMENDED_DIRPATH:
+        return load_csr_snapshot(get_snapshot_path(data_prefix, snapshot_date, snapshot_dirpath),
+                                 as_dict=num_videos is None)
+    with open(get_snapshot_path(data_prefix, snapshot_date, snapshot_dirpath), 'rb') as fin:
+        network_dict = pickle.load(fin)
+    # embed_tar: [(embed_src, pos_src, view_src), ...]
+    if num_videos is None:
+        return network_dict
+    return network_dict_to_arrays(network_dict, num_videos)
+
+
+def iter_snapshots(data_prefix, T=63, start_date=datetime(2018, 9, 1), num_videos=None, num_prefetch=2, use_process=None,
+                   snapshot_dirpath=RELEVANT_DIRPATH):
+    """ Yield (t, snapshot) in the order of days, while the next num_prefetch snapshots are loaded in the background.
+    At most num_prefetch snapshots are held besides the one being processed.
+    Snapshots are loaded in a background process if they are converted to arrays, which are cheap to send back,
+    otherwise in a background thread that overlaps the disk reads.
+    Snapshots in delta encoding, e.g., snapshot_dirpath=DELTA_DIRPATH, are streamed as arrays by applying daily deltas.
+    """
+    snapshot_dirpath_full = os.path.join(data_prefix, snapshot_dirpath)
+    if os.path.exists(os.path.join(snapshot_dirpath_full, DELTA_META_FILENAME)):
+        store = DeltaSnapshotStore(snapshot_dirpath_full)
+        offset = (start_date - store.start_date).days
+        for t, snapshot in store.iterate(start=offset, T=offset + T):
+            yield t - offset, snapshot
+        return
+    if use_process is None:
+        use_process = num_videos is not None
+    executor_class = ProcessPoolExecutor if use_process else ThreadPoolExecutor
+    with executor_class(max_workers=1) as executor:
+        futures = deque()
+        for t in range(T):
+            # keep num_prefetch days in flight ahead of day t
+            while len(futures) <= num_prefetch and t + len(futures) < T:
+                futures.append(executor.submit(load_snapshot, data_prefix, start_date + timedelta(days=t + len(futures)),
+                                               num_videos, snapshot_dirpath))
+            yield t, futures.popleft().result()
+
+
+class SnapshotScanner:
+    """ Read each daily network snapshot once and feed its edges to all registered metric accumulators.
+    An accumulator implements update(t, src, tar, pos) and result(), which returns a dict of arrays.
+    """
+
+    def __init__(self, data_prefix, num_videos, T=63, start_date=datetime(2018, 9, 1), snapshot_dirpath=RELEVANT_DIRPATH):
+        self.data_prefix = data_prefix
+        self.snapshot_dirpath = snapshot_dirpath
+        self.num_videos = num_videos
+        self.T = T
+        self.start_date = start_date
+        self.accumulators = []
+
+    def register(self, accumulator):
+        self.accumulators.append(accumulator)
+        return accumulator
+
+    def scan(self):
+        for t, (src, tar, pos, _) in iter_snapshots(self.data_prefix, T=self.T, start_date=self.start_date,
+                                                    num_videos=self.num_videos, snapshot_dirpath=self.snapshot_dirpath):
+            for accumulator in self.accumulators:
+                accumulator.update(t, src, tar, pos)
+            print('>>> Finish scanning day {0}...'.format(t + 1))
+        print('>>> Network structure has been loaded!')
+
+        result_dict = {}
+        for accumulator in self.accumulators:
+            result_dict.update(accumulator.result())
+        return result_dict
+
+
+class IndegreeCubeAccumulator:
+    """ Cumulative indegree cube of shape (num_videos, T, num_pos) in uint16, memory-mapped at filepath.
+    Entry [v, t, k] is the indegree of video v on day t counting the positions below k+1.
+    """
+
+    def __init__(self, filepath, num_videos, T, num_pos=50):
+        self.num_videos = num_videos
+        self.num_pos = num_pos
+        self.indegree_cube = np.lib.format.open_memmap(filepath, mode='w+', dtype=np.uint16, shape=(num_videos, T, num_pos))
+
+    def update(self, t, src, tar, pos):
+        mask = pos < self.num_pos
+        counts = np.bincount(tar[mask].astype(np.int64) * self.num_pos + pos[mask], minlength=self.num_videos * self.num_pos)
+        self.indegree_cube[:, t, :] = np.cumsum(counts.reshape(self.num_videos, self.num_pos), axis=1)
+
+    def result(self):
+        self.indegree_cube.flush()
+        return {}
+
+
+class PartitionEdgeAccumulator:
+    """ Daily number of edges from partition i to partition j, of shape (T, num_partitions, num_partitions).
+    Partitions can be any per-node integer labels, e.g., views quartiles, or genres encoded by encode_labels.
+    """
+
+    def __init__(self, partition_labels, num_partitions, T, num_rel=15):
+        self.partition_labels = np.asarray(partition_labels)
+        self.num_partitions = num_partitions
+        self.num_rel = num_rel
+        self.partition_edge_mats = np.zeros((T, num_partitions, num_partitions), dtype=np.int64)
+
+    def update(self, t, src, tar, pos):
+        mask = pos < self.num_rel
+        self.partition_edge_mats[t] = edge_partition_matrix(src[mask], tar[mask], self.partition_labels,
+                                                            num_labels=self.num_partitions)
+
+    def result(self):
+        return {'partition_edge_mats': self.partition_edge_mats}
+
+
+class EdgeFrequencyAccumulator:
+    """ Number of days each video-to-video link appears, links are packed as src * num_videos + tar.
+    Daily links are sort-merged into the running counts, so memory grows with distinct links rather than days.
+    """
+
+    def __init__(self, num_videos, T, num_rel=15):
+        self.num_videos = num_videos
+        self.T = T
+        self.num_rel = num_rel
+        self.edge_keys = np.empty(0, dtype=np.int64)
+        self.edge_counts = np.empty(0, dtype=np.int64)
+
+    def update(self, t, src, tar, pos):
+        mask = pos < self.num_rel
+        self.edge_keys, self.edge_counts = merge_edge_counts(self.edge_keys, self.edge_counts,
+                                                             pack_edge_keys(src[mask], tar[mask], self.num_videos))
+
+    def result(self):
+        return {'edge_keys': self.edge_keys, 'edge_counts': self.edge_counts,
+                'link_frequency': link_frequency_histogram(self.edge_counts, self.T)}
+
+
+class EdgeLifetimeAccumulator:
+    """ Run-length presence of every video-to-video link, saved as an EdgeLifetimeIndex at filepath.
+    """
+
+    def __init__(self, filepath, num_videos, T, num_rel=15):
+        self.filepath = filepath
+        self.num_rel = num_rel
+        self.builder = EdgeLifetimeBuilder(num_videos, T)
+
+    def update(self, t, src, tar, pos):
+        mask = pos < self.num_rel
+        self.builder.update(t, src[mask], tar[mask], pos[mask])
+
+    def result(self):
+        self.builder.result().save(self.filepath)
+        return {}
+
+
+def load_snapshot_measures(filepath):
+    with np.load(filepath) as snapshot_measures:
+        return {key: snapshot_measures[key] for key in snapshot_measures.files}
+
+
+def get_indegree_cube_path(data_prefix):
+    return os.path.join(data_prefix, 'network_pickle', INDEGREE_CUBE_FILENAME)
+
+
+def load_indegree_cube(data_prefix, num_videos, T=63):
+    """ Load the memory-mapped cumulative indegree cube stored next to the snapshots, build it by one scan if missing.
+    The indegree at cutoff NUM_REL is indegree_cube[:, :, NUM_REL - 1].
+    """
+    filepath = get_indegree_cube_path(data_prefix)
+    if not os.path.exists(filepath):
+        scanner = SnapshotScanner(data_prefix, num_videos, T=T)
+        scanner.register(IndegreeCubeAccumulator(filepath, num_videos, T))
+        scanner.scan()
+    return np.load(filepath, mmap_mode='r')
+
+
+def get_edge_lifetime_path(data_prefix, num_rel=15):
+    return os.path.join(data_prefix, 'network_pickle', 'edge_lifetime_{0}.npz'.format(num_rel))
+
+
+def load_edge_lifetime(data_prefix, num_videos, T=63, num_rel=15):
+    """ Load the run-length presence index of links within the top num_rel positions, build it by one scan if missing.
+    """
+    filepath = get_edge_lifetime_path(data_prefix, num_rel)
+    if not os.path.exists(filepath):
+        scanner = SnapshotScanner(data_prefix, num_videos, T=T)
+        scanner.register(EdgeLifetimeAccumulator(filepath, num_videos, T, num_rel=num_rel))
+        scanner.scan()
+    return load_edge_lifetime_index(filepath)
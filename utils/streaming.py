@@ -0,0 +1,121 @@
+""" Streaming stages over an unbounded sequence of days.
+A source yields one record per day, a dict with date, src, tar, pos arrays of the relevant-list snapshot and the
+per-video views of that day, NaN if unknown. Each stage consumes the records of an upstream generator, keeps bounded
+rolling state, and yields the same records with its per-day outputs added. Stages are chained by plain composition,
+e.g., forecast_stage(persistence_stage(bowtie_stage(indegree_stage(stream_snapshots(...)))), ...).
+"""
+
+import os, time
+from collections import deque
+from datetime import datetime, timedelta
+import numpy as np
+
+from utils.bowtie import DynamicBowtie, summarize_bowtie
+from utils.helper import obj2str
+from utils.lifetime import SlidingPersistentNetwork
+from utils.metrics import symmetric_mean_absolute_percentage_error as smape
+from utils.recsys import recsys_to_arrays
+from utils.scanner import load_snapshot, get_snapshot_path
+
+
+def _wait_for(filepath, poll_interval):
+    # False if the file is missing and we do not wait for it
+    while not os.path.exists(filepath):
+        if poll_interval is None:
+            return False
+        time.sleep(poll_interval)
+    return True
+
+
+def stream_snapshots(data_prefix, num_videos, start_date=datetime(2018, 9, 1), views_fn=None, poll_interval=None):
+    """ Yield one record per day from the pickled snapshots, from start_date on without an end date.
+    When the next snapshot is missing, stop, or wait for it by polling every poll_interval seconds.
+    :param views_fn: optional function of date returning the per-video views of that day, as in stream_recsys
+    """
+    date = start_date
+    while _wait_for(get_snapshot_path(data_prefix, date), poll_interval):
+        src, tar, pos, _ = load_snapshot(data_prefix, date, num_videos)
+        views = np.full(num_videos, np.nan) if views_fn is None else np.asarray(views_fn(date), dtype=np.float64)
+        yield {'date': date, 'src': src, 'tar': tar, 'pos': pos, 'views': views}
+        date += timedelta(days=1)
+
+
+def stream_recsys(data_prefix, vid_embed_dict, start_date=datetime(2018, 9, 1), max_position=50, views_fn=None,
+                  poll_interval=None):
+    """ Yield one record per day straight from the raw recsys files, as extract_network_pickle.py would store it.
+    :param views_fn: optional function of date returning the per-video views of that day
+    """
+    num_videos = len(vid_embed_dict)
+    date = start_date
+    filepath = os.path.join(data_prefix, 'recsys', 'recsys_{0}.json'.format(obj2str(date)))
+    while _wait_for(filepath, poll_interval):
+        src, tar, pos = recsys_to_arrays(filepath, vid_embed_dict, max_position=max_position)
+        views = np.full(num_videos, np.nan) if views_fn is None else np.asarray(views_fn(date), dtype=np.float64)
+        yield {'date': date, 'src': src, 'tar': tar, 'pos': pos, 'views': views}
+        date += timedelta(days=1)
+        filepath = os.path.join(data_prefix, 'recsys', 'recsys_{0}.json'.format(obj2str(date)))
+
+
+def indegree_stage(records, num_videos, num_rel=15, window=7):
+    """ Add indegree of each video and its rolling mean over the last window days.
+    """
+    indegree_window = deque()
+    indegree_sum = np.zeros(num_videos, dtype=np.int64)
+    for record in records:
+        indegree = np.bincount(record['tar'][record['pos'] < num_rel], minlength=num_videos)
+        indegree_window.append(indegree)
+        indegree_sum += indegree
+        if len(indegree_window) > window:
+            indegree_sum -= indegree_window.popleft()
+        record['indegree'] = indegree
+        record['indegree_window_mean'] = indegree_sum / len(indegree_window)
+        yield record
+
+
+def bowtie_stage(records, num_videos, num_rel=15, max_churn=0.2):
+    """ Add the bow-tie summary of each day, the structure is updated by the edge changes from the previous day.
+    """
+    bowtie = None
+    for record in records:
+        mask = record['pos'] < num_rel
+        if bowtie is None:
+            bowtie = DynamicBowtie(record['src'][mask], record['tar'][mask], num_videos, max_churn=max_churn)
+        else:
+            bowtie.update(record['src'][mask], record['tar'][mask])
+        record['bowtie_summary'] = summarize_bowtie(bowtie.labels(), bowtie.scc_labels, np.nan_to_num(record['views']))
+        yield record
+
+
+def persistence_stage(records, num_videos, num_rel=15, window=63, link_filter=None):
+    """ Add the persistent links added and removed when the window slides to each day, as packed keys.
+    """
+    persistent_network = SlidingPersistentNetwork(num_videos, window=window)
+    for record in records:
+        mask = record['pos'] < num_rel
+        added_keys, removed_keys = persistent_network.add_day(record['src'][mask], record['tar'][mask],
+                                                              date_str=obj2str(record['date']), link_filter=link_filter)
+        record['persistent_added'] = added_keys
+        record['persistent_removed'] = removed_keys
+        record['num_persistent'] = len(persistent_network.persistent_keys)
+        yield record
+
+
+def forecast_stage(records, num_videos, num_output=7, history=56):
+    """ Add the seasonal naive forecast of the next num_output days for every video from a ring buffer of the last
+    history days of views, and the sMAPE of the forecast made num_output days ago against the views since then.
+    """
+    if history < num_output:
+        raise ValueError('history of {0} days can not cover a forecast of {1} days'.format(history, num_output))
+    view_buffer = np.full((num_videos, history), np.nan)
+    past_forecasts = deque()
+    for t, record in enumerate(records):
+        view_buffer[:, t % history] = record['views']
+        if len(past_forecasts) == num_output:
+            true = view_buffer[:, np.arange(t - num_output + 1, t + 1) % history]
+            pred = past_forecasts.popleft()
+            is_known = ~np.isnan(true).any(axis=1) & ~np.isnan(pred).any(axis=1)
+            record['forecast_smape'] = smape(true[is_known], pred[is_known])[0] if is_known.any() else np.nan
+        if t + 1 >= num_output:
+            record['forecast'] = view_buffer[:, np.arange(t - num_output + 1, t + 1) % history]
+            past_forecasts.append(record['forecast'])
+        yield record
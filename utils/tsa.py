@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 from math import sqrt
+from numpy.lib.stride_tricks import as_strided
 
 
 def extract_trend_component(insample_data):
@@ -103,6 +104,68 @@ def deseasonalize(ts_data, freq=7):
     return desea_ts_data, ts_seasonality_in
 
 
+def batch_acf(ts_mat, k):
+    """
+    Autocorrelation function of every row
+    :param ts_mat: time series of the same length, array of shape (num_series, length)
+    :param k: lag
+    :return: array of shape (num_series,)
+    """
+    dev = ts_mat - np.mean(ts_mat, axis=1, keepdims=True)
+    return np.sum(dev[:, k:] * dev[:, :ts_mat.shape[1] - k], axis=1) / np.sum(dev ** 2, axis=1)
+
+
+def batch_seasonality_test(ts_mat, ppy):
+    """ seasonality_test of every row."""
+    s = batch_acf(ts_mat, 1)
+    for i in range(2, ppy):
+        s = s + (batch_acf(ts_mat, i) ** 2)
+
+    limit = 1.645 * (np.sqrt((1 + 2 * s) / ts_mat.shape[1]))
+    return (np.abs(batch_acf(ts_mat, ppy))) > limit
+
+
+def batch_moving_averages(ts_mat, window):
+    """ moving_averages of every row."""
+    ts_init = pd.DataFrame(ts_mat.T)
+    if ts_mat.shape[1] % 2 == 0:
+        ts_ma = ts_init.rolling(window, center=True).mean()
+        ts_ma = ts_ma.rolling(window=2, center=True).mean()
+        ts_ma = np.roll(ts_ma.values, -1, axis=0)
+    else:
+        ts_ma = ts_init.rolling(window, center=True).mean().values
+    return ts_ma.T
+
+
+def batch_extract_seasonal_component(ts_mat, ppy):
+    """ extract_seasonal_component of every row, array of shape (num_series, ppy)."""
+    ts_mat = np.asarray(ts_mat, dtype=np.float64)
+    num_series, length = ts_mat.shape
+    le_mat = ts_mat * 100 / batch_moving_averages(ts_mat, ppy)
+    le_mat = np.hstack((le_mat, np.full((num_series, ppy - (length % ppy)), np.nan)))
+    si = np.nanmean(le_mat.reshape(num_series, -1, ppy), axis=1)
+    si = si / (np.sum(si, axis=1, keepdims=True) / (ppy * 100))
+    return np.where(batch_seasonality_test(ts_mat, ppy)[:, np.newaxis], si, 100)
+
+
+def batch_deseasonalize(ts_mat, freq=7):
+    """ deseasonalize every row, seasonal indices are repeated along the series by broadcasting."""
+    ts_mat = np.asarray(ts_mat, dtype=np.float64)
+    ts_seasonality_mat = batch_extract_seasonal_component(ts_mat, freq)
+    desea_ts_mat = ts_mat * 100 / ts_seasonality_mat[:, np.arange(ts_mat.shape[1]) % freq]
+    return desea_ts_mat, ts_seasonality_mat
+
+
+def sliding_windows(ts_mat, width):
+    """ Read-only view of all windows of width consecutive values in every row,
+    array of shape (num_series, length - width + 1, width), without copying.
+    """
+    num_series, length = ts_mat.shape
+    row_stride, col_stride = ts_mat.strides
+    return as_strided(ts_mat, shape=(num_series, length - width + 1, width),
+                      strides=(row_stride, col_stride, col_stride), writeable=False)
+
+
 def reseasonalize(desea_ts_data, ts_seasonality_in, shift, freq=7):
     # when reseasonalize, the seasonality should have different start idx.
     ts_data = np.zeros(len(desea_ts_data))
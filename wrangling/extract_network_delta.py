@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Re-encode the daily network snapshots as keyframes plus daily added, removed and moved edges.
+Scans read them with iter_snapshots(..., snapshot_dirpath=DELTA_DIRPATH), single days with DeltaSnapshotStore.load(t).
+
+Usage: python extract_network_delta.py
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/network_pickle/
+Output data files: ../data/network_delta/
+Time: ~5M
+"""
+
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from utils.data_loader import DataLoader
+from utils.delta_store import write_delta_store
+from utils.helper import Timer
+from utils.scanner import iter_snapshots, DELTA_DIRPATH
+
+
+def main():
+    # == == == == == == Part 1: Set up environment == == == == == == #
+    timer = Timer()
+    timer.start()
+
+    data_prefix = '../data/'
+
+    # == == == == == == Part 2: Load video views == == == == == == #
+    data_loader = DataLoader()
+    data_loader.load_video_views()
+    num_videos = data_loader.num_videos
+
+    # == == == == == == Part 3: Write keyframes and daily deltas == == == == == == #
+    write_delta_store(os.path.join(data_prefix, DELTA_DIRPATH), iter_snapshots(data_prefix, T=T, num_videos=num_videos),
+                      num_videos, T=T, keyframe_interval=KEYFRAME_INTERVAL, num_pos=MAX_POSITION)
+    print('>>> Delta encoded network has been dumped!')
+
+    timer.stop()
+
+
+if __name__ == '__main__':
+    MAX_POSITION = 50
+    KEYFRAME_INTERVAL = 7
+    T = 63
+
+    main()
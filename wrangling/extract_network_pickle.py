@@ -1,12 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-""" Extract relevant_list files to pickle files for faster access.
+""" Extract relevant_list files to pickle files, and recommended_list files to compact CSR arrays for faster access.
+Each recsys record is read once, and the overlap between relevant list and recommended list is counted in the same pass.
 
 Usage: python extract_network_pickle.py
 Input data files: ../data/recsys/
-Output data files: ../data/network_pickle/
-Time: ~1H x number of files ~= 63H
+Output data files: ../data/network_pickle/, ../data/recommended_csr/, ../data/rel2rec_counts.npz
+Time: ~1M x number of files ~= 1H
 """
 
 import sys, os, pickle, time, json
@@ -15,6 +16,9 @@ import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.helper import Timer, intify, obj2str
+from utils.recsys import Rel2RecCounter, save_rel2rec_counter
+from utils.network import save_csr_snapshot
+from utils.scanner import RELEVANT_DIRPATH, RECOMMENDED_DIRPATH, get_snapshot_path
 
 
 def main():
@@ -24,10 +28,11 @@ def main():
     data_prefix = '../data/'
     forecast_filepath = 'vevo_forecast_data_60k.tsv'
     recsys_dirpath = 'recsys'
-    snapshot_dirpath = 'network_pickle'
+    rel2rec_filepath = 'rel2rec_counts.npz'
 
-    if not os.path.exists(os.path.join(data_prefix, snapshot_dirpath)):
-        os.mkdir(os.path.join(data_prefix, snapshot_dirpath))
+    for snapshot_dirpath in [RELEVANT_DIRPATH, RECOMMENDED_DIRPATH]:
+        if not os.path.exists(os.path.join(data_prefix, snapshot_dirpath)):
+            os.mkdir(os.path.join(data_prefix, snapshot_dirpath))
 
     # == == == == == == Part 2: Load vevo en videos 61k dataset == == == == == == #
     vid_embed_dict = {}
@@ -38,34 +43,49 @@ def main():
             vid_embed_dict[vid] = int(embed)
             ts_view = np.array(intify(ts_view.split(',')))
             vid_view_dict[vid] = ts_view
-    vevo_en_vid_list = list(sorted(vid_embed_dict.keys()))
-    num_videos = len(vevo_en_vid_list)
+    num_videos = len(vid_embed_dict)
+
+    rel2rec_counter = Rel2RecCounter(max_rel=MAX_POSITION, max_rec=MAX_POSITION)
 
     for t in range(T):
         timer = Timer()
         timer.start()
 
-        target_date_str = obj2str(datetime(2018, 9, 1) + timedelta(days=t))
+        target_date = datetime(2018, 9, 1) + timedelta(days=t)
+        target_date_str = obj2str(target_date)
         recsys_filepath = 'recsys_{0}.json'.format(target_date_str)
-        snapshot_filepath = 'network_{0}.p'.format(target_date_str)
-        network_mat = {embed: [] for embed in range(num_videos)}
+        relevant_network_mat = {embed: [] for embed in range(num_videos)}
+        # columns of recommended links, src, tar, pos, view
+        recommended_columns = ([], [], [], [])
 
         with open(os.path.join(data_prefix, recsys_dirpath, recsys_filepath), 'r') as fin:
             for line in fin:
                 network_json = json.loads(line.rstrip())
                 source = network_json['vid']
-                targets = network_json['relevant_list'][: MAX_POSITION]
-                for position, target in enumerate(targets):
-                    if target in vevo_en_vid_list:
+                relevant_list = network_json['relevant_list']
+                recommended_list = network_json['recommended_list']
+                for position, target in enumerate(relevant_list[: MAX_POSITION]):
+                    if target in vid_embed_dict:
                         # add embedding of incoming video and position of target video on source video
-                        network_mat[vid_embed_dict[target]].append((vid_embed_dict[source], position, vid_view_dict[source][t]))
-
-        with open(os.path.join(data_prefix, snapshot_dirpath, snapshot_filepath), 'wb') as fout:
-            pickle.dump(network_mat, fout)
+                        relevant_network_mat[vid_embed_dict[target]].append((vid_embed_dict[source], position, vid_view_dict[source][t]))
+                for position, target in enumerate(recommended_list[: MAX_POSITION]):
+                    if target in vid_embed_dict:
+                        for column, value in zip(recommended_columns, (vid_embed_dict[source], vid_embed_dict[target],
+                                                                       position, vid_view_dict[source][t])):
+                            column.append(value)
+                rel2rec_counter.update(relevant_list, recommended_list)
+        rel2rec_counter.flush()
+
+        with open(get_snapshot_path(data_prefix, target_date, RELEVANT_DIRPATH), 'wb') as fout:
+            pickle.dump(relevant_network_mat, fout)
+        src, tar, pos, view = [np.array(column, dtype=np.int64) for column in recommended_columns]
+        save_csr_snapshot(get_snapshot_path(data_prefix, target_date, RECOMMENDED_DIRPATH), src, tar, pos, view,
+                          num_videos)
 
         print('>>> Finish dumping date {0}'.format(target_date_str))
         timer.stop()
 
+    save_rel2rec_counter(rel2rec_counter, os.path.join(data_prefix, rel2rec_filepath))
     print('>>> Network structure has been dumped!')
     print('>>> Total elapsed time: {0}\n'.format(str(timedelta(seconds=time.time() - total_start_time))[:-3]))
 
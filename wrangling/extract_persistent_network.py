@@ -5,19 +5,47 @@
 Two filters:
 1. at least 100 daily views for target video
 2. the mean daily views of source video is at least 1% of the target video
-
-Usage: python extract_persistent_network.py
-Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/network_pickle/
-Output data files: ../data/persistent_network.csv
-Time: ~7M
+In the incremental mode, the T-day window slides to the next day with one new snapshot, the per-link presence state
+is kept in ../data/persistent_state.npz, and the persistent links added and removed are written to a diff file.
+The first incremental run builds the state from the T days ending at the given date, or from 2018-09-01.
+
+Usage: python extract_persistent_network.py [full|incremental] [YYYY-MM-DD]
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/network_pickle/edge_lifetime_15.npz,
+                  or ../data/network_pickle/ if it does not exist
+Output data files: ../data/persistent_network.csv, ../data/persistent_state.npz and
+                   ../data/persistent_network_diff_YYYY-MM-DD.csv in the incremental mode
+Time: ~7M, ~1M per day in the incremental mode
 """
 
-import sys, os, pickle
+import sys, os
 from datetime import datetime, timedelta
+import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
 from utils.data_loader import DataLoader
-from utils.helper import Timer, obj2str, is_persistent_link, is_same_genre
+from utils.helper import Timer, is_same_genre, obj2str, str2obj
+from utils.lifetime import SlidingPersistentNetwork, load_sliding_persistent_network
+from utils.scanner import load_edge_lifetime, load_snapshot, iter_snapshots
+
+
+def passes_view_filter(avg_view_arr, src_arr, tar_arr):
+    # filter: at least 100 daily views for target video,
+    # and the mean daily views of source video is at least 1% of the target video
+    return (avg_view_arr[tar_arr] >= 100) & (avg_view_arr[src_arr] >= 0.01 * avg_view_arr[tar_arr])
+
+
+def write_links(filepath, src_arr, tar_arr, change=None):
+    # in the order of target videos
+    order = np.lexsort((src_arr, tar_arr))
+    with open(filepath, 'w') as fout:
+        if change is None:
+            fout.write('Source,Target\n')
+            for src_embed, tar_embed in zip(src_arr[order].tolist(), tar_arr[order].tolist()):
+                fout.write('{0},{1}\n'.format(src_embed, tar_embed))
+        else:
+            fout.write('Source,Target,Change\n')
+            for src_embed, tar_embed, link_change in zip(src_arr[order].tolist(), tar_arr[order].tolist(), change[order].tolist()):
+                fout.write('{0},{1},{2}\n'.format(src_embed, tar_embed, link_change))
 
 
 def main():
@@ -36,53 +64,28 @@ def main():
     embed_cid_dict = data_loader.embed_cid_dict
     embed_genre_dict = data_loader.embed_genre_dict
 
-    # == == == == == == Part 3: Load dynamic network snapshot == == == == == == #
-    network_dict_list = []
-    for t in range(T):
-        target_date_str = obj2str(datetime(2018, 9, 1) + timedelta(days=t))
-        filename = 'network_{0}.p'.format(target_date_str)
-        network_dict = pickle.load(open(os.path.join(data_prefix, 'network_pickle', filename), 'rb'))
-        for embed in network_dict:
-            network_dict[embed] = [x[0] for x in network_dict[embed] if x[1] < NUM_REL]
-        network_dict_list.append(network_dict)
-
-    persistent_src_embed_set = set()
-    persistent_tar_embed_set = set()
-    existing_edges = set()
-    num_reciprocal_edges = 0
+    # == == == == == == Part 3: Load link lifetime over dynamic network snapshots == == == == == == #
+    lifetime_index = load_edge_lifetime(data_prefix, num_videos, T=T, num_rel=NUM_REL)
+    src_arr, tar_arr = lifetime_index.src_tar()
+    avg_view_arr = np.array([embed_avg_view_dict[embed] for embed in range(num_videos)])
+
+    is_persistent = lifetime_index.is_persistent() & passes_view_filter(avg_view_arr, src_arr, tar_arr)
+    src_arr, tar_arr = src_arr[is_persistent], tar_arr[is_persistent]
+    write_links(os.path.join(data_prefix, 'persistent_network.csv'), src_arr, tar_arr)
+
+    persistent_src_embed_set = set(src_arr.tolist())
+    persistent_tar_embed_set = set(tar_arr.tolist())
+    existing_edges = set(zip(src_arr.tolist(), tar_arr.tolist()))
+    num_reciprocal_edges = sum(1 for src_embed, tar_embed in existing_edges
+                               if src_embed < tar_embed and (tar_embed, src_embed) in existing_edges)
     num_same_artist = 0
     num_same_genre = 0
 
-    with open(os.path.join(data_prefix, 'persistent_network.csv'), 'w') as fout:
-        fout.write('Source,Target\n')
-
-        for tar_embed in range(num_videos):
-            src_union_set = set()
-            for t in range(T):
-                src_union_set.update(set(network_dict_list[t][tar_embed]))
-
-            for src_embed in src_union_set:
-                linkage_list = [0] * T
-                for t in range(T):
-                    if src_embed in network_dict_list[t][tar_embed]:
-                        linkage_list[t] = 1
-                if is_persistent_link(linkage_list):
-                    # filter: at least 100 daily views for target video,
-                    # and the mean daily views of source video is at least 1% of the target video
-                    src_mean = embed_avg_view_dict[src_embed]
-                    tar_mean = embed_avg_view_dict[tar_embed]
-
-                    if tar_mean >= 100 and src_mean >= 0.01 * tar_mean:
-                        fout.write('{0},{1}\n'.format(src_embed, tar_embed))
-                        persistent_src_embed_set.add(src_embed)
-                        persistent_tar_embed_set.add(tar_embed)
-                        if '{1}-{0}'.format(src_embed, tar_embed) in existing_edges:
-                            num_reciprocal_edges += 1
-                        if embed_cid_dict[src_embed] == embed_cid_dict[tar_embed]:
-                            num_same_artist += 1
-                        if is_same_genre(embed_genre_dict[src_embed], embed_genre_dict[tar_embed]):
-                            num_same_genre += 1
-                        existing_edges.add('{0}-{1}'.format(src_embed, tar_embed))
+    for src_embed, tar_embed in existing_edges:
+        if embed_cid_dict[src_embed] == embed_cid_dict[tar_embed]:
+            num_same_artist += 1
+        if is_same_genre(embed_genre_dict[src_embed], embed_genre_dict[tar_embed]):
+            num_same_genre += 1
 
     print('{0} edges in the persistent network'.format(len(existing_edges)))
     print('{0} source videos, {1} target videos, {2} videos appear in both set'.format(len(persistent_src_embed_set),
@@ -95,8 +98,70 @@ def main():
     timer.stop()
 
 
+def main_incremental(target_date_str):
+    # == == == == == == Part 1: Set up environment == == == == == == #
+    timer = Timer()
+    timer.start()
+
+    data_prefix = '../data/'
+    state_filepath = os.path.join(data_prefix, 'persistent_state.npz')
+
+    # == == == == == == Part 2: Load video views == == == == == == #
+    data_loader = DataLoader()
+    data_loader.load_video_views()
+    embed_avg_view_dict = data_loader.embed_avg_view_dict
+    num_videos = data_loader.num_videos
+    avg_view_arr = np.array([embed_avg_view_dict[embed] for embed in range(num_videos)])
+
+    def link_filter(src_arr, tar_arr):
+        return passes_view_filter(avg_view_arr, src_arr, tar_arr)
+
+    # == == == == == == Part 3: Slide the window by one day == == == == == == #
+    if os.path.exists(state_filepath):
+        persistent_network = load_sliding_persistent_network(state_filepath)
+        next_date_str = obj2str(str2obj(persistent_network.last_date) + timedelta(days=1))
+        if target_date_str is not None and target_date_str != next_date_str:
+            raise ValueError('state is at {0}, the next day to add is {1}, got {2}'.format(
+                persistent_network.last_date, next_date_str, target_date_str))
+        target_date = str2obj(next_date_str)
+        src_arr, tar_arr, pos_arr, _ = load_snapshot(data_prefix, target_date, num_videos)
+        mask = pos_arr < NUM_REL
+        added_keys, removed_keys = persistent_network.add_day(src_arr[mask], tar_arr[mask], date_str=next_date_str,
+                                                              link_filter=link_filter)
+    else:
+        # build the state from the T days ending at the target date
+        target_date = datetime(2018, 9, 1) + timedelta(days=T - 1) if target_date_str is None else str2obj(target_date_str)
+        persistent_network = SlidingPersistentNetwork(num_videos, window=T)
+        start_date = target_date - timedelta(days=T - 1)
+        for t, (src_arr, tar_arr, pos_arr, _) in iter_snapshots(data_prefix, T=T, start_date=start_date, num_videos=num_videos):
+            mask = pos_arr < NUM_REL
+            added_keys, removed_keys = persistent_network.add_day(src_arr[mask], tar_arr[mask], link_filter=link_filter)
+        persistent_network.last_date = obj2str(target_date)
+    persistent_network.save(state_filepath)
+
+    # == == == == == == Part 4: Write the persistent network and its diff == == == == == == #
+    write_links(os.path.join(data_prefix, 'persistent_network.csv'),
+                *np.divmod(persistent_network.persistent_keys, num_videos))
+    diff_keys = np.concatenate([added_keys, removed_keys])
+    change_arr = np.array(['added'] * len(added_keys) + ['removed'] * len(removed_keys))
+    write_links(os.path.join(data_prefix, 'persistent_network_diff_{0}.csv'.format(obj2str(target_date))),
+                *np.divmod(diff_keys, num_videos), change=change_arr)
+
+    print('>>> Window ends at {0}, {1} edges in the persistent network'.format(
+        obj2str(target_date), len(persistent_network.persistent_keys)))
+    print('{0} persistent edges added, {1} removed'.format(len(added_keys), len(removed_keys)))
+
+    timer.stop()
+
+
 if __name__ == '__main__':
     NUM_REL = 15
     T = 63
 
-    main()
+    MODE = sys.argv[1] if len(sys.argv) > 1 else 'full'
+    if MODE == 'full':
+        main()
+    elif MODE == 'incremental':
+        main_incremental(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        raise ValueError('unknown mode {0}, choose from full or incremental'.format(MODE))
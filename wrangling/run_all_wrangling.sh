@@ -12,10 +12,16 @@ python extract_forecast_tsv.py >> "$log_file"
 sleep 60
 echo '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++' >> "$log_file"
 
-## I provide the results in ../data/network_pickle so unnecessary to run this script, it takes about 63 hours to finish
+## I provide the results in ../data/network_pickle so unnecessary to run this script, it takes about 1 hour to finish,
+## and also writes ../data/recommended_csr and ../data/rel2rec_counts.npz
 # python extract_network_pickle.py >> "$log_file"
 #
 # sleep 60
 # echo '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++' >> "$log_file"
 
+python extract_network_delta.py >> "$log_file"
+
+sleep 60
+echo '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++' >> "$log_file"
+
 python extract_persistent_network.py >> "$log_file"
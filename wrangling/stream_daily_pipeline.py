@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Run wrangling, indegree statistics, bow-tie, persistent links and forecasting as a stream over days.
+Each day is read once and passed through all stages, every stage only keeps bounded rolling state, so the pipeline
+runs on new days without an end date. In the snapshot mode, days are read from ../data/network_pickle/; in the recsys
+mode, straight from the raw recsys files. Without a poll interval, the stream stops at the first missing day.
+
+Usage: python stream_daily_pipeline.py [snapshot|recsys] [YYYY-MM-DD] [poll_interval_seconds]
+Input data files: ../data/vevo_forecast_data_60k.tsv, ../data/network_pickle/ or ../data/recsys/
+Output data files: ./daily_pipeline.log, ../data/persistent_network_diff_YYYY-MM-DD.csv
+Time: ~10S per day
+"""
+
+import os, sys, logging
+from datetime import datetime
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../'))
+from utils.data_loader import DataLoader
+from utils.helper import Timer, obj2str, str2obj
+from utils.bowtie import LSCC
+from utils.streaming import stream_snapshots, stream_recsys, indegree_stage, bowtie_stage, persistence_stage, \
+    forecast_stage
+
+
+def main():
+    # == == == == == == Part 1: Set up environment == == == == == == #
+    timer = Timer()
+    timer.start()
+
+    data_prefix = '../data/'
+    start_date = str2obj(sys.argv[2]) if len(sys.argv) > 2 else datetime(2018, 9, 1)
+    poll_interval = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    # == == == == == == Part 2: Load video views == == == == == == #
+    data_loader = DataLoader()
+    data_loader.load_video_views()
+    embed_view_dict = data_loader.embed_view_dict
+    embed_avg_view_dict = data_loader.embed_avg_view_dict
+    num_videos = data_loader.num_videos
+    avg_view_arr = np.array([embed_avg_view_dict[embed] for embed in range(num_videos)])
+
+    def link_filter(src_arr, tar_arr):
+        # filter: at least 100 daily views for target video,
+        # and the mean daily views of source video is at least 1% of the target video
+        return (avg_view_arr[tar_arr] >= 100) & (avg_view_arr[src_arr] >= 0.01 * avg_view_arr[tar_arr])
+
+    def views_fn(date):
+        t = (date - datetime(2018, 9, 1)).days
+        return [embed_view_dict[embed][t] if 0 <= t < len(embed_view_dict[embed]) else np.nan for embed in range(num_videos)]
+
+    # == == == == == == Part 3: Chain the streaming stages == == == == == == #
+    if MODE == 'snapshot':
+        records = stream_snapshots(data_prefix, num_videos, start_date=start_date, views_fn=views_fn,
+                                   poll_interval=poll_interval)
+    else:
+        records = stream_recsys(data_prefix, data_loader.vid_embed_dict, start_date=start_date, max_position=MAX_POSITION,
+                                views_fn=views_fn, poll_interval=poll_interval)
+    records = indegree_stage(records, num_videos, num_rel=NUM_REL)
+    records = bowtie_stage(records, num_videos, num_rel=NUM_REL)
+    records = persistence_stage(records, num_videos, num_rel=NUM_REL, window=T, link_filter=link_filter)
+    records = forecast_stage(records, num_videos, num_output=NUM_OUTPUT)
+
+    # == == == == == == Part 4: Log per-day outputs == == == == == == #
+    for record in records:
+        date_str = obj2str(record['date'])
+        summary = record['bowtie_summary']
+        logging.info('>>> {0}: {1} edges, mean indegree {2:.2f}, {3:.2f}% nodes in the largest SCC'.format(
+            date_str, np.sum(record['pos'] < NUM_REL), np.mean(record['indegree']),
+            summary['num_nodes'][LSCC] / np.sum(summary['num_nodes']) * 100))
+        logging.info('    {0} persistent edges, {1} added, {2} removed'.format(
+            record['num_persistent'], len(record['persistent_added']), len(record['persistent_removed'])))
+        if 'forecast_smape' in record:
+            logging.info('    sMAPE of seasonal naive forecast for the last {0} days: {1:.2f}'.format(
+                NUM_OUTPUT, record['forecast_smape']))
+
+        diff_keys = np.concatenate([record['persistent_added'], record['persistent_removed']])
+        if len(diff_keys) > 0:
+            src_arr, tar_arr = np.divmod(diff_keys, num_videos)
+            with open(os.path.join(data_prefix, 'persistent_network_diff_{0}.csv'.format(date_str)), 'w') as fout:
+                fout.write('Source,Target,Change\n')
+                for idx, (src_embed, tar_embed) in enumerate(zip(src_arr.tolist(), tar_arr.tolist())):
+                    fout.write('{0},{1},{2}\n'.format(src_embed, tar_embed,
+                                                      'added' if idx < len(record['persistent_added']) else 'removed'))
+        print('>>> Finish streaming day {0}...'.format(date_str))
+
+    timer.stop()
+
+
+if __name__ == '__main__':
+    NUM_REL = 15
+    MAX_POSITION = 50
+    NUM_OUTPUT = 7
+    T = 63
+
+    MODE = sys.argv[1] if len(sys.argv) > 1 else 'snapshot'
+    if MODE not in ['snapshot', 'recsys']:
+        raise ValueError('unknown mode {0}, choose from snapshot or recsys'.format(MODE))
+    logging.basicConfig(filename='daily_pipeline.log', filemode='w', format='%(asctime)s - %(message)s', level=logging.INFO)
+
+    main()